@@ -1,4 +1,3 @@
-import asyncpg
 import asyncio
 import datetime
 import re
@@ -9,6 +8,7 @@ from nltk.corpus import words
 from tqdm import tqdm
 from tools.download_nltk_data import load_nltk_data
 from tools.config.config_loader import CONFIG
+from tools.db_pool import closing_pool, connect_to_database
 from tools.config.logger_config import init_logger, logging
 
 logger = logging.getLogger(__name__)
@@ -18,26 +18,8 @@ SIA = SentimentIntensityAnalyzer()
 analyze_heavy_cache = {}
 
 # ------------------------------------------------
-# 1) CONNECT TO DATABASE (asyncpg)
+# 1) DATABASE: connections come from the shared pool (tools.db_pool)
 # ------------------------------------------------
-async def connect_to_database():
-    """
-    Establishes an asyncpg connection using configuration from CONFIG.
-    """
-    cfg = CONFIG["database"]
-    try:
-        conn = await asyncpg.connect(
-            user=cfg["user"],
-            password=cfg["password"],
-            database=cfg["dbname"],
-            host=cfg["host"],
-            port=cfg.get("port", 5432),
-        )
-        logger.info("Async database connection successful.")
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        return None
 
 # ------------------------------------------------
 # 2) FETCH COMMENTS
@@ -229,19 +211,19 @@ async def analyze_data(comments) -> list:
 async def comment_analysis():
     """
     Orchestrates the comment analysis:
-        1) Connect to DB
+        1) Borrow the shared DB pool
         2) Fetch comments
         3) analyze_data
         4) Return results
     """
-    # 1) Connect to DB
-    conn = await connect_to_database()
-    if conn is None:
+    # 1) Borrow the shared DB pool
+    pool = await connect_to_database()
+    if pool is None:
         logger.error("Could not connect to the database.")
         return []
     try:
         # 2) Fetch comments
-        rows = await fetch_comments(conn)
+        rows = await fetch_comments(pool)
         if not rows:
             logger.warning("No comments found to analyze.")
 
@@ -258,14 +240,10 @@ async def comment_analysis():
     except Exception as e:
         logger.exception(f"An error occurred during comment analysis: {e}")
         return []
-    finally:
-        # 5) Clean up
-        await conn.close()
-        logger.info("Database connection closed.")
 
 if __name__ == "__main__":
     init_logger()
     load_nltk_data()
     _ = words.words("en-basic")  # Preload the "en-basic" word list
-    results = asyncio.run(comment_analysis())
+    results = asyncio.run(closing_pool(comment_analysis()))
     logger.info(f"Analyzed {len(results)} comments.")
\ No newline at end of file
@@ -1,11 +1,11 @@
 from tqdm import tqdm  # For the progress bar
-import asyncpg
 import asyncio
 from openpyxl import Workbook
 from openpyxl.worksheet.worksheet import Worksheet
 from tools.config.config_loader import CONFIG
+from tools.db_pool import closing_pool, connect_to_database
 from tools.config.logger_config import init_logger, logging
-from data_analysis.user_analysis import analyze_users, fetch_users
+from data_analysis.user_analysis import analyze_users, fetch_user_activity, fetch_users
 
 logger = logging.getLogger(__name__)
 logger.info("User Analysis Excel Module Logging Set")
@@ -13,42 +13,24 @@ init_logger()
 
 EXCEL_FILE_PATH = 'analysis_results/user_analysis.xlsx'
 
-async def connect_to_database():
-    """
-    Establish an asyncpg connection to the PostgreSQL database.
-    """
-    cfg = CONFIG['database']
-    try:
-        conn = await asyncpg.connect(
-            user=cfg['user'],
-            password=cfg['password'],
-            database=cfg['dbname'],
-            host=cfg['host'],
-            port=cfg.get('port', 5432)
-        )
-        logger.info("Async database connection successful.")
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        return None
-
 async def generate_user_analysis_excel():
     """
     Connects to the database asynchronously, fetches user data, analyzes it, and writes the results to an Excel file.
     """
-    # 1. Connect to the database (asyncpg)
-    conn = await connect_to_database()
-    if not conn:
+    # 1. Borrow the shared database pool (asyncpg)
+    pool = await connect_to_database()
+    if not pool:
         logger.error("Failed to establish database connection.")
         return
 
     try:
-        # 2. Fetch user data (async call)
-        users = await fetch_users(conn)
+        # 2. Fetch user data and activity timelines concurrently, on two pooled connections
+        users, activity = await asyncio.gather(fetch_users(pool), fetch_user_activity(pool))
         logger.info(f"Fetched {len(users)} users for analysis.")
 
-        # 3. Analyze user data (synchronous function)
-        analyzed_users = analyze_users(CONFIG, users)
+        # 3. Analyze user data (synchronous function); burst and inactivity
+        # detection run on the stored activity timelines, no API calls needed
+        analyzed_users = analyze_users(CONFIG, users, activity)
         if analyzed_users is None:
             logger.error("User analysis returned None, please check the analyze_users function.")
             return
@@ -83,7 +65,9 @@ async def generate_user_analysis_excel():
             "Account Age",
             "Low Karma",
             "Young Account",
-            "Burst Activity"
+            "Burst Activity",
+            "Longest Inactivity Days",
+            "Activity Items"
         ]
         sheet.append(headers)
         logger.debug("Header row appended to the Excel sheet.")
@@ -109,12 +93,8 @@ async def generate_user_analysis_excel():
     except Exception as e:
         logger.exception(f"Error during Excel generation: {e}")
 
-    finally:
-        # 10. Close the asyncpg connection
-        await conn.close()
-        logger.info("Database connection closed.")
 
 if __name__ == "__main__":
     # 11. Run everything in the event loop
-    asyncio.run(generate_user_analysis_excel())
+    asyncio.run(closing_pool(generate_user_analysis_excel()))
     logger.info("User analysis Excel generation completed.")
\ No newline at end of file
@@ -6,6 +6,7 @@ from nltk.sentiment import SentimentIntensityAnalyzer
 from nltk import word_tokenize, pos_tag, ne_chunk, ngrams
 from tools.download_nltk_data import load_nltk_data
 from tools.config.config_loader import CONFIG
+from tools.db_pool import closing_pool, connect_to_database
 from tools.config.logger_config import init_logger, logging
 
 
@@ -15,27 +16,8 @@ init_logger()
 load_nltk_data()
 
 # ------------------------------------------------
-# 1) CONNECT TO DATABASE (asyncpg)
+# 1) DATABASE: connections come from the shared pool (tools.db_pool)
 # ------------------------------------------------
-async def connect_to_database():
-    """
-    Establish an asyncpg connection using the config in CONFIG.
-    """
-    cfg = CONFIG["database"]
-    try:
-        conn = await asyncpg.connect(
-            user=cfg["user"],
-            password=cfg["password"],
-            database=cfg["dbname"],
-            host=cfg["host"],
-            port=cfg.get("port", 5432),
-        )
-        logger.info("Async database connection successful.")
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        return None
-
 
 # ------------------------------------------------
 # 2) FETCH SUBMISSIONS
@@ -231,22 +213,22 @@ def analyze_data(submissions):
 async def submission_analysis():
     """
     Orchestrates the submission data analysis process.
-    1) Connect to DB
+    1) Borrow the shared DB pool
     2) Fetch submissions
     3) Analyze
     4) Optionally: store or return results
     """
     logger.info("Starting submission analysis")
 
-    # 1) Connect to DB
-    conn = await connect_to_database()
-    if conn is None:
+    # 1) Borrow the shared DB pool
+    pool = await connect_to_database()
+    if pool is None:
         logger.error("Could not connect to the database.")
         return
 
     try:
         # 2) Fetch submissions
-        submissions = await fetch_submissions(conn)
+        submissions = await fetch_submissions(pool)
         if not submissions:
             logger.warning("No submissions found to analyze.")
             return
@@ -266,11 +248,9 @@ async def submission_analysis():
     except Exception as e:
         logger.exception(f"An unexpected error occurred during submission_analysis: {e}")
     finally:
-        # 5) Clean up
-        await conn.close()
-        logger.info("Submission analysis completed, connection closed.")
+        logger.info("Submission analysis completed.")
 
 
 if __name__ == "__main__":
-    asyncio.run(submission_analysis())
+    asyncio.run(closing_pool(submission_analysis()))
     logger.info("Submission analysis completed.")
\ No newline at end of file
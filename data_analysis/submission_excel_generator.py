@@ -1,9 +1,9 @@
 from tqdm import tqdm  # For the progress bar
-import asyncpg
 import asyncio
 from openpyxl import Workbook
 from openpyxl.worksheet.worksheet import Worksheet
 from tools.config.config_loader import CONFIG
+from tools.db_pool import closing_pool, connect_to_database
 from tools.config.logger_config import init_logger, logging
 from data_analysis.submission_analysis import analyze_data, fetch_submissions
 
@@ -11,40 +11,21 @@ logger = logging.getLogger(__name__)
 logger.info("Submission Excel Generator Module Logging Set")
 init_logger()
 
-async def connect_to_database():
-    """
-    Establish an asyncpg connection to the PostgreSQL database.
-    """
-    cfg = CONFIG['database']
-    try:
-        conn = await asyncpg.connect(
-            user=cfg['user'],
-            password=cfg['password'],
-            database=cfg['dbname'],
-            host=cfg['host'],
-            port=cfg.get('port', 5432)
-        )
-        logger.info("Async database connection successful.")
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        return None
-
 EXCEL_FILE_PATH = 'analysis_results/submission_analysis.xlsx'
 
 async def generate_submission_excel():
     """
     Connects to the database asynchronously, fetches submission data, analyzes it, and writes the results to an Excel file.
     """
-    # 1. Connect to the database (asyncpg)
-    conn = await connect_to_database()
-    if not conn:
+    # 1. Borrow the shared database pool (asyncpg)
+    pool = await connect_to_database()
+    if not pool:
         logger.error("Failed to establish database connection.")
         return
     try:
         # 2. Fetch submission data (async call)
 
-        submissions = await fetch_submissions(conn)
+        submissions = await fetch_submissions(pool)
         logger.info(f"Fetched {len(submissions)} submissions for Excel generation.")
 
         # 3. Analyze the submissions using the analyze_data function.
@@ -103,11 +84,7 @@ async def generate_submission_excel():
     except Exception as e:
         logger.exception(f"Error during submission Excel generation: {e}")
 
-    finally:
-        # 10. Close the asyncpg connection
-        await conn.close()
-        logger.info("Database connection closed.")
 
 if __name__ == "__main__":
-    asyncio.run(generate_submission_excel())
+    asyncio.run(closing_pool(generate_submission_excel()))
     logger.info("Submission analysis Excel generation completed.")
@@ -1,276 +1,198 @@
+from collections import defaultdict
 from tqdm import tqdm  # For progress display
 import asyncpg
 import asyncio
-import re
-from nltk.sentiment import SentimentIntensityAnalyzer
-from nltk import word_tokenize, pos_tag, ne_chunk, ngrams
-from tools.download_nltk_data import load_nltk_data
+from data_analysis.cal_acc_age import calculate_account_age
+from data_analysis.id_low_karma import identify_low_karma_accounts
+from data_analysis.id_young_acc import identify_young_accounts
 from tools.config.config_loader import CONFIG
+from tools.db_pool import closing_pool, connect_to_database
 from tools.config.logger_config import init_logger, logging
 
 
 logger = logging.getLogger(__name__)
-logger.info("Submission Analysis Module Logging Set")
+logger.info("User Analysis Module Logging Set")
 init_logger()
-load_nltk_data()
+
+SECONDS_PER_DAY = 24 * 60 * 60
 
 # ------------------------------------------------
-# 1) CONNECT TO DATABASE (asyncpg)
+# 1) DATABASE: connections come from the shared pool (tools.db_pool)
 # ------------------------------------------------
-async def connect_to_database():
-    """
-    Establish an asyncpg connection using the config in CONFIG.
-    """
-    cfg = CONFIG["database"]
-    try:
-        conn = await asyncpg.connect(
-            user=cfg["user"],
-            password=cfg["password"],
-            database=cfg["dbname"],
-            host=cfg["host"],
-            port=cfg.get("port", 5432),
-        )
-        logger.info("Async database connection successful.")
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        return None
-
 
 # ------------------------------------------------
-# 2) FETCH SUBMISSIONS
+# 2) FETCH USERS AND THEIR ACTIVITY TIMELINES
 # ------------------------------------------------
-async def fetch_submissions(conn):
+async def fetch_users(conn):
     """
-    Retrieves submission data from the database using asyncpg.
+    Retrieves user profiles from the database using asyncpg.
 
     Returns:
-        List of asyncpg.Record objects, each with columns:
-            - submission_id
-            - author
-            - title
-            - submission_score
-            - url
-            - submission_created_utc
-            - over_18
+        List of asyncpg.Record objects with the columns of the users table.
     """
     query = """
         SELECT
-            submissions.submission_id,
-            submissions.author,
-            submissions.title,
-            submissions.submission_score,
-            submissions.url,
-            submissions.submission_created_utc,
-            submissions.over_18
-        FROM submissions
-        JOIN users
-        ON submissions.author = users.redditor
-        ORDER BY submissions.submission_id
+            redditor_id,
+            redditor,
+            created_utc,
+            link_karma,
+            comment_karma,
+            total_karma,
+            is_employee,
+            is_gold,
+            dormant_days,
+            has_verified_email,
+            accepts_followers,
+            redditor_is_subscriber
+        FROM users
+        ORDER BY redditor
     """
     try:
         rows = await conn.fetch(query)
-        logger.info(f"Fetched {len(rows)} submissions for analysis.")
+        logger.info(f"Fetched {len(rows)} users for analysis.")
         return rows
     except asyncpg.PostgresError as pg_err:
         logger.error(f"A PostgreSQL error occurred: {pg_err}")
         return []
     except Exception as e:
-        logger.exception(f"An error occurred in fetch_submissions: {e}")
+        logger.exception(f"An error occurred in fetch_users: {e}")
         return []
 
+
+async def fetch_user_activity(conn):
+    """
+    Retrieves the stored activity timelines (see the user_activity table).
+
+    Returns:
+        {redditor_id: [activity_utc, ...]} with each list sorted oldest first.
+    """
+    query = """
+        SELECT redditor_id, activity_utc
+        FROM user_activity
+        ORDER BY redditor_id, activity_utc
+    """
+    activity = defaultdict(list)
+    try:
+        for row in await conn.fetch(query):
+            activity[row["redditor_id"]].append(row["activity_utc"])
+        logger.info(f"Fetched activity timelines for {len(activity)} users.")
+    except asyncpg.PostgresError as pg_err:
+        logger.error(f"A PostgreSQL error occurred while fetching activity: {pg_err}")
+    return dict(activity)
+
 # ------------------------------------------------
 # 3) UTILITY / ANALYSIS FUNCTIONS
 # ------------------------------------------------
-def analyze_submission_title(title: str) -> dict:
+def get_burst_settings(config):
     """
-    Perform NLTK-based analysis on a submission title.
-    Returns a dict with named_entities, lexical_diversity, and common_bigrams.
+    Returns (inactivity_period, burst_period) in days.
     """
-    # Tokenize the title.
-    tokens = word_tokenize(title)
-    # POS-tag the tokens.
-    tagged_tokens = pos_tag(tokens)
-    # Run named entity recognition.
-    ner_tree = ne_chunk(tagged_tokens)
-    named_entities = ", ".join(
-        str(chunk) for chunk in ner_tree if hasattr(chunk, "label")
-    )
-
-    # Lexical diversity
-    lex_div = len(set(tokens)) / len(tokens) if tokens else 0.0
-    # Extract bigrams
-    bigrams_list = list(ngrams(tokens, 2))
-    common_bigrams = ", ".join([" ".join(b) for b in bigrams_list[:5]])
-
-    return {
-        "named_entities": named_entities,
-        "lexical_diversity": lex_div,
-        "common_bigrams": common_bigrams,
-    }
+    try:
+        inactivity_period = float(config.get("inactivity_period", 3))
+        burst_period = float(config.get("burst_period", 1))
+    except (ValueError, TypeError):
+        logger.warning("Invalid inactivity_period/burst_period in CONFIG; defaulting to 3 and 1 days.")
+        inactivity_period, burst_period = 3.0, 1.0
+    return inactivity_period, burst_period
 
 
-def lex_div(text: str) -> tuple[float, str]:
+def longest_inactivity_days(timestamps):
     """
-    Calculates lexical diversity of a text and returns (diversity_score, label).
+    Longest gap in days between two consecutive activity items, or None with fewer than two.
     """
-    text = text.lower()
-    text = re.sub(r"[^\w\s]", "", text)
-    text = re.sub(r"\s+", " ", text).strip()
-
-    tokens = word_tokenize(text)
-    if not tokens:
-        return 0.0, "No text"
-
-    diversity_score = len(set(tokens)) / len(tokens)
-    if diversity_score > 0.7:
-        diversity_label = "Highly diverse"
-    elif diversity_score > 0.4:
-        diversity_label = "Moderately diverse"
-    else:
-        diversity_label = "Less diverse"
+    if len(timestamps) < 2:
+        return None
+    longest = max(later - earlier for earlier, later in zip(timestamps, timestamps[1:]))
+    return round(longest / SECONDS_PER_DAY, 1)
 
-    return diversity_score, diversity_label
 
-def mark_duplicate_submissions(analysis_results):
+def detect_burst_activity(timestamps, inactivity_period, burst_period):
     """
-    Given a list of submission dicts (each with at least
-    'Author', 'Title', 'URL'), find duplicates posted by the same user
-    with the same title and same link.
-
-    Returns a modified copy of analysis_results, where each dict
-    has a new key "Is Duplicate" (bool).
+    True when a silence of at least `inactivity_period` days is followed by
+    two or more items within `burst_period` days. `timestamps` must be sorted.
     """
-    from collections import defaultdict
-
-    # 1) Group submissions by (Author, Title, URL)
-    #    Normalizing them is optional but recommended (e.g. .lower(), strip()).
-    groups = defaultdict(list)
-    for idx, sub in enumerate(analysis_results):
-        author = sub["Author"].strip().lower()
-        title = sub["Title"].strip().lower()
-        url = sub["URL"].strip().lower()
-        key = (author, (title, url))
-        groups[key].append(idx)
+    silence = inactivity_period * SECONDS_PER_DAY
+    window = burst_period * SECONDS_PER_DAY
+    for index in range(1, len(timestamps) - 1):
+        if (timestamps[index] - timestamps[index - 1] >= silence
+                and timestamps[index + 1] - timestamps[index] <= window):
+            return True
+    return False
 
-    # 2) Mark duplicates
-    #    If a group has more than 1 submission, all of them are duplicates.
-    for indices in groups.values():
-        if len(indices) > 1:
-            # We have duplicates
-            for i in indices:
-                analysis_results[i]["Is Duplicate"] = True
-        else:
-            # Only 1 submission in that group => not a duplicate
-            analysis_results[indices[0]]["Is Duplicate"] = False
 
-    return analysis_results
-
-def analyze_data(submissions):
+def analyze_users(config, users, activity=None):
     """
-    Analyze a list of submissions.
-    Returns a list of dicts with:
-        - Submission ID
-        - Author
-        - Title
-        - Submission Score
-        - URL
-        - Created UTC
-        - Sentiment
-        - Named Entities
-        - Lexical Diversity
-        - Common Bigrams
-        - Is Duplicate
+    Analyze a list of users.
+    Returns a list of dicts keyed by the user analysis report headers, including
+    account age, low karma / young account flags and, for users with a stored
+    activity timeline, burst activity and the longest inactivity gap.
     """
-    SIA = SentimentIntensityAnalyzer()
+    activity = activity or {}
+    inactivity_period, burst_period = get_burst_settings(config)
     results = []
-    
-    # Process each submission and build the analysis record
-    for submission in tqdm(submissions, desc="Analyzing Submissions", unit="submission"):
-        # submission is an asyncpg.Record or tuple
-        (submission_id, author, title, submission_score, url, submission_created_utc, over_18) = submission
-
-        # Sentiment analysis
-        sentiment_score = SIA.polarity_scores(title)["compound"]
-        if sentiment_score >= 0.05:
-            sentiment_label = "Positive"
-        elif sentiment_score <= -0.05:
-            sentiment_label = "Negative"
-        else:
-            sentiment_label = "Neutral"
-        sentiment_cell_value = f"{sentiment_score:.3f} ({sentiment_label})"
 
-        # Additional NLTK-based analysis
-        title_analysis = analyze_submission_title(title)
-
-        # Build a record without the duplicate flag first
-        record = {
-            "Submission ID": submission_id,
-            "Author": author,
-            "Title": title,
-            "Score": submission_score,
-            "URL": url,
-            "Created UTC": submission_created_utc,
-            "NSFW": over_18,
-            "Sentiment": sentiment_cell_value,
-            "Named Entities": title_analysis["named_entities"],
-            "Lexical Diversity": title_analysis["lexical_diversity"],
-            "Common Bigrams": title_analysis["common_bigrams"],
-            # "Is Duplicate" will be set later
-        }
-        results.append(record)
-    
-    # Mark duplicates on the entire results list
-    results = mark_duplicate_submissions(results)
-    logger.info("Submission data analysis completed.")
+    for user in tqdm(users, desc="Analyzing Users", unit="user"):
+        account_age = calculate_account_age(user["created_utc"])
+        timestamps = activity.get(user["redditor_id"], [])
+        results.append({
+            "User ID": user["redditor_id"],
+            "Username": user["redditor"],
+            "Account Created": user["created_utc"],
+            "Link Karma": user["link_karma"],
+            "Comment Karma": user["comment_karma"],
+            "Total Karma": user["total_karma"],
+            "Is Employee": user["is_employee"],
+            "Is Gold": user["is_gold"],
+            "Dormant Days": user["dormant_days"],
+            "Has Verified Email": user["has_verified_email"],
+            "Accepts Followers": user["accepts_followers"],
+            "Is Subscriber": user["redditor_is_subscriber"],
+            "Account Age": round(account_age, 2) if account_age is not None else None,
+            "Low Karma": bool(identify_low_karma_accounts(user["total_karma"] or 0, config)),
+            "Young Account": account_age is not None and bool(identify_young_accounts(account_age)),
+            # No timeline (e.g. prefiltered accounts): leave the activity columns empty
+            "Burst Activity": detect_burst_activity(timestamps, inactivity_period, burst_period) if timestamps else None,
+            "Longest Inactivity Days": longest_inactivity_days(timestamps),
+            "Activity Items": len(timestamps),
+        })
+
+    logger.info("User data analysis completed.")
     return results
 
 # --------------------------------
-# 4) MAIN SUBMISSION ANALYSIS FLOW
+# 4) MAIN USER ANALYSIS FLOW
 # --------------------------------
-async def submission_analysis():
+async def user_analysis():
     """
-    Orchestrates the submission data analysis process.
-    1) Connect to DB
-    2) Fetch submissions
+    Orchestrates the user data analysis process.
+    1) Borrow the shared DB pool
+    2) Fetch users and activity timelines (concurrently, on two pooled connections)
     3) Analyze
-    4) Optionally: store or return results
     """
-    logger.info("Starting submission analysis")
+    logger.info("Starting user analysis")
 
-    # 1) Connect to DB
-    conn = await connect_to_database()
-    if conn is None:
+    pool = await connect_to_database()
+    if pool is None:
         logger.error("Could not connect to the database.")
         return
 
     try:
-        # 2) Fetch submissions
-        submissions = await fetch_submissions(conn)
-        if not submissions:
-            logger.warning("No submissions found to analyze.")
+        users, activity = await asyncio.gather(fetch_users(pool), fetch_user_activity(pool))
+        if not users:
+            logger.warning("No users found to analyze.")
             return
 
-        # 3) Analyze
-        analysis_results = analyze_data(submissions)
-        logger.info("Analyzing submissions completed.")
-
-        # 3a) Mark duplicates
-        analysis_results = mark_duplicate_submissions(analysis_results)
-
-        # 4) Optionally: store or return results
+        analysis_results = analyze_users(CONFIG, users, activity)
         logger.debug(analysis_results)
 
     except asyncpg.PostgresError as e:
-        logger.error(f"Error during submission analysis (asyncpg): {e}")
+        logger.error(f"Error during user analysis (asyncpg): {e}")
     except Exception as e:
-        logger.exception(f"An unexpected error occurred during submission_analysis: {e}")
+        logger.exception(f"An unexpected error occurred during user_analysis: {e}")
     finally:
-        # 5) Clean up
-        await conn.close()
-        logger.info("Submission analysis completed, connection closed.")
+        logger.info("User analysis completed.")
 
 
 if __name__ == "__main__":
-    asyncio.run(submission_analysis())
-    logger.info("Submission analysis completed.")
\ No newline at end of file
+    asyncio.run(closing_pool(user_analysis()))
+    logger.info("User analysis completed.")
@@ -7,20 +7,25 @@ It performs the following steps:
 4. Waits until both JSON files are created.
 5. Loads the JSON data from the created files.
 6. Converts the JSON data to a database.
+   (With "sink": "database" the scraper loads the database itself and steps 4-6 are skipped.)
 7. Analyzes comments using the user data.
 8. Generates an Excel report for comment analysis.
 9. Analyzes submissions using the submission data.
 10. Generates an Excel report for submission analysis.
 11. Analyzes users using the user data.
+   (Steps 7-11 run concurrently.)
 12. Logs the completion of all operations.
+
+Every database stage borrows its connections from one shared pool (tools.db_pool),
+which is closed when the run ends.
 """
 import asyncio
 import argparse
-import json
-import os
 import time
 from tools.config.config_loader import CONFIG
 from tools.config.logger_config import init_logger, logging
+from tools.db_pool import close_pool
+from tools.scrape_output import REDDITOR_OUTPUT, SUBMISSION_OUTPUT, find_output, has_records, streams_to_database
 
 logger = logging.getLogger(__name__)
 logger.info("Main Basic logging set")
@@ -31,78 +36,79 @@ db_config = CONFIG["database"]
 logger.debug("Main Loading config file")
 logger.info("main json_to_db Database config loaded")
 
-def check_files_exist(file1, file2):
-    """Check if two files exist."""
-    return os.path.exists(file1) and os.path.exists(file2)
+def find_scraper_outputs():
+    """Return the redditor and submission output paths, or (None, None) until both exist."""
+    file1_path = find_output(REDDITOR_OUTPUT)
+    file2_path = find_output(SUBMISSION_OUTPUT)
+    if file1_path is None or file2_path is None:
+        return None, None
+    return file1_path, file2_path
 
-async def run_full_pipeline():
+async def run_full_pipeline(resume=False):
     # (1) Run the scraper (if needed)
     from tools.scraper import run_scraper_async
-    await run_scraper_async()  # directly await the async function
+    await run_scraper_async(resume)  # directly await the async function
     logger.debug("Scraper package executed")
 
-    # (2) Wait until JSON files exist (if applicable)
-    file1_path = "analysis_results/redditor_data.json"  # Updated to match scraper output
-    file2_path = "analysis_results/submission_data.json"
+    if streams_to_database(CONFIG):
+        # Records were loaded into the database while scraping; there are no output files
+        logger.info("Scraper streamed its records into the database; skipping JSON-to-DB.")
+    else:
+        await load_scraper_output()
+
+    # (5) Generate Excel reports
+    await generate_excel_reports()
+
+async def generate_excel_reports():
+    # The report stages share the database pool, so their queries and the
+    # comment analysis (which runs in worker processes) overlap
+    from data_analysis.generate_comment_analysis import generate_comment_analysis_excel
+    from data_analysis.submission_excel_generator import generate_submission_excel
+    from data_analysis.generate_user_analysis_excel import generate_user_analysis_excel
+    logger.info('Generating Comment, Submission and User Analysis Results Excel')
+    await asyncio.gather(
+        generate_comment_analysis_excel(),
+        generate_submission_excel(),
+        generate_user_analysis_excel(),
+    )
+
+async def load_scraper_output():
+    # (2) Wait until the output files exist (if applicable)
     timeout_seconds = 5 * 60  # 5 minutes
     start_time = time.time()
 
-    while not check_files_exist(file1_path, file2_path):
-        logger.debug(f"Waiting for {file1_path} and {file2_path} to be created...")
+    file1_path, file2_path = find_scraper_outputs()
+    while file1_path is None:
+        logger.debug("Waiting for redditor_data and submission_data output to be created...")
         await asyncio.sleep(60)  # Wait for 1 minute
         if time.time() - start_time > timeout_seconds:
             raise FileNotFoundError(
-                f"JSON files {file1_path} and {file2_path} not found after 5 minutes."
+                "Scraper output files redditor_data and submission_data not found after 5 minutes."
             )
+        file1_path, file2_path = find_scraper_outputs()
 
-    logger.debug("JSON files found! Continuing execution...")
+    logger.debug("Output files found! Continuing execution...")
 
-    # (3) Load JSON data
-    with open(file1_path, 'r', encoding='utf-8') as f:
-        logger.debug("User data loaded")
-        if not (user_data := json.load(f)):
-            raise ValueError("User data is empty")
-        else:
-            logger.debug("User data is not empty")
-    with open(file2_path, 'r', encoding='utf-8') as f:
-        submission_data = json.load(f)
-        logger.debug("Submission data loaded")
-        if not submission_data:
+    # (3) Make sure the output is not empty (reads only the first record of each file)
+    if not has_records(file2_path):
+        if not CONFIG.get("incremental", {}).get("enabled", False):
             raise ValueError("Submission data is empty")
+        # Incremental runs legitimately produce nothing when no subreddit changed
+        logger.warning("No new or changed submissions since the last run; skipping database insertion.")
+    else:
         logger.debug("Submission data is not empty")
+        if not has_records(file1_path):
+            raise ValueError("User data is empty")
+        logger.debug("User data is not empty")
 
-    # (4) Insert JSON data into the database
-    from tools.json_to_db import main as json_to_db_main
-    logger.info('Converting JSON to database')
-    await json_to_db_main()
-
-    # (5) Generate Excel reports
-    from data_analysis.generate_comment_analysis import generate_comment_analysis_excel
-    logger.info('Generating Comment Analysis Results Excel')
-    await generate_comment_analysis_excel()
-
-    from data_analysis.submission_excel_generator import generate_submission_excel
-    logger.info('Generating Submission Analysis Results Excel')
-    await generate_submission_excel()
-
-    from data_analysis.generate_user_analysis_excel import generate_user_analysis_excel
-    logger.info('Generating User Analysis Results Excel')
-    await generate_user_analysis_excel()
+        # (4) Insert JSON data into the database
+        from tools.json_to_db import main as json_to_db_main
+        logger.info('Converting JSON to database')
+        await json_to_db_main()
 
 async def run_excel_generation_only():
     # Only run the Excel generation modules.
-    from data_analysis.generate_user_analysis_excel import generate_user_analysis_excel
-    logger.info('Generating User Analysis Results Excel')
-    await generate_user_analysis_excel()
-    
-    from data_analysis.generate_comment_analysis import generate_comment_analysis_excel
-    logger.info('Generating Comment Analysis Results Excel')
-    await generate_comment_analysis_excel()
-
-    from data_analysis.submission_excel_generator import generate_submission_excel
-    logger.info('Generating Submission Analysis Results Excel')
-    await generate_submission_excel()
-
+    await generate_excel_reports()
     logger.info('Excel generation complete.')
 
 async def run_generate_comment_analysis_excel_only():
@@ -132,8 +138,16 @@ async def main():
     group.add_argument("--comment-analysis-excel-only", action="store_true", help="Run comment analysis Excel generation only")
     group.add_argument("--submission-excel-only", action="store_true", help="Run submission analysis Excel generation only")
     group.add_argument("--user-analysis-excel-only", action="store_true", help="Run user analysis Excel generation only")
+    group.add_argument("--daemon", action="store_true", help="Continuously ingest new submissions and comments into the database")
+    parser.add_argument("--resume", action="store_true", help="Resume an interrupted scrape from its checkpoint journal")
     args = parser.parse_args()
+    try:
+        await run_mode(args)
+    finally:
+        await close_pool()
+    logger.info("All operations complete.")
 
+async def run_mode(args):
     if args.excel_only:
         logger.info("Running in Excel-only mode.")
         await run_excel_generation_only()
@@ -141,7 +155,7 @@ async def main():
     elif args.scraper_only:
         logger.info("Running in scraper-only mode.")
         from tools.scraper import run_scraper_async
-        await run_scraper_async()
+        await run_scraper_async(args.resume)
         logger.info("Scraper package executed")
         
     elif args.json_to_db_only:
@@ -160,12 +174,15 @@ async def main():
     elif args.user_analysis_excel_only:
         logger.info("Running in user analysis Excel-only mode.")
         await run_generate_user_analysis_excel_only()
+
+    elif args.daemon:
+        logger.info("Running in streaming ingest daemon mode.")
+        from tools.ingest_daemon import run_daemon
+        await run_daemon()
         
     else:
         logger.info("Running the full pipeline.")
-        await run_full_pipeline()
-
-    logger.info("All operations complete.")
+        await run_full_pipeline(args.resume)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
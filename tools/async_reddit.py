@@ -0,0 +1,264 @@
+'''
+Minimal asyncio Reddit API client used by the "async" scraper backend.
+
+It talks to the OAuth listing, comment and user endpoints directly over a
+pooled aiohttp session, so hundreds of requests can be in flight on a single
+event loop instead of one per PRAW worker thread.
+'''
+import asyncio
+import json
+import time
+import aiohttp
+from tools.config.logger_config import init_logger, logging
+from tools.metrics import METRICS, endpoint_label
+
+logger = logging.getLogger(__name__)
+logger.info("Async Reddit client Basic logging set")
+init_logger()
+
+DEFAULT_OAUTH_URL = "https://oauth.reddit.com"
+DEFAULT_REDDIT_URL = "https://www.reddit.com"
+MORECHILDREN_BATCH = 100  # Reddit rejects larger /api/morechildren requests
+
+
+class RedditNotFound(Exception):
+    """Raised when Reddit answers 403/404 for a resource (deleted, private or suspended)."""
+
+
+class AsyncRedditClient:
+    """
+    Application-only OAuth client over a shared aiohttp connection pool.
+
+    Every request draws from `rate_limiter` and feeds the X-Ratelimit headers
+    of the response back into it.
+    """
+
+    def __init__(self, CONFIG, rate_limiter):
+        client_config = CONFIG.get("async_client", {})
+        self.client_id = CONFIG["client_id"]
+        self.client_secret = CONFIG["client_secret"]
+        self.user_agent = CONFIG["user_agent"]
+        self.oauth_url = client_config.get("oauth_url", DEFAULT_OAUTH_URL).rstrip("/")
+        self.reddit_url = client_config.get("reddit_url", DEFAULT_REDDIT_URL).rstrip("/")
+        self.max_connections = int(client_config.get("max_connections", 100))
+        self.max_retries = int(client_config.get("max_retries", 3))
+        self.rate_limiter = rate_limiter
+        self.session = None
+        self._token = None
+        self._token_expires = 0.0
+        self._token_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"User-Agent": self.user_agent},
+            timeout=aiohttp.ClientTimeout(total=60),
+        )
+        logger.info(f"Opened async Reddit client pool ({self.max_connections} connections).")
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        logger.info("Closed async Reddit client pool.")
+
+    async def _authenticate(self):
+        async with self._token_lock:
+            if self._token and time.time() < self._token_expires:
+                return self._token
+            started = time.monotonic()
+            async with self.session.post(
+                f"{self.reddit_url}/api/v1/access_token",
+                auth=aiohttp.BasicAuth(self.client_id, self.client_secret),
+                data={"grant_type": "client_credentials"},
+            ) as response:
+                body = await response.read()
+                METRICS.observe_request("/api/v1/access_token", response.status, time.monotonic() - started, len(body))
+                response.raise_for_status()
+                payload = json.loads(body)
+            self._token = payload["access_token"]
+            # Refresh a minute early so in-flight requests never carry an expired token
+            self._token_expires = time.time() + float(payload.get("expires_in", 3600)) - 60
+            logger.info("Obtained application-only OAuth token.")
+            return self._token
+
+    async def get(self, path, params=None):
+        """
+        GETs an OAuth endpoint and returns the decoded JSON body.
+        429 responses pause the shared limiter and are retried.
+        """
+        params = dict(params or {})
+        params["raw_json"] = 1
+        endpoint = endpoint_label(path)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                METRICS.count_retry(endpoint)
+            token = await self._authenticate()
+            await self.rate_limiter.acquire_async()
+            started = time.monotonic()
+            async with self.session.get(
+                f"{self.oauth_url}{path}",
+                params=params,
+                headers={"Authorization": f"bearer {token}"},
+            ) as response:
+                body = await response.read()
+                METRICS.observe_request(endpoint, response.status, time.monotonic() - started, len(body))
+                self.rate_limiter.update_from_headers(response.headers)
+                if response.status == 429:
+                    retry_after = float(response.headers.get("retry-after", 3))
+                    logger.warning(f"Rate limit exceeded on {path}. Pausing all requests for {retry_after} seconds.")
+                    self.rate_limiter.pause(retry_after + 2)
+                    continue
+                if response.status == 401:
+                    self._token = None
+                    continue
+                if response.status in (403, 404):
+                    raise RedditNotFound(f"{path} returned {response.status}")
+                if response.status >= 500 and attempt < self.max_retries:
+                    METRICS.add_sleep("server_error_backoff", 2 ** attempt)
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                response.raise_for_status()
+                return json.loads(body)
+        raise aiohttp.ClientError(f"Giving up on {path} after {self.max_retries + 1} attempts")
+
+    async def iter_listing(self, path, limit, stop=None):
+        """
+        Pages through a listing endpoint, yielding up to `limit` child `data` dicts
+        as each page arrives. Paging ends early at the first item for which `stop(item)` is true.
+        """
+        count = 0
+        after = None
+        while count < limit:
+            params = {"limit": min(100, limit - count)}
+            if after:
+                params["after"] = after
+            payload = await self.get(path, params)
+            data = payload.get("data", {})
+            children = data.get("children", [])
+            for child in children[:limit - count]:
+                if stop is not None and stop(child["data"]):
+                    return
+                count += 1
+                yield child["data"]
+            after = data.get("after")
+            if not after or not children:
+                break
+
+    async def listing(self, path, limit, stop=None):
+        """
+        Returns up to `limit` child `data` dicts of a listing endpoint.
+        """
+        return [item async for item in self.iter_listing(path, limit, stop)]
+
+    def subreddit_submissions(self, subreddit_name, sort_method, limit, stop=None):
+        """
+        Async iterator over a subreddit listing.
+        """
+        return self.iter_listing(f"/r/{subreddit_name}/{sort_method}", limit, stop)
+
+    async def subreddit_moderators(self, subreddit_name):
+        """
+        Returns the names of the subreddit's moderators.
+        """
+        payload = await self.get(f"/r/{subreddit_name}/about/moderators")
+        return [moderator["name"] for moderator in payload.get("data", {}).get("children", [])]
+
+    async def subreddit_comments(self, subreddit_name, limit, stop=None):
+        """
+        Returns up to `limit` of the subreddit's newest comments, newest first.
+        """
+        return await self.listing(f"/r/{subreddit_name}/comments", limit, stop)
+
+    async def user_data_by_account_ids(self, fullnames):
+        """
+        Resolves name, karma and created_utc for up to 100 account fullnames in one request.
+        Returns {fullname: data}; suspended and deleted accounts are absent.
+        """
+        return await self.get("/api/user_data_by_account_ids", {"ids": ",".join(fullnames)})
+
+    async def redditor_about(self, redditor_name):
+        payload = await self.get(f"/user/{redditor_name}/about")
+        return payload.get("data", {})
+
+    async def redditor_comments(self, redditor_name, limit):
+        return await self.listing(f"/user/{redditor_name}/comments", limit)
+
+    async def redditor_submissions(self, redditor_name, limit):
+        return await self.listing(f"/user/{redditor_name}/submitted", limit)
+
+    async def submission_comments(self, submission_id, max_more_calls=None, min_child_count=0, time_budget=None):
+        """
+        Returns (comment `data` dicts, stubs left unexpanded, expansion calls made)
+        for a submission.
+
+        "load more comments" and "continue this thread" stubs are expanded
+        largest first until none are left, `max_more_calls` expansions were
+        made or `time_budget` seconds passed. Stubs with fewer than
+        `min_child_count` children are never expanded.
+        """
+        started = time.monotonic()
+        payload = await self.get(f"/comments/{submission_id}", {"limit": 500})
+        comments, more_stubs = flatten_comment_tree(payload[1]["data"]["children"])
+        seen = {comment["id"] for comment in comments}
+        expanded_parents = set()
+        skipped = [stub for stub in more_stubs if stub.get("count", 0) < min_child_count]
+        more_stubs = [stub for stub in more_stubs if stub.get("count", 0) >= min_child_count]
+        more_calls = 0
+
+        while more_stubs:
+            if max_more_calls is not None and more_calls >= max_more_calls:
+                break
+            if time_budget is not None and time.monotonic() - started >= time_budget:
+                break
+            more_stubs.sort(key=lambda stub: stub.get("count", 0), reverse=True)
+            stub = more_stubs.pop(0)
+            more_calls += 1
+            children = stub.get("children", [])
+            if not children:
+                # "continue this thread" stub: reload the subtree under its parent
+                parent_id = stub.get("parent_id", "")[3:]
+                if parent_id in expanded_parents:
+                    continue
+                expanded_parents.add(parent_id)
+                subtree = await self.get(f"/comments/{submission_id}", {"comment": parent_id, "limit": 500})
+                found, stubs = flatten_comment_tree(subtree[1]["data"]["children"])
+                comments.extend(c for c in found if c["id"] not in seen)
+                seen.update(c["id"] for c in found)
+                skipped.extend(s for s in stubs if s.get("count", 0) < min_child_count)
+                more_stubs.extend(s for s in stubs if s.get("count", 0) >= min_child_count)
+                continue
+            for start in range(0, len(children), MORECHILDREN_BATCH):
+                batch = children[start:start + MORECHILDREN_BATCH]
+                result = await self.get(
+                    "/api/morechildren",
+                    {"link_id": f"t3_{submission_id}", "children": ",".join(batch), "api_type": "json"},
+                )
+                things = result.get("json", {}).get("data", {}).get("things", [])
+                found, stubs = flatten_comment_tree(things)
+                comments.extend(c for c in found if c["id"] not in seen)
+                seen.update(c["id"] for c in found)
+                skipped.extend(s for s in stubs if s.get("count", 0) < min_child_count)
+                more_stubs.extend(s for s in stubs if s.get("count", 0) >= min_child_count)
+        return comments, skipped + more_stubs, more_calls
+
+
+def flatten_comment_tree(children):
+    """
+    Breadth-first walk over a comment listing, mirroring PRAW's CommentForest.list().
+    Returns (comment data dicts, "more" stub data dicts).
+    """
+    comments = []
+    more_stubs = []
+    queue = list(children)
+    while queue:
+        child = queue.pop(0)
+        kind, data = child.get("kind"), child.get("data", {})
+        if kind == "more":
+            more_stubs.append(data)
+        elif kind == "t1":
+            comments.append(data)
+            replies = data.get("replies")
+            if isinstance(replies, dict):
+                queue.extend(replies.get("data", {}).get("children", []))
+    return comments, more_stubs
@@ -0,0 +1,396 @@
+'''
+Scraper backend built on the native asyncio Reddit client.
+
+Selected with "scraper_backend": "async" in config.json. It produces the same
+redditor and submission records as the PRAW backend in tools/scraper.py, but
+every request is a coroutine on one event loop instead of a PRAW call in a
+worker thread.
+'''
+import asyncio
+import time
+from tools.async_reddit import AsyncRedditClient, RedditNotFound
+from tools.config.logger_config import init_logger, logging
+from tools.metrics import METRICS
+from tools.scraper import (
+    PARTIAL_REDDITOR_BATCH,
+    activity_entry,
+    compute_dormant_days,
+    expansion_stats,
+    get_expansion_limits,
+    get_history_limits,
+    get_submission_sort,
+    is_ignored_author,
+    prefilter_enabled,
+    rate_limiter,
+    remember_unavailable,
+    split_prefiltered_authors,
+    take_cached_authors,
+)
+from tools.profile_scheduler import load_profile_scheduler
+from tools.redditor_cache import MISSING_ATTRIBUTES, NOT_FOUND, SUSPENDED
+from tools.scrape_state import stop_at_mark
+from tools.sharding import FETCHED_ELSEWHERE
+from tools.single_flight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+logger.info("Async scraper Basic logging set")
+init_logger()
+
+SORT_METHODS = {"top", "hot", "new", "rising", "controversial"}
+
+
+def comment_record(comment):
+    """
+    Converts a raw comment `data` dict into the scraper's comment record.
+    """
+    link_id = comment.get("link_id", "")
+    return {
+        'comment_id': comment['id'],
+        'comment_author': comment.get('author') or 'Deleted',
+        'comment_created_utc': comment['created_utc'],
+        'body': comment.get('body', ''),
+        'comment_score': comment.get('score'),
+        'is_submitter': comment.get('is_submitter', False),
+        'edited': comment.get('edited', False),
+        'link_id': link_id[3:] if link_id.startswith("t3_") else link_id,
+        'author_fullname': comment.get('author_fullname'),
+    }
+
+
+def submission_record(submission, comments_data, comment_expansion=None):
+    """
+    Converts a raw submission `data` dict into the scraper's submission record.
+    """
+    return {
+        'submission_id': submission['id'],
+        'author': submission.get('author') if not is_ignored_author(submission.get('author')) else 'Deleted',
+        'title': submission.get('title'),
+        'submission_score': submission.get('score'),
+        'url': submission.get('url'),
+        'submission_created_utc': submission.get('created_utc'),
+        'over_18': submission.get('over_18'),
+        "comments": comments_data,
+        "comment_expansion": comment_expansion,
+    }
+
+
+async def fetch_subreddit_submissions(client, CONFIG, subreddit_name, high_water_marks=None, on_submission=None):
+    """
+    Fetches the configured listing of one subreddit, passing each kept submission
+    to `on_submission` as soon as its listing page arrives.
+    With high-water marks, only submissions that are new or whose comment count changed are kept.
+    """
+    sort_method, submissions_limit = get_submission_sort(CONFIG)
+    if sort_method not in SORT_METHODS:
+        raise ValueError(f"Unsupported sort method: {sort_method}")
+    stop = None
+    if high_water_marks is not None and stop_at_mark(CONFIG, sort_method):
+        newest = high_water_marks.newest(subreddit_name)
+        stop = lambda item: item["created_utc"] <= newest
+
+    kept = []
+    skipped = 0
+    try:
+        logger.debug(f"Fetching {sort_method} submissions from {subreddit_name} with limit {submissions_limit}.")
+        async for submission in client.subreddit_submissions(subreddit_name, sort_method, submissions_limit, stop):
+            if high_water_marks is not None and not high_water_marks.should_process(
+                subreddit_name, submission["id"], submission["created_utc"], submission.get("num_comments")
+            ):
+                skipped += 1
+                continue
+            kept.append(submission)
+            if on_submission is not None:
+                on_submission(submission)
+        if skipped:
+            logger.info(f"Skipped {skipped} unchanged submissions in '{subreddit_name}'.")
+        logger.info(f"Fetched {len(kept)} submissions from '{subreddit_name}'.")
+    except RedditNotFound:
+        logger.error(f"Failed to fetch submissions from '{subreddit_name}'. Check the subreddit name.")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while fetching submissions from '{subreddit_name}': {e}")
+    return kept
+
+
+async def fetch_redditor_info(client, CONFIG, redditor_name, redditor_cache=None):
+    """
+    Fetches a redditor's profile and recent history and builds the redditor record.
+    Accounts that are gone (404, suspended, missing attributes) go into the negative cache
+    and return None; other errors are raised, so the caller can try again later.
+    """
+    logger.debug(f"Fetching redditor info for: {redditor_name}")
+    if redditor_name.lower() == "deleted":
+        logger.debug(f"Redditor '{redditor_name}' is deleted, skipping.")
+        return None
+    try:
+        about = await client.redditor_about(redditor_name)
+        if about.get("is_suspended") or "link_karma" not in about:
+            logger.error(f"Redditor '{redditor_name}' is missing 'link_karma' attribute; skipping.")
+            remember_unavailable(redditor_cache, redditor_name, SUSPENDED)
+            return None
+        if "created_utc" not in about:
+            logger.error(f"redditor '{redditor_name}' has no creation date.")
+            remember_unavailable(redditor_cache, redditor_name, MISSING_ATTRIBUTES)
+            return None
+
+        comments_limit, submissions_limit = get_history_limits(CONFIG)
+        comments, submissions = await asyncio.gather(
+            client.redditor_comments(redditor_name, comments_limit),
+            client.redditor_submissions(redditor_name, submissions_limit),
+        )
+        dormant_days = compute_dormant_days(
+            about["created_utc"],
+            comments[-1]["created_utc"] if comments else None,
+            submissions[-1]["created_utc"] if submissions else None,
+        )
+        activity = [
+            activity_entry(kind, item["id"], item["created_utc"], item.get("subreddit"), item.get("score"))
+            for kind, items in (("comment", comments), ("submission", submissions))
+            for item in items
+        ]
+        return {
+            'redditor_id': about.get('id'),
+            'redditorname': about.get('name', redditor_name),
+            'created_utc': about['created_utc'],
+            'link_karma': about.get('link_karma'),
+            'comment_karma': about.get('comment_karma'),
+            'total_karma': about.get('total_karma'),
+            'is_employee': about.get('is_employee'),
+            'is_mod': about.get('is_mod'),
+            'is_gold': about.get('is_gold'),
+            'dormant_days': dormant_days,
+            'has_verified_email': about.get('has_verified_email', False),
+            'accept_followers': about.get('accept_followers', False),
+            'redditor_is_subscriber': about.get('is_subscriber', False),
+            'activity': activity,
+        }
+    except RedditNotFound as e:
+        logger.error(f"Redditor '{redditor_name}' not found: {e}")
+        remember_unavailable(redditor_cache, redditor_name, NOT_FOUND)
+        return None
+
+
+async def get_redditor_info(client, CONFIG, redditor_name, redditor_cache=None):
+    """
+    Returns redditor info from the persistent cache when it is fresh, otherwise fetches it.
+    Accounts in the negative cache are skipped without any request.
+    """
+    if redditor_cache is not None:
+        if (cached_info := redditor_cache.get(redditor_name)) is not None:
+            logger.debug(f"Using cached redditor info for {redditor_name}")
+            return cached_info
+        if (reason := redditor_cache.get_unavailable(redditor_name)) is not None:
+            logger.debug(f"Skipping {redditor_name}, cached as unavailable ({reason})")
+            return None
+
+    redditor_info = await fetch_redditor_info(client, CONFIG, redditor_name, redditor_cache)
+    if redditor_info and redditor_cache is not None:
+        redditor_cache.put(redditor_name, redditor_info)
+    return redditor_info
+
+
+async def fetch_partial_redditors(client, fullnames):
+    """
+    Resolves karma and created_utc for many accounts, PARTIAL_REDDITOR_BATCH per request.
+    Returns ({fullname: data}, fullnames of the batches whose request failed).
+    """
+    batches = [
+        fullnames[start:start + PARTIAL_REDDITOR_BATCH]
+        for start in range(0, len(fullnames), PARTIAL_REDDITOR_BATCH)
+    ]
+    results = {}
+    failed = set()
+    for batch, outcome in zip(batches, await asyncio.gather(
+        *(client.user_data_by_account_ids(batch) for batch in batches), return_exceptions=True
+    )):
+        if isinstance(outcome, Exception):
+            logger.error(f"Batch lookup of {len(batch)} redditors failed: {outcome}")
+            failed.update(batch)
+            continue
+        results.update(outcome)
+    return results, failed
+
+
+async def fetch_moderators(client, subreddit_names):
+    """
+    Fetches the moderator list of every target subreddit once, concurrently.
+    Returns the lowercased names of all their moderators.
+    """
+    moderators = set()
+    for subreddit_name, outcome in zip(subreddit_names, await asyncio.gather(
+        *(client.subreddit_moderators(name) for name in subreddit_names), return_exceptions=True
+    )):
+        if isinstance(outcome, Exception):
+            logger.warning(f"Could not fetch the moderators of '{subreddit_name}': {outcome}")
+            continue
+        moderators.update(name.lower() for name in outcome)
+    logger.info(f"Loaded {len(moderators)} moderators of {len(subreddit_names)} subreddits.")
+    return frozenset(moderators)
+
+
+async def fetch_authors(client, CONFIG, authors, writer, redditor_cache=None, redditor_flights=None, moderators=frozenset()):
+    """
+    Fetches and writes every author in `authors` ({name: fullname}) that has not been written yet,
+    batch-resolving and prefiltering them first when the profile prefilter is on
+    (authors of a failed batch lookup go straight to the per-user fetch).
+    Moderators of the target subreddits (see `fetch_moderators`) are skipped before any request.
+    `redditor_flights` makes concurrent callers share one fetch per redditor.
+    Returns the names whose fetch failed; they are not remembered, so a later call retries them.
+    """
+    pending = {
+        name: fullname for name, fullname in authors.items()
+        if name != 'Deleted' and not writer.has_redditor(name) and name.lower() not in moderators
+    }
+    if prefilter_enabled(CONFIG):
+        pending, cached = take_cached_authors(pending, redditor_cache)
+        for redditor_name, redditor_info in cached.items():
+            await writer.write_redditor_async(redditor_name, redditor_info)
+        fullnames = [fullname for fullname in pending.values() if fullname]
+        partial_data, failed_fullnames = await fetch_partial_redditors(client, fullnames) if fullnames else ({}, set())
+        pending, light_records = split_prefiltered_authors(
+            CONFIG, pending, partial_data, redditor_cache, failed_fullnames
+        )
+        for redditor_name, redditor_info in light_records.items():
+            await writer.write_redditor_async(redditor_name, redditor_info)
+
+    async def fetch_author(redditor_name):
+        if not await writer.reserve_redditor_async(redditor_name):
+            return FETCHED_ELSEWHERE  # another scraper shard wrote it meanwhile
+        written = False
+        try:
+            redditor_info = await get_redditor_info(client, CONFIG, redditor_name, redditor_cache)
+            if redditor_info:
+                await writer.write_redditor_async(redditor_name, redditor_info)
+                written = True
+        finally:
+            if not written:
+                writer.release_redditor(redditor_name)
+        return redditor_info
+
+    failed = []
+
+    async def fetch_once(redditor_name):
+        try:
+            if redditor_flights is None:
+                await fetch_author(redditor_name)
+            elif not writer.has_redditor(redditor_name):  # another task may have written it meanwhile
+                await redditor_flights.do(redditor_name, fetch_author, redditor_name)
+        except Exception as e:
+            logger.error(f"Fetching redditor '{redditor_name}' failed: {e}")
+            failed.append(redditor_name)
+
+    await asyncio.gather(*(fetch_once(name) for name in pending))
+    return failed
+
+
+async def fetch_and_process_comments(client, CONFIG, submission_id):
+    """
+    Fetches the comment tree of a submission, within the configured expansion budget.
+    Returns (comment records, comment-expansion stats).
+    """
+    max_more_calls, min_child_count, time_budget = get_expansion_limits(CONFIG)
+    started = time.monotonic()
+    try:
+        comments, skipped, more_calls = await client.submission_comments(
+            submission_id, max_more_calls, min_child_count, time_budget
+        )
+        stats = expansion_stats(more_calls, [stub.get("count", 0) for stub in skipped], started)
+        if skipped:
+            logger.info(
+                f"Comment tree of {submission_id} truncated: {stats['skipped_stubs']} stubs "
+                f"(~{stats['skipped_comments']} comments) skipped after {more_calls} expansion calls."
+            )
+        logger.debug(f"Processing comments for submission {submission_id}")
+        return [
+            comment_record(comment)
+            for comment in comments
+            if not is_ignored_author(comment.get("author"))
+        ], stats
+    except Exception as e:
+        logger.error(f"Error fetching comments for submission {submission_id}: {e}")
+        return [], None
+
+
+async def fetch_scheduled_authors(client, CONFIG, scheduler, writer, redditor_cache=None, redditor_flights=None, moderators=frozenset()):
+    """
+    Worker loop of the profile phase: fetches the scheduler's authors, chunk by chunk
+    in priority order, until they are all done or the budget is spent.
+    """
+    while (chunk := scheduler.next_chunk()) is not None:
+        with METRICS.phase("redditors"):
+            await fetch_authors(client, CONFIG, chunk, writer, redditor_cache, redditor_flights, moderators)
+
+
+async def process_submission(client, CONFIG, submission, writer, redditor_cache=None, redditor_flights=None,
+                             moderators=frozenset(), scheduler=None):
+    """
+    Processes a single submission, fetching its comments and every new author concurrently.
+    With a profile `scheduler`, the authors are only recorded in it and fetched
+    later, in priority order.
+    """
+    submission_id = submission['id']
+    try:
+        with METRICS.phase("comments"):
+            comments_data, expansion = await fetch_and_process_comments(client, CONFIG, submission_id)
+        record = submission_record(submission, comments_data, expansion)
+        if scheduler is not None:
+            scheduler.add_submission(record, submission.get('author_fullname'))
+        else:
+            authors = {}
+            author_name = submission.get('author')
+            if not is_ignored_author(author_name):
+                authors[author_name] = submission.get('author_fullname')
+            for comment in comments_data:
+                authors.setdefault(comment['comment_author'], comment.get('author_fullname'))
+            with METRICS.phase("redditors"):
+                await fetch_authors(client, CONFIG, authors, writer, redditor_cache, redditor_flights, moderators)
+
+        await writer.write_submission_async(record)
+        logger.debug(f"Processed submission {submission_id}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while processing submission '{submission_id}': {e}")
+
+
+async def scrape_with_async_client(CONFIG, writer, redditor_cache=None, high_water_marks=None):
+    """
+    Scrapes every configured subreddit with the asyncio client, streaming
+    records out through `writer`. All subreddit listings are fetched
+    concurrently and feed the processing workers through a queue.
+    """
+    async with AsyncRedditClient(CONFIG, rate_limiter) as client:
+        queue = asyncio.Queue()
+        subreddit_names = CONFIG["subreddit"].split('+')
+        max_tasks = CONFIG.get("max_concurrent_requests", 4)
+        redditor_flights = AsyncSingleFlight()
+        moderators = await fetch_moderators(client, subreddit_names)
+        scheduler = load_profile_scheduler(CONFIG)
+
+        def enqueue(submission):
+            if not writer.has_submission(submission['id']):
+                queue.put_nowait(submission)
+
+        async def fetch_listing(subreddit_name):
+            with METRICS.phase("listing"):
+                await fetch_subreddit_submissions(client, CONFIG, subreddit_name, high_water_marks, enqueue)
+
+        async def process_submissions_from_queue():
+            while (submission := await queue.get()) is not None:
+                await process_submission(
+                    client, CONFIG, submission, writer, redditor_cache, redditor_flights, moderators, scheduler
+                )
+
+        logger.info(f"Fetching submissions from {len(subreddit_names)} subreddits...")
+        workers = [asyncio.create_task(process_submissions_from_queue()) for _ in range(max_tasks)]
+        await asyncio.gather(*(fetch_listing(name) for name in subreddit_names))
+        for _ in workers:
+            queue.put_nowait(None)  # One stop marker per worker once every listing is queued
+        await asyncio.gather(*workers)
+
+        if scheduler is not None:
+            # Every comment tree is in: fetch the authors most suspicious first, within the budget
+            scheduler.start_fetching(PARTIAL_REDDITOR_BATCH if prefilter_enabled(CONFIG) else 1)
+            await asyncio.gather(*(
+                fetch_scheduled_authors(client, CONFIG, scheduler, writer, redditor_cache, redditor_flights, moderators)
+                for _ in range(max_tasks)
+            ))
+            scheduler.log_summary()
+        logger.info(f"Skipped {redditor_flights.deduplicated} duplicate redditor fetches.")
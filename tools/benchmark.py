@@ -0,0 +1,158 @@
+'''
+Scraper throughput benchmark against the offline fake Reddit API.
+
+Starts tools.fake_reddit in-process, writes a config that points the scraper
+at it and runs `run_scraper_async` in a child process inside a scratch
+directory, so real output files, checkpoints and caches are left alone.
+Reports requests/sec, items/sec and the wall time of each phase (listing,
+comment trees, redditor profiles) as seen by the server.
+
+    python -m tools.benchmark --backend async --subreddits 3 --submissions 50 --latency-ms 50
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from tools.fake_reddit import add_server_arguments, build_server
+from tools.scrape_output import REDDITOR_OUTPUT, SUBMISSION_OUTPUT, find_output, iter_records
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("Benchmark Basic logging set")
+init_logger()
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CONFIG = os.path.join(REPO_ROOT, "tools", "config", "Rename_to_config.json")
+PHASES = {
+    "listing": ("listing",),
+    "comments": ("comments", "morechildren"),
+    "redditors": ("user_batch", "user_about", "user_history"),
+}
+
+
+def benchmark_config(base_config, server, args):
+    """
+    Copy of `base_config` aimed at the fake server, with caches and incremental state off.
+    """
+    config = dict(base_config)
+    config.pop("notes", None)
+    config.update(
+        client_id="benchmark",
+        client_secret="benchmark",
+        subreddit="+".join(server.data.subreddit_names),
+        scraper_backend=args.backend,
+        oauth_url=server.url,
+        reddit_url=server.url,
+        submission_sort={"method": "new", "limit": args.submissions},
+    )
+    if args.concurrency:
+        config["max_concurrent_requests"] = args.concurrency
+    config["credentials"] = [
+        {"client_id": f"benchmark-{index + 1}", "client_secret": "benchmark"} for index in range(args.credentials)
+    ] if args.credentials > 1 else []
+    config["async_client"] = dict(config.get("async_client", {}), oauth_url=server.url, reddit_url=server.url)
+    config["rate_limit"] = dict(
+        config.get("rate_limit", {}),
+        requests_per_minute=args.requests_per_minute,
+        burst=max(1, args.requests_per_minute // 60),
+    )
+    config["redditor_cache"] = dict(config.get("redditor_cache", {}), enabled=args.with_cache)
+    config["incremental"] = dict(config.get("incremental", {}), enabled=False)
+    config["output"] = dict(config.get("output", {}), sink="files")
+    return config
+
+
+def run_scraper_process(config_path, workdir):
+    """
+    Runs the scraper in a child process and returns (exit code, wall seconds).
+    """
+    env = dict(os.environ, REDDIT_SCRAPER_CONFIG=config_path)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    started = time.monotonic()
+    with open(os.path.join(workdir, "scraper.log"), "w", encoding="utf-8") as log_file:
+        result = subprocess.run(
+            [sys.executable, "-c", "from tools.scraper import run_scraper; run_scraper()"],
+            cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+        )
+    return result.returncode, time.monotonic() - started
+
+
+def count_output(workdir):
+    """
+    Returns (submissions, comments, redditors) written by the benchmark run.
+    """
+    output_dir = os.path.join(workdir, "analysis_results")
+    submissions = comments = redditors = 0
+    if path := find_output(SUBMISSION_OUTPUT, output_dir):
+        for record in iter_records(path):
+            submissions += 1
+            comments += len(record.get("comments", []))
+    if path := find_output(REDDITOR_OUTPUT, output_dir):
+        redditors = sum(1 for _ in iter_records(path))
+    return submissions, comments, redditors
+
+
+def print_report(args, wall_seconds, stats, throttled, counts):
+    submissions, comments, redditors = counts
+    total_requests = sum(entry["requests"] for entry in stats.values())
+    per_second = lambda count: count / wall_seconds if wall_seconds else 0.0
+    print(f"\nScraper benchmark: backend={args.backend} x {args.credentials} credentials, {args.subreddits} subreddits x {args.submissions} submissions, "
+          f"latency {args.latency_ms:g} ms (+{args.jitter_ms:g} jitter)")
+    print(f"  wall time      {wall_seconds:10.2f} s")
+    print(f"  requests       {total_requests:10d}   {per_second(total_requests):9.1f} req/s")
+    print(f"  throttled      {throttled:10d}")
+    print(f"  submissions    {submissions:10d}   {per_second(submissions):9.1f} /s")
+    print(f"  comments       {comments:10d}   {per_second(comments):9.1f} /s")
+    print(f"  redditors      {redditors:10d}   {per_second(redditors):9.1f} /s")
+    print(f"\n  {'phase':<12}{'requests':>10}{'MB':>9}{'wall s':>9}{'req/s':>9}")
+    for phase, endpoints in PHASES.items():
+        entries = [stats[endpoint] for endpoint in endpoints if endpoint in stats]
+        if not entries:
+            continue
+        requests = sum(entry["requests"] for entry in entries)
+        megabytes = sum(entry["bytes"] for entry in entries) / 1e6
+        phase_wall = max(entry["last"] for entry in entries) - min(entry["first"] for entry in entries)
+        rate = requests / phase_wall if phase_wall else 0.0
+        print(f"  {phase:<12}{requests:>10d}{megabytes:>9.2f}{phase_wall:>9.2f}{rate:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against the offline fake Reddit API")
+    add_server_arguments(parser)
+    parser.add_argument("--backend", choices=("praw", "async"), default="praw")
+    parser.add_argument("--concurrency", type=int, default=0, help="override max_concurrent_requests")
+    parser.add_argument("--credentials", type=int, default=1, help="scrape with this many sharded credentials")
+    parser.add_argument("--requests-per-minute", type=int, default=60000, help="client-side rate limit")
+    parser.add_argument("--with-cache", action="store_true", help="keep the redditor cache enabled")
+    parser.add_argument("--config", default=SAMPLE_CONFIG, help="base config (defaults to the sample config)")
+    parser.add_argument("--workdir", help="scratch directory for the run (default: a new temp dir)")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        base_config = json.load(f)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="scraper-benchmark-")
+    os.makedirs(workdir, exist_ok=True)
+
+    server = build_server(args)
+    server.start_in_thread()
+    try:
+        config_path = os.path.join(workdir, "benchmark_config.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(benchmark_config(base_config, server, args), f, indent=2)
+
+        logger.info(f"Running the '{args.backend}' scraper against {server.url} in {workdir}")
+        returncode, wall_seconds = run_scraper_process(config_path, workdir)
+        if returncode != 0:
+            logger.error(f"Scraper exited with code {returncode}; see {os.path.join(workdir, 'scraper.log')}")
+        print_report(args, wall_seconds, server.stats.snapshot(), server.stats.throttled, count_output(workdir))
+        print(f"\n  scraper log and output: {workdir}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
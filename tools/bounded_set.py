@@ -0,0 +1,52 @@
+'''
+Size-bounded set for long-running processes.
+
+The ingest daemon remembers stream item IDs and the authors it has already
+profiled. Over days of streaming, plain sets would grow without limit, so
+BoundedSet keeps only the `max_size` most recently added members (like
+PRAW's stream BoundedSet). A forgotten author is simply fetched again the
+next time it shows up.
+'''
+from collections import OrderedDict
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("Bounded set Basic logging set")
+init_logger()
+
+
+class BoundedSet:
+    """
+    Set of at most `max_size` members (None for no limit) that forgets the least recently added first.
+    """
+
+    def __init__(self, members=(), max_size=None):
+        self.max_size = max_size
+        self._members = OrderedDict()
+        self.update(members)
+
+    def __contains__(self, member):
+        return member in self._members
+
+    def __iter__(self):
+        return iter(list(self._members))
+
+    def __len__(self):
+        return len(self._members)
+
+    def add(self, member):
+        self._members[member] = None
+        self._members.move_to_end(member)
+        if self.max_size is not None and len(self._members) > self.max_size:
+            self._members.popitem(last=False)
+
+    def update(self, members):
+        for member in members:
+            self.add(member)
+
+    def discard(self, member):
+        self._members.pop(member, None)
+
+    def difference_update(self, members):
+        for member in members:
+            self.discard(member)
@@ -0,0 +1,116 @@
+'''
+COPY-based bulk loading into PostgreSQL.
+
+`copy_upsert` streams rows into a temporary staging table with COPY
+(asyncpg's `copy_records_to_table`) and merges the staging table into the
+target table with a single INSERT ... SELECT ... ON CONFLICT DO UPDATE.
+Compared with `executemany` upserts, the rows travel as one binary COPY
+stream and the server resolves the conflicts set-based, instead of
+planning and executing one INSERT per row.
+
+With `skip_existing`, rows whose key is already in the target table are
+left alone instead of updated: the merge anti-joins the staging table
+against the target, so the existence check is one set-based statement
+rather than a SELECT per row.
+
+The merge inserts in key order, so loads running concurrently on several
+connections take their row locks in the same order and cannot deadlock
+each other.
+
+Rows are the tuples built by `tools.db_sink` (`redditor_row`,
+`activity_rows`, `submission_row`, `comment_row`), in TABLE_COLUMNS order.
+'''
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("Bulk loader Basic logging set")
+init_logger()
+
+# table -> (columns in row order, conflict key)
+TABLE_COLUMNS = {
+    "users": (
+        (
+            "redditor_id", "redditor", "created_utc", "link_karma", "comment_karma", "total_karma",
+            "is_employee", "is_mod", "is_gold", "dormant_days", "has_verified_email",
+            "accepts_followers", "redditor_is_subscriber",
+        ),
+        ("redditor_id",),
+    ),
+    "user_activity": (
+        ("kind", "item_id", "redditor_id", "activity_utc", "subreddit", "score"),
+        ("kind", "item_id"),
+    ),
+    "submissions": (
+        ("submission_id", "author", "title", "submission_score", "url", "submission_created_utc", "over_18"),
+        ("submission_id",),
+    ),
+    "comments": (
+        (
+            "comment_id", "comment_author", "comment_created_utc", "body", "comment_score",
+            "is_submitter", "edited", "link_id",
+        ),
+        ("comment_id",),
+    ),
+}
+
+
+def merge_sql(table, staging_table, skip_existing=False):
+    """
+    INSERT ... SELECT that upserts every row of `staging_table` into `table`,
+    or with `skip_existing` inserts only the rows whose key is not in `table` yet.
+    """
+    columns, key = TABLE_COLUMNS[table]
+    column_list = ", ".join(columns)
+    if skip_existing:
+        key_match = " AND ".join(f"existing.{column} = staged.{column}" for column in key)
+        return f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM {staging_table} AS staged
+        WHERE NOT EXISTS (SELECT 1 FROM {table} AS existing WHERE {key_match})
+        ORDER BY {", ".join(key)}
+        ON CONFLICT ({", ".join(key)}) DO NOTHING;
+    """
+    updates = ",\n            ".join(f"{column} = EXCLUDED.{column}" for column in columns if column not in key)
+    return f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM {staging_table}
+        ORDER BY {", ".join(key)}
+        ON CONFLICT ({", ".join(key)}) DO UPDATE SET
+            {updates};
+    """
+
+
+def unique_rows(table, rows):
+    """
+    Keeps the last row per conflict key: one INSERT ... ON CONFLICT cannot update the same row twice.
+    """
+    columns, key = TABLE_COLUMNS[table]
+    positions = [columns.index(column) for column in key]
+    unique = {}
+    for row in rows:
+        unique[tuple(row[position] for position in positions)] = row
+    return list(unique.values())
+
+
+async def copy_upsert(conn, table, rows, skip_existing=False):
+    """
+    Upserts `rows` into `table` through a COPY-loaded staging table; with
+    `skip_existing`, rows already in `table` are not updated.
+    Runs in its own transaction (a savepoint when one is already open).
+
+    Returns:
+        int: the number of rows inserted or updated.
+    """
+    rows = unique_rows(table, rows)
+    if not rows:
+        return 0
+    columns, _ = TABLE_COLUMNS[table]
+    staging_table = f"staging_{table}"
+    async with conn.transaction():
+        await conn.execute(f"CREATE TEMP TABLE {staging_table} (LIKE {table} INCLUDING DEFAULTS)")
+        await conn.copy_records_to_table(staging_table, records=rows, columns=columns)
+        status = await conn.execute(merge_sql(table, staging_table, skip_existing))
+        await conn.execute(f"DROP TABLE {staging_table}")
+    merged = int(status.split()[-1])  # "INSERT 0 <rows>"
+    logger.debug(f"Merged {merged} of {len(rows)} staged rows into '{table}'.")
+    return merged
@@ -0,0 +1,81 @@
+'''
+Checkpoint journal for long scrape runs.
+
+Every submission ID and redditor name that has been written to the scraper
+output is appended to `analysis_results/scrape_checkpoint.jsonl`. Running the
+scraper with `--resume` reloads the journal and skips everything already done,
+so a run that died halfway does not spend its API budget again.
+'''
+import json
+import os
+import threading
+from tools.config.logger_config import init_logger, logging
+from tools.scrape_output import truncate_partial_line
+
+logger = logging.getLogger(__name__)
+logger.info("Checkpoint Basic logging set")
+init_logger()
+
+CHECKPOINT_PATH = 'analysis_results/scrape_checkpoint.jsonl'
+
+
+class CheckpointJournal:
+    """
+    Append-only record of finished submissions and redditors.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, resume=False):
+        self.path = path
+        self.submissions = set()
+        self.redditors = set()
+        self._lock = threading.Lock()
+
+        checkpoint_dir = os.path.dirname(path)
+        if checkpoint_dir and not os.path.exists(checkpoint_dir):
+            os.makedirs(checkpoint_dir)
+
+        if resume and os.path.exists(path):
+            # Appending behind a line cut short by a crash would garble the next entry too
+            truncate_partial_line(path)
+            self._load()
+            logger.info(
+                f"Resuming from checkpoint: {len(self.submissions)} submissions and "
+                f"{len(self.redditors)} redditors already done."
+            )
+        elif resume:
+            logger.warning(f"No checkpoint found at {path}; starting a fresh run.")
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping an unreadable checkpoint entry in {self.path}")
+                    continue
+                if entry.get("type") == "submission":
+                    self.submissions.add(entry["id"])
+                elif entry.get("type") == "redditor":
+                    self.redditors.add(entry["id"])
+
+    def _append(self, kind, item_id):
+        self._file.write(json.dumps({"type": kind, "id": item_id}) + "\n")
+        self._file.flush()
+
+    def submission_done(self, submission_id):
+        return submission_id in self.submissions
+
+    def mark_submission(self, submission_id):
+        with self._lock:
+            self.submissions.add(submission_id)
+            self._append("submission", submission_id)
+
+    def mark_redditor(self, redditor_name):
+        with self._lock:
+            self.redditors.add(redditor_name)
+            self._append("redditor", redditor_name)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -3,8 +3,13 @@ import os
 from types import MappingProxyType
 from typing import Any, Mapping
 
+CONFIG_PATH_ENV = "REDDIT_SCRAPER_CONFIG"
+
 def load_config() -> Mapping[str, Any]:
-    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    # REDDIT_SCRAPER_CONFIG points a run at another config file (e.g. the benchmark's)
+    config_path = os.environ.get(CONFIG_PATH_ENV) or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "config.json"
+    )
     try:
         with open(config_path, "r", encoding="utf-8") as f:
             return json.load(f)
@@ -2,9 +2,16 @@
 This file handles the Reddit login and configuration options
 '''
 import praw
+import prawcore
 import logging
 import json
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from tools.config.logger_config import init_logger
+from tools.metrics import METRICS, endpoint_label
 
 # Initialize logging
 logger = logging.getLogger(__name__)
@@ -16,7 +23,8 @@ def load_config():
     Load the configuration from the config file.
     """
     try:
-        with open('tools/config/config.json', 'r', encoding='utf-8') as f:
+        config_path = os.environ.get('REDDIT_SCRAPER_CONFIG', 'tools/config/config.json')
+        with open(config_path, 'r', encoding='utf-8') as f:
             config = json.load(f)
         logger.info("Config loaded successfully")
         return config
@@ -28,15 +36,81 @@ def load_config():
         logger.error(f"Unexpected error loading config: {e}")
     return None
 
+class MeteredRequestor(prawcore.Requestor):
+    """
+    prawcore Requestor that records every HTTP request PRAW makes in METRICS.
+    """
+
+    def request(self, *args, **kwargs):
+        method, url = (list(args) + [kwargs.get("method"), kwargs.get("url")])[:2]
+        endpoint = endpoint_label(url or "")
+        started = time.monotonic()
+        try:
+            response = super().request(*args, **kwargs)
+        except prawcore.exceptions.RequestException:
+            METRICS.observe_request(endpoint, "error", time.monotonic() - started, 0)
+            raise
+        METRICS.observe_request(endpoint, response.status_code, time.monotonic() - started, len(response.content))
+        if response.status_code in (500, 502, 503, 504):
+            # prawcore retries these itself
+            METRICS.count_retry(endpoint)
+        return response
+
+def create_session(config):
+    """
+    Builds the pooled requests.Session PRAW sends every request through.
+
+    The pool holds one keep-alive connection per scraper thread, so threads
+    reuse connections instead of opening new TLS sessions. The adapter only
+    retries failed connects (refused, timed out), with exponential backoff,
+    since no request has been sent yet. Read errors and 5xx responses are
+    already retried by prawcore and 429s are left to the scraper's rate
+    limiter, which pauses every worker at once, so they are not retried here.
+    """
+    session_config = config.get('http_session', {})
+    # Listing threads and processing workers (max_concurrent_requests each) run side by side
+    default_pool = 2 * int(config.get('max_concurrent_requests', 4))
+    try:
+        pool_maxsize = int(session_config.get('pool_maxsize') or default_pool)
+        max_retries = int(session_config.get('max_retries', 3))
+        backoff_factor = float(session_config.get('backoff_factor', 0.5))
+    except (ValueError, TypeError):
+        logger.warning("Invalid http_session settings in config; using the defaults.")
+        pool_maxsize, max_retries, backoff_factor = default_pool, 3, 0.5
+
+    # Retrying reads or statuses here as well would multiply prawcore's own retries
+    retry_strategy = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        status=0,
+        other=0,
+        status_forcelist=[],
+        backoff_factor=backoff_factor,
+        raise_on_status=False,  # hand every response to prawcore as it is
+    )
+    # PRAW only talks to the OAuth host and the token host
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize, max_retries=retry_strategy)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    logger.info(f"HTTP session pool: {pool_maxsize} connections per host, {max_retries} connect retries.")
+    return session
+
 def login(config):
     """
     Log in to Reddit using PRAW in read-only mode.
+    Optional 'oauth_url' / 'reddit_url' keys point PRAW at another API host (e.g. tools.fake_reddit).
     """
     try:
+        endpoints = {key: config[key] for key in ('oauth_url', 'reddit_url') if key in config}
         reddit = praw.Reddit(
             client_id=config['client_id'],
             client_secret=config['client_secret'],
-            user_agent=config['user_agent']
+            user_agent=config['user_agent'],
+            requestor_class=MeteredRequestor,
+            requestor_kwargs={'session': create_session(config)},
+            **endpoints
         )
         logger.info(f"Logged in as read-only: {reddit.read_only}")
         return reddit
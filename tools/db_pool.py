@@ -0,0 +1,116 @@
+'''
+Shared asyncpg connection pool for the pipeline's database stages.
+
+JSON-to-DB and the analysis / Excel stages borrow connections from one pool
+instead of each opening and closing its own connection. The pool is created
+on first use from the 'database' block and closed by `close_pool()` when the
+run ends, so stages and their queries can run concurrently without
+reconnecting. `pool.fetch(...)` borrows a connection for a single query, so
+two queries given the pool run on two connections at once.
+
+Every pooled connection keeps asyncpg's prepared-statement cache: a query a
+stage runs again is parsed and planned once per connection.
+
+Optional 'database' settings: pool_min_size (1), pool_max_size (10),
+statement_cache_size (statements cached per connection, 100; 0 disables the
+cache) and command_timeout (seconds per query, no limit by default).
+'''
+import asyncio
+import asyncpg
+from tools.config.config_loader import CONFIG
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("DB pool Basic logging set")
+init_logger()
+
+_pool_task = None  # task creating the pool, bound to the event loop that started it
+
+
+def get_pool_settings(db_config):
+    """
+    Returns (min_size, max_size, statement_cache_size, command_timeout) from the 'database' block.
+    """
+    try:
+        min_size = int(db_config.get("pool_min_size", 1))
+        max_size = max(min_size, int(db_config.get("pool_max_size", 10)))
+        statement_cache_size = int(db_config.get("statement_cache_size", 100))
+        command_timeout = db_config.get("command_timeout")
+        command_timeout = float(command_timeout) if command_timeout is not None else None
+    except (ValueError, TypeError):
+        logger.warning("Invalid pool settings in the database block of CONFIG; defaulting to 1-10 connections.")
+        min_size, max_size, statement_cache_size, command_timeout = 1, 10, 100, None
+    return min_size, max_size, statement_cache_size, command_timeout
+
+
+async def create_pool(db_config):
+    min_size, max_size, statement_cache_size, command_timeout = get_pool_settings(db_config)
+    pool = await asyncpg.create_pool(
+        user=db_config['user'],
+        password=db_config['password'],
+        database=db_config['dbname'],
+        host=db_config['host'],
+        port=db_config.get('port', 5432),
+        min_size=min_size,
+        max_size=max_size,
+        statement_cache_size=statement_cache_size,
+        command_timeout=command_timeout,
+    )
+    logger.info(f"Database connection pool ready ({min_size}-{max_size} connections).")
+    return pool
+
+
+async def get_pool():
+    """
+    Returns the shared pool, creating it on first use in the running event loop.
+    Raises when the database is unreachable.
+    """
+    global _pool_task
+    loop = asyncio.get_running_loop()
+    if _pool_task is None or _pool_task.get_loop() is not loop:
+        _pool_task = loop.create_task(create_pool(CONFIG["database"]))
+    task = _pool_task
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        if _pool_task is task:
+            _pool_task = None  # Let the next stage try again
+        raise
+
+
+async def connect_to_database():
+    """
+    Returns the shared pool, or None (logged) when the database is unreachable.
+    """
+    try:
+        return await get_pool()
+    except Exception as e:
+        logger.error(f"Database connection failed: {e}")
+        return None
+
+
+async def close_pool():
+    """
+    Closes the shared pool if the running event loop created one.
+    """
+    global _pool_task
+    task = _pool_task
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        return
+    _pool_task = None
+    try:
+        pool = await task
+    except Exception:
+        return
+    await pool.close()
+    logger.info("Database connection pool closed.")
+
+
+async def closing_pool(awaitable):
+    """
+    Awaits `awaitable`, then closes the pool: for scripts that run a single stage with asyncio.run.
+    """
+    try:
+        return await awaitable
+    finally:
+        await close_pool()
@@ -0,0 +1,520 @@
+'''
+Streams scraper records straight into PostgreSQL.
+
+With `"sink": "database"` in the 'output' block, the scraper hands every
+redditor and submission record to a DatabaseSink instead of the JSONL files.
+Records go through a bounded asyncio queue to a writer running its own event
+loop and connection in a background thread, which upserts them in batches
+while scraping continues. When the database falls behind, the full queue
+holds back the scraper workers until it catches up; coroutines use the
+`*_async` writes, which wait for room without blocking their event loop.
+If the writer stops on an unexpected error, every write and flush raises it
+instead of waiting on the queue forever.
+'''
+import asyncio
+import concurrent.futures
+import threading
+import time
+import asyncpg
+from tools.bounded_set import BoundedSet
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("DB sink Basic logging set")
+init_logger()
+
+CONSUMER_CHECK_SECONDS = 1.0  # how often a blocked write checks that the writer is still running
+
+UPSERT_USERS_SQL = """
+    INSERT INTO users (
+        redditor_id, redditor, created_utc, link_karma, comment_karma, total_karma,
+        is_employee, is_mod, is_gold, dormant_days, has_verified_email,
+        accepts_followers, redditor_is_subscriber
+    )
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+    ON CONFLICT (redditor_id) DO UPDATE SET
+        redditor = EXCLUDED.redditor,
+        created_utc = EXCLUDED.created_utc,
+        link_karma = EXCLUDED.link_karma,
+        comment_karma = EXCLUDED.comment_karma,
+        total_karma = EXCLUDED.total_karma,
+        is_employee = EXCLUDED.is_employee,
+        is_mod = EXCLUDED.is_mod,
+        is_gold = EXCLUDED.is_gold,
+        dormant_days = EXCLUDED.dormant_days,
+        has_verified_email = EXCLUDED.has_verified_email,
+        accepts_followers = EXCLUDED.accepts_followers,
+        redditor_is_subscriber = EXCLUDED.redditor_is_subscriber;
+"""
+
+UPSERT_ACTIVITY_SQL = """
+    INSERT INTO user_activity (kind, item_id, redditor_id, activity_utc, subreddit, score)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    ON CONFLICT (kind, item_id) DO UPDATE SET
+        redditor_id = EXCLUDED.redditor_id,
+        activity_utc = EXCLUDED.activity_utc,
+        subreddit = EXCLUDED.subreddit,
+        score = EXCLUDED.score;
+"""
+
+UPSERT_SUBMISSIONS_SQL = """
+    INSERT INTO submissions (
+        submission_id,
+        author,
+        title,
+        submission_score,
+        url,
+        submission_created_utc,
+        over_18
+    )
+    VALUES ($1, $2, $3, $4, $5, $6, $7)
+    ON CONFLICT (submission_id) DO UPDATE SET
+        author = EXCLUDED.author,
+        title = EXCLUDED.title,
+        submission_score = EXCLUDED.submission_score,
+        url = EXCLUDED.url,
+        submission_created_utc = EXCLUDED.submission_created_utc,
+        over_18 = EXCLUDED.over_18;
+"""
+
+UPSERT_COMMENTS_SQL = """
+    INSERT INTO comments (
+        comment_id,
+        comment_author,
+        comment_created_utc,
+        body,
+        comment_score,
+        is_submitter,
+        edited,
+        link_id
+    )
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+    ON CONFLICT (comment_id) DO UPDATE SET
+        comment_author = EXCLUDED.comment_author,
+        comment_created_utc = EXCLUDED.comment_created_utc,
+        body = EXCLUDED.body,
+        comment_score = EXCLUDED.comment_score,
+        is_submitter = EXCLUDED.is_submitter,
+        edited = EXCLUDED.edited,
+        link_id = EXCLUDED.link_id;
+"""
+
+
+def redditor_row(details):
+    """
+    Column values of a redditor record for the users table.
+    """
+    return (
+        details.get('redditor_id'),
+        details.get('redditorname'),
+        details.get('created_utc'),
+        details.get('link_karma'),
+        details.get('comment_karma'),
+        details.get('total_karma'),
+        details.get('is_employee'),
+        details.get('is_mod'),
+        details.get('is_gold'),
+        details.get('dormant_days'),
+        details.get('has_verified_email'),
+        details.get('accept_followers'),
+        details.get('redditor_is_subscriber'),
+    )
+
+
+def activity_rows(details):
+    """
+    Rows of a redditor record's activity timeline for the user_activity table.
+    Records without a timeline (e.g. prefiltered accounts) have none.
+    """
+    redditor_id = details.get('redditor_id')
+    return [
+        (kind, item_id, redditor_id, int(created_utc), subreddit, score)
+        for kind, item_id, created_utc, subreddit, score in details.get('activity') or []
+    ]
+
+
+def submission_row(submission_id, submission):
+    """
+    Column values of a submission record for the submissions table.
+    """
+    return (
+        submission_id,
+        submission.get("author"),
+        submission.get("title"),
+        submission.get("submission_score"),
+        submission.get("url"),
+        submission.get("submission_created_utc"),
+        submission.get("over_18"),
+    )
+
+
+def comment_row(comment):
+    """
+    Column values of a comment record for the comments table.
+    """
+    return (
+        comment['comment_id'],
+        comment['comment_author'],
+        comment['comment_created_utc'],
+        comment['body'],
+        comment['comment_score'],
+        comment['is_submitter'],
+        bool(comment['edited']),  # Ensure edited is a boolean
+        comment['link_id'],
+    )
+
+
+def compact_submission(submission):
+    """
+    (submission_id, author, submission row, [(comment author, comment row)]) of a
+    submission record: all the sink keeps of it until its batch is written.
+    """
+    submission_id = submission['submission_id']
+    comments = [(comment['comment_author'], comment_row(comment)) for comment in submission.get('comments', [])]
+    return submission_id, submission.get("author"), submission_row(submission_id, submission), comments
+
+
+class DatabaseSink:
+    """
+    Drop-in replacement for ScrapeWriter that upserts records into PostgreSQL.
+
+    `write_redditor` / `write_submission` may be called from any thread and
+    block only while the queue is full; coroutines await the `*_async`
+    variants instead, so a full queue does not stall their event loop.
+    Authors are written before their submission, so flushing users before
+    submissions and comments keeps each batch consistent. Records are journaled
+    in the CheckpointJournal only after their batch is committed.
+    When authors are fetched after their submissions (the profile scheduler),
+    `hold_submissions` keeps the submission rows back until `release_submissions`.
+    `max_redditors` bounds the memo of written redditors for long-running
+    processes; a forgotten redditor is fetched and written again.
+    """
+
+    def __init__(self, db_config, batch_size=500, queue_size=1000, flush_interval=5.0, checkpoint=None,
+                 max_redditors=None):
+        self.db_config = db_config
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.checkpoint = checkpoint
+        self.redditor_names = BoundedSet(checkpoint.redditors if checkpoint else (), max_redditors)
+        self.submission_count = 0
+        self.stored_redditors = BoundedSet(self.redditor_names, max_redditors)
+        self._held_submissions = None  # submission rows kept back by hold_submissions()
+        self.rows_written = {"users": 0, "user_activity": 0, "submissions": 0, "comments": 0}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._queue = None
+        self._conn = None
+        self._error = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="db-sink", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        logger.info(f"Streaming scraper output to database '{db_config['dbname']}' in batches of {batch_size}")
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main())
+        finally:
+            # Release the callers still waiting for room in the queue
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.close()
+
+    async def _main(self):
+        try:
+            self._conn = await asyncpg.connect(
+                user=self.db_config['user'],
+                password=self.db_config['password'],
+                database=self.db_config['dbname'],
+                host=self.db_config['host'],
+                port=self.db_config.get('port', 5432),
+            )
+        except (OSError, asyncpg.PostgresError) as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._ready.set()
+        try:
+            await self._consume()
+        except Exception as e:
+            logger.exception(f"Database sink writer stopped: {e}")
+            self._error = e
+        finally:
+            await self._conn.close()
+
+    async def _consume(self):
+        redditors, submissions, comments = [], [], []
+        pending_rows = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                kind, item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                kind, item = "flush", None
+
+            if kind == "redditor":
+                redditors.append(item)
+                pending_rows += 1
+            elif kind == "submission":
+                submissions.append(item)
+                pending_rows += 1 + len(item[3])
+            elif kind == "comment":
+                comments.append(item)
+                pending_rows += 1
+
+            if kind in ("redditor", "submission", "comment") and pending_rows < self.batch_size:
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                continue
+
+            await self._write_batch(redditors, submissions, comments)
+            redditors, submissions, comments = [], [], []
+            pending_rows = 0
+            deadline = None
+            if kind == "flush" and item is not None:
+                item.set_result(None)
+            elif kind == "close":
+                return
+
+    async def _write_batch(self, redditors, submissions, comments=()):
+        """
+        Upserts one batch in a single transaction: users and their activity, then submissions, then comments.
+        `submissions` are compact_submission() tuples; `comments` are standalone
+        comment records (from the ingest daemon's comment streams).
+        """
+        if not redditors and not submissions and not comments:
+            return
+        stored = self.stored_redditors
+        new_redditors = set()  # stored once this batch commits
+        user_rows = []
+        timeline_rows = []
+        for record in redditors:
+            if not record.get('redditor_id'):
+                logger.warning(f"Skipping redditor {record.get('redditorname')} due to missing redditor_id.")
+                continue
+            user_rows.append(redditor_row(record))
+            timeline_rows.extend(activity_rows(record))
+            new_redditors.add(record['redditorname'])
+
+        submission_rows = []
+        comment_rows = []
+        for submission_id, author, row, submission_comments in submissions:
+            if author not in self.redditor_names:
+                logger.warning(f"redditor {author} not found in redditor data, skipping submission: {submission_id}")
+                continue
+            submission_rows.append(row)
+            for comment_author, values in submission_comments:
+                if comment_author not in stored and comment_author not in new_redditors:
+                    logger.debug(f"Author {comment_author} not stored, skipping comment {values[0]}")
+                    continue
+                comment_rows.append(values)
+        for comment in comments:
+            if comment['comment_author'] not in stored and comment['comment_author'] not in new_redditors:
+                logger.debug(f"Author {comment['comment_author']} not stored, skipping comment {comment['comment_id']}")
+                continue
+            comment_rows.append(comment_row(comment))
+
+        try:
+            async with self._conn.transaction():
+                if user_rows:
+                    await self._conn.executemany(UPSERT_USERS_SQL, user_rows)
+                if timeline_rows:
+                    await self._conn.executemany(UPSERT_ACTIVITY_SQL, timeline_rows)
+                if submission_rows:
+                    await self._conn.executemany(UPSERT_SUBMISSIONS_SQL, submission_rows)
+                if comment_rows:
+                    await self._conn.executemany(UPSERT_COMMENTS_SQL, comment_rows)
+        except (OSError, asyncpg.PostgresError) as e:
+            # Not journaled, so a --resume run scrapes these records again; the
+            # redditors are forgotten, so a later submission fetches and writes them again
+            with self._lock:
+                self.redditor_names.difference_update(record['redditorname'] for record in redditors)
+            logger.error(
+                f"Failed to write a batch of {len(redditors)} redditors, {len(submissions)} submissions "
+                f"and {len(comments)} comments: {e}"
+            )
+            return
+
+        stored.update(new_redditors)
+        self.rows_written["users"] += len(user_rows)
+        self.rows_written["user_activity"] += len(timeline_rows)
+        self.rows_written["submissions"] += len(submission_rows)
+        self.rows_written["comments"] += len(comment_rows)
+        logger.debug(
+            f"Committed {len(user_rows)} users, {len(timeline_rows)} activity items, {len(submission_rows)} submissions and {len(comment_rows)} comments."
+        )
+        if self.checkpoint:
+            for record in redditors:
+                self.checkpoint.mark_redditor(record['redditorname'])
+            for submission_id, *_ in submissions:
+                self.checkpoint.mark_submission(submission_id)
+
+    def is_running(self):
+        """
+        False once the writer has stopped: closed, or failed on an unexpected error.
+        """
+        return self._error is None and self._thread.is_alive()
+
+    def _check_writer(self):
+        """
+        Raises once the writer has stopped, so callers never wait on it forever.
+        """
+        if self._error is not None:
+            raise RuntimeError(f"Database sink writer failed: {self._error}") from self._error
+        if not self._thread.is_alive():
+            raise RuntimeError("Database sink writer has stopped")
+
+    def _submit(self, kind, item):
+        """
+        Schedules `item` onto the writer's queue; returns the concurrent future of the put.
+        """
+        self._check_writer()
+        put = self._queue.put((kind, item))
+        try:
+            return asyncio.run_coroutine_threadsafe(put, self._loop)
+        except RuntimeError:  # the writer's loop closed in the meantime
+            put.close()
+            self._check_writer()
+            raise
+
+    def _wait(self, future):
+        while True:
+            try:
+                return future.result(CONSUMER_CHECK_SECONDS)
+            except concurrent.futures.TimeoutError:
+                self._check_writer()
+            except concurrent.futures.CancelledError:
+                self._check_writer()
+                raise
+
+    async def _wait_async(self, future):
+        future = asyncio.wrap_future(future)
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=CONSUMER_CHECK_SECONDS)
+            if future.cancelled():
+                self._check_writer()
+            if done:
+                return future.result()
+            self._check_writer()
+
+    def _put(self, kind, item):
+        self._wait(self._submit(kind, item))
+
+    async def _put_async(self, kind, item):
+        await self._wait_async(self._submit(kind, item))
+
+    def has_redditor(self, redditor_name):
+        return redditor_name in self.redditor_names
+
+    def has_submission(self, submission_id):
+        return self.checkpoint is not None and self.checkpoint.submission_done(submission_id)
+
+    def _claim_redditor(self, redditor_name):
+        """
+        True for the first write of a redditor, False when it was written already.
+        """
+        with self._lock:
+            if redditor_name in self.redditor_names:
+                return False
+            self.redditor_names.add(redditor_name)
+            return True
+
+    def _submission_item(self, submission_record):
+        """
+        Compacts a submission for the queue, or returns None when it is held back instead.
+        """
+        rows = compact_submission(submission_record)
+        with self._lock:
+            self.submission_count += 1
+            if self._held_submissions is not None:
+                self._held_submissions.append(rows)
+                return None
+        return rows
+
+    def write_redditor(self, redditor_name, redditor_info):
+        if self._claim_redditor(redditor_name):
+            self._put("redditor", dict(redditor_info, redditorname=redditor_name))
+
+    async def write_redditor_async(self, redditor_name, redditor_info):
+        if self._claim_redditor(redditor_name):
+            await self._put_async("redditor", dict(redditor_info, redditorname=redditor_name))
+
+    def write_submission(self, submission_record):
+        if (rows := self._submission_item(submission_record)) is not None:
+            self._put("submission", rows)
+
+    async def write_submission_async(self, submission_record):
+        if (rows := self._submission_item(submission_record)) is not None:
+            await self._put_async("submission", rows)
+
+    def reserve_redditor(self, redditor_name):
+        """
+        Always True: only scraper shards (tools.sharding) share redditor fetches with other processes.
+        """
+        return True
+
+    async def reserve_redditor_async(self, redditor_name):
+        return True
+
+    def release_redditor(self, redditor_name):
+        pass
+
+    def hold_submissions(self):
+        """
+        Keeps submission rows back until `release_submissions`, since submissions
+        and comments whose author is not stored yet are dropped.
+        """
+        with self._lock:
+            if self._held_submissions is None:
+                self._held_submissions = []
+
+    def release_submissions(self):
+        """
+        Queues the held submission rows behind every redditor written so far.
+        """
+        with self._lock:
+            held, self._held_submissions = self._held_submissions or [], None
+        if held:
+            logger.info(f"Writing {len(held)} submissions held back until their authors were fetched.")
+        for rows in held:
+            self._put("submission", rows)
+
+    def write_comment(self, comment_record):
+        """
+        Queues a comment on its own, without its submission.
+        """
+        self._put("comment", comment_record)
+
+    async def write_comment_async(self, comment_record):
+        await self._put_async("comment", comment_record)
+
+    def flush(self):
+        """
+        Blocks until everything queued so far is committed (or has failed).
+        """
+        done = concurrent.futures.Future()
+        self._put("flush", done)
+        self._wait(done)
+
+    def close(self):
+        try:
+            self.release_submissions()
+            self._put("close", None)
+        except RuntimeError as e:
+            logger.error(f"Records still queued for the database were lost: {e}")
+        self._thread.join()
+        logger.info(
+            f"Stored {self.rows_written['users']} users ({self.rows_written['user_activity']} activity items), "
+            f"{self.rows_written['submissions']} submissions "
+            f"and {self.rows_written['comments']} comments ({self.submission_count} submissions scraped)."
+        )
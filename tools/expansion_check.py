@@ -0,0 +1,116 @@
+'''
+Regression check for the PRAW backend's comment-tree expansion.
+
+Starts tools.fake_reddit in-process and, for every generated submission,
+compares the comments `expand_comment_tree` keeps with what PRAW's own
+`replace_more(limit=None)` returns:
+
+- with no expansion limits, both must hold exactly the same comments;
+- with a small `max_more_calls`, a tree reported as complete must hold
+  every comment, and a truncated one must report the stubs it skipped.
+
+Exits with status 1 on any mismatch.
+
+    python -m tools.expansion_check --subreddits 2 --submissions 10 --comments 300
+'''
+import argparse
+import json
+import os
+import sys
+import tempfile
+from tools.fake_reddit import add_server_arguments, build_server
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("Expansion check Basic logging set")
+init_logger()
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CONFIG = os.path.join(REPO_ROOT, "tools", "config", "Rename_to_config.json")
+
+
+def check_config(base_config, server):
+    """
+    Copy of `base_config` aimed at the fake server, without a client-side rate limit worth waiting for.
+    """
+    config = dict(base_config)
+    config.pop("notes", None)
+    config.update(client_id="expansion-check", client_secret="expansion-check", oauth_url=server.url, reddit_url=server.url)
+    config["rate_limit"] = dict(config.get("rate_limit", {}), requests_per_minute=600000, burst=10000)
+    return config
+
+
+def comment_ids(submission):
+    return {comment.id for comment in submission.comments.list()}
+
+
+def check_submission(reddit, config, submission_id, max_more_calls):
+    """
+    Returns a list of mismatches found for one submission (empty when it passes).
+    """
+    from tools.scraper import expand_comment_tree
+
+    reference = reddit.submission(submission_id)
+    reference.comments.replace_more(limit=None)
+    expected = comment_ids(reference)
+
+    problems = []
+    unlimited = dict(config, comment_expansion={})
+    submission = reddit.submission(submission_id)
+    stats = expand_comment_tree(reddit, unlimited, submission)
+    found = comment_ids(submission)
+    if found != expected or not stats["complete"]:
+        problems.append(f"unlimited: {len(found)} of {len(expected)} comments, complete={stats['complete']}")
+
+    limited = dict(config, comment_expansion={"max_more_calls": max_more_calls})
+    submission = reddit.submission(submission_id)
+    stats = expand_comment_tree(reddit, limited, submission)
+    found = comment_ids(submission)
+    if not found <= expected:
+        problems.append(f"max_more_calls={max_more_calls}: {len(found - expected)} unexpected comments")
+    if stats["complete"] and found != expected:
+        problems.append(f"max_more_calls={max_more_calls}: complete with {len(found)} of {len(expected)} comments")
+    if not stats["complete"] and found == expected:
+        problems.append(f"max_more_calls={max_more_calls}: all {len(expected)} comments but reported incomplete")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check comment-tree expansion against PRAW's replace_more(limit=None)")
+    add_server_arguments(parser)
+    parser.add_argument("--max-more-calls", type=int, default=3, help="budget for the limited run")
+    parser.add_argument("--config", default=SAMPLE_CONFIG, help="base config (defaults to the sample config)")
+    parser.set_defaults(subreddits=2, submissions=10, comments=300)
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        base_config = json.load(f)
+    server = build_server(args)
+    config = check_config(base_config, server)
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        json.dump(config, f)
+    # tools.scraper reads its CONFIG (and rate limit) on import
+    os.environ["REDDIT_SCRAPER_CONFIG"] = f.name
+    server.start_in_thread()
+    try:
+        from tools.config.reddit_login import login
+
+        reddit = login(config)
+        failures = checked = 0
+        for subreddit_index in range(args.subreddits):
+            for position in range(args.submissions):
+                submission_id = server.data.submission_id(subreddit_index, position)
+                checked += 1
+                for problem in check_submission(reddit, config, submission_id, args.max_more_calls):
+                    failures += 1
+                    logger.error(f"Submission {submission_id}: {problem}")
+        print(f"Expansion check: {checked} submissions, {failures} mismatches")
+    finally:
+        server.shutdown()
+        server.server_close()
+        os.unlink(f.name)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,546 @@
+'''
+Offline stand-in for the Reddit API, for benchmarks and local testing.
+
+Serves deterministic synthetic subreddits, submissions, comment trees with
+"load more comments" and "continue this thread" stubs, user profiles and
+histories over plain HTTP, with X-Ratelimit headers, an optional request
+quota (429 once exceeded) and artificial latency. Both PRAW and the async
+client can be pointed at it with the 'oauth_url' / 'reddit_url' settings.
+
+    python -m tools.fake_reddit --port 8765 --latency-ms 50
+'''
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("Fake Reddit Basic logging set")
+init_logger()
+
+TOP_LEVEL_SHOWN = 20  # top-level comments in the first page of a thread
+REPLIES_SHOWN = 3     # replies shown under a comment before a "load more" stub
+MAX_DEPTH = 4         # deeper replies sit behind a "continue this thread" stub
+HISTORY_SIZE = 120    # items in each user's comment and submission history
+BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def to_base36(number):
+    digits = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        digits = BASE36[remainder] + digits
+        if not number:
+            return digits
+
+
+def listing(children, after=None):
+    return {"kind": "Listing", "data": {"after": after, "before": None, "dist": len(children), "children": children}}
+
+
+class FakeRedditData:
+    """
+    Generates the synthetic content. Everything is derived from `seed`, so
+    every request for the same thing returns the same data.
+    """
+
+    def __init__(self, subreddits=3, submissions=50, comments=40, users=500, deleted_ratio=0.05, seed=0,
+                 suspended_ratio=0.03):
+        self.subreddit_names = [f"bench_sub_{i}" for i in range(subreddits)]
+        self.submissions_per_subreddit = submissions
+        self.comments_per_submission = comments
+        self.user_names = [f"bench_user_{i}" for i in range(users)]
+        self.deleted_ratio = deleted_ratio
+        self.suspended_ratio = suspended_ratio
+        self.seed = seed
+        self.now = int(time.time())
+        self._trees = {}
+        self._lock = threading.Lock()
+
+    # ── users ──────────────────────────────────────────────
+    def user_index(self, name):
+        prefix, _, number = name.rpartition("_")
+        if prefix != "bench_user" or not number.isdigit() or int(number) >= len(self.user_names):
+            return None
+        return int(number)
+
+    def user_fullname(self, index):
+        return f"t2_{to_base36(index + 1)}"
+
+    def is_suspended(self, index):
+        return random.Random(f"{self.seed}:suspended:{index}").random() < self.suspended_ratio
+
+    def user_about(self, index):
+        if self.is_suspended(index):
+            # Reddit only returns the name of a suspended account
+            return {"name": self.user_names[index], "is_suspended": True}
+        rng = random.Random(f"{self.seed}:user:{index}")
+        link_karma = rng.randint(0, 20000)
+        comment_karma = rng.randint(0, 50000)
+        name = self.user_names[index]
+        return {
+            "id": to_base36(index + 1),
+            "name": name,
+            "created_utc": float(self.now - rng.randint(30, 4000) * 86400),
+            "link_karma": link_karma,
+            "comment_karma": comment_karma,
+            "total_karma": link_karma + comment_karma,
+            "is_employee": False,
+            "is_mod": rng.random() < 0.05,
+            "is_gold": rng.random() < 0.1,
+            "has_verified_email": rng.random() < 0.8,
+            "accept_followers": True,
+            "is_suspended": False,
+            "subreddit": {"display_name": f"u_{name}", "user_is_moderator": False},
+        }
+
+    def user_history(self, index, kind):
+        """
+        The user's newest-first comments ("t1") or submissions ("t3").
+        """
+        rng = random.Random(f"{self.seed}:history:{kind}:{index}")
+        name = self.user_names[index]
+        created = self.now
+        items = []
+        for position in range(HISTORY_SIZE):
+            created -= rng.randint(600, 5 * 86400)
+            subreddit = rng.choice(self.subreddit_names)
+            item_id = to_base36((index + 1) * 1_000_000 + position)
+            data = {
+                "id": item_id,
+                "name": f"{kind}_{item_id}",
+                "author": name,
+                "author_fullname": self.user_fullname(index),
+                "subreddit": subreddit,
+                "created_utc": float(created),
+                "score": rng.randint(-5, 500),
+            }
+            if kind == "t1":
+                data.update(body="history comment", link_id="t3_0", parent_id="t3_0")
+            else:
+                data.update(title="history submission", url=f"https://example.invalid/{item_id}", num_comments=0)
+            items.append({"kind": kind, "data": data})
+        return items
+
+    def pick_author(self, rng):
+        if rng.random() < self.deleted_ratio:
+            return "[deleted]", None
+        index = rng.randrange(len(self.user_names))
+        return self.user_names[index], self.user_fullname(index)
+
+    # ── submissions ────────────────────────────────────────
+    def submission_id(self, subreddit_index, position):
+        return to_base36((subreddit_index + 1) * 100_000 + position)
+
+    def submission(self, subreddit_index, position):
+        submission_id = self.submission_id(subreddit_index, position)
+        rng = random.Random(f"{self.seed}:submission:{submission_id}")
+        author, author_fullname = self.pick_author(rng)
+        return {
+            "id": submission_id,
+            "name": f"t3_{submission_id}",
+            "title": f"Synthetic submission {position} in {self.subreddit_names[subreddit_index]}",
+            "author": author,
+            "author_fullname": author_fullname,
+            "subreddit": self.subreddit_names[subreddit_index],
+            "score": rng.randint(0, 5000),
+            "url": f"https://example.invalid/{submission_id}",
+            "permalink": f"/r/{self.subreddit_names[subreddit_index]}/comments/{submission_id}/",
+            "selftext": "",
+            "created_utc": float(self.now - position * 600 - subreddit_index),
+            "over_18": False,
+            "num_comments": len(self.tree(submission_id)["comments"]),
+        }
+
+    def find_submission(self, submission_id):
+        try:
+            number = int(submission_id, 36)
+        except ValueError:
+            return None
+        subreddit_index, position = divmod(number, 100_000)
+        subreddit_index -= 1
+        if 0 <= subreddit_index < len(self.subreddit_names) and position < self.submissions_per_subreddit:
+            return self.submission(subreddit_index, position)
+        return None
+
+    # ── comment trees ──────────────────────────────────────
+    def tree(self, submission_id):
+        """
+        {"comments": {id: data}, "children": {parent id or None: [ids]}} for a submission.
+        """
+        with self._lock:
+            if submission_id in self._trees:
+                return self._trees[submission_id]
+        rng = random.Random(f"{self.seed}:tree:{submission_id}")
+        count = rng.randint(0, 2 * self.comments_per_submission)
+        base = int(submission_id, 36) * 10_000
+        comments, children, depths = {}, {None: []}, {}
+        ids = []
+        for position in range(min(count, 9_999)):
+            comment_id = to_base36(base + position + 1)
+            parent = None if position == 0 or rng.random() < 0.3 else rng.choice(ids)
+            depths[comment_id] = 0 if parent is None else depths[parent] + 1
+            author, author_fullname = self.pick_author(rng)
+            comments[comment_id] = {
+                "id": comment_id,
+                "name": f"t1_{comment_id}",
+                "author": author,
+                "author_fullname": author_fullname,
+                "body": f"Synthetic comment {position}",
+                "created_utc": float(self.now - rng.randint(0, 86400)),
+                "score": rng.randint(-10, 1000),
+                "is_submitter": False,
+                "edited": False,
+                "link_id": f"t3_{submission_id}",
+                "parent_id": f"t1_{parent}" if parent else f"t3_{submission_id}",
+                "subreddit": "bench",
+                "depth": depths[comment_id],
+            }
+            children.setdefault(parent, []).append(comment_id)
+            ids.append(comment_id)
+        tree = {"comments": comments, "children": children}
+        with self._lock:
+            self._trees[submission_id] = tree
+        return tree
+
+    def subtree_size(self, tree, comment_ids):
+        size = 0
+        stack = list(comment_ids)
+        while stack:
+            comment_id = stack.pop()
+            size += 1
+            stack.extend(tree["children"].get(comment_id, []))
+        return size
+
+    def more_stub(self, tree, parent_fullname, comment_ids, depth):
+        return {"kind": "more", "data": {
+            "count": self.subtree_size(tree, comment_ids),
+            "name": f"t1_{comment_ids[0]}",
+            "id": comment_ids[0],
+            "parent_id": parent_fullname,
+            "depth": depth,
+            "children": list(comment_ids),
+        }}
+
+    def render(self, tree, comment_id, depth):
+        """
+        A comment with up to MAX_DEPTH levels of replies, truncated the way Reddit does.
+        """
+        data = dict(tree["comments"][comment_id], depth=depth)
+        replies = tree["children"].get(comment_id, [])
+        if not replies:
+            data["replies"] = ""
+        elif depth >= MAX_DEPTH:
+            data["replies"] = listing([{"kind": "more", "data": {
+                "count": 0, "name": "t1__", "id": "_", "parent_id": f"t1_{comment_id}",
+                "depth": depth + 1, "children": [],
+            }}])
+        else:
+            children = [self.render(tree, reply, depth + 1) for reply in replies[:REPLIES_SHOWN]]
+            if len(replies) > REPLIES_SHOWN:
+                children.append(self.more_stub(tree, f"t1_{comment_id}", replies[REPLIES_SHOWN:], depth + 1))
+            data["replies"] = listing(children)
+        return {"kind": "t1", "data": data}
+
+    def thread(self, submission_id, focus=None):
+        """
+        The two-listing /comments response, optionally rooted at comment `focus`.
+        """
+        submission = self.find_submission(submission_id)
+        if submission is None:
+            return None
+        tree = self.tree(submission_id)
+        if focus is not None:
+            if focus not in tree["comments"]:
+                return None
+            comment_listing = listing([self.render(tree, focus, 0)])
+        else:
+            top_level = tree["children"].get(None, [])
+            children = [self.render(tree, comment_id, 0) for comment_id in top_level[:TOP_LEVEL_SHOWN]]
+            if len(top_level) > TOP_LEVEL_SHOWN:
+                children.append(self.more_stub(tree, f"t3_{submission_id}", top_level[TOP_LEVEL_SHOWN:], 0))
+            comment_listing = listing(children)
+        return [listing([{"kind": "t3", "data": submission}]), comment_listing]
+
+    def more_children(self, link_id, comment_ids):
+        """
+        /api/morechildren: the requested comments and their replies as a flat list.
+        """
+        submission_id = link_id[3:] if link_id.startswith("t3_") else link_id
+        if self.find_submission(submission_id) is None:
+            return None
+        tree = self.tree(submission_id)
+        things = []
+        stack = [comment_id for comment_id in reversed(comment_ids) if comment_id in tree["comments"]]
+        while stack:
+            comment_id = stack.pop()
+            things.append({"kind": "t1", "data": dict(tree["comments"][comment_id], replies="")})
+            stack.extend(reversed(tree["children"].get(comment_id, [])))
+        return {"json": {"errors": [], "data": {"things": things}}}
+
+
+class RequestStats:
+    """
+    Per-endpoint request counts, bytes and first/last request times.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        self.throttled = 0
+
+    def record(self, endpoint, status, size):
+        now = time.monotonic()
+        with self._lock:
+            entry = self.endpoints.setdefault(endpoint, {"requests": 0, "bytes": 0, "first": now, "last": now})
+            entry["requests"] += 1
+            entry["bytes"] += size
+            entry["last"] = now
+            if status == 429:
+                self.throttled += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(entry) for endpoint, entry in self.endpoints.items()}
+
+
+class FakeRedditServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer holding the synthetic data, the quota window and the request stats.
+    `quota` requests are allowed per `window_seconds`; 0 disables the quota.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, data, latency_ms=0.0, jitter_ms=0.0, quota=0, window_seconds=600):
+        super().__init__(address, FakeRedditHandler)
+        self.data = data
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.quota = quota
+        self.window_seconds = window_seconds
+        self.stats = RequestStats()
+        self._window_start = time.time()
+        self._window_used = 0
+        self._quota_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def take_quota(self):
+        """
+        Counts one request against the window. Returns (allowed, used, remaining, reset_seconds).
+        """
+        with self._quota_lock:
+            now = time.time()
+            if now - self._window_start >= self.window_seconds:
+                self._window_start = now
+                self._window_used = 0
+            self._window_used += 1
+            reset = max(1, int(self._window_start + self.window_seconds - now))
+            if not self.quota:
+                return True, self._window_used, 100000.0, reset
+            remaining = max(0.0, float(self.quota - self._window_used))
+            return self._window_used <= self.quota, self._window_used, remaining, reset
+
+    def start_in_thread(self):
+        thread = threading.Thread(target=self.serve_forever, name="fake-reddit", daemon=True)
+        thread.start()
+        logger.info(f"Fake Reddit API listening on {self.url}")
+        return thread
+
+
+class FakeRedditHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):
+        self._handle({})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        self._handle(parse_qs(body))
+
+    def _handle(self, form):
+        parts = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        params.update({key: values[-1] for key, values in form.items()})
+        path = parts.path.rstrip("/")
+        if path.endswith(".json"):
+            path = path[:-5]
+        segments = [segment for segment in path.split("/") if segment]
+
+        server = self.server
+        if server.latency or server.jitter:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+
+        if segments[:3] == ["api", "v1", "access_token"]:
+            self._send("token", 200, {"access_token": "fake-token", "token_type": "bearer", "expires_in": 86400, "scope": "*"})
+            return
+
+        allowed, used, remaining, reset = server.take_quota()
+        headers = {
+            "x-ratelimit-used": str(used),
+            "x-ratelimit-remaining": f"{remaining:.1f}",
+            "x-ratelimit-reset": str(reset),
+        }
+        if not allowed:
+            headers["retry-after"] = str(reset)
+            self._send("throttled", 429, {"message": "Too Many Requests", "error": 429}, headers)
+            return
+
+        endpoint, status, payload = self._route(segments, params)
+        self._send(endpoint, status, payload, headers)
+
+    def _route(self, segments, params):
+        data = self.server.data
+        not_found = {"message": "Not Found", "error": 404}
+
+        if segments[:1] == ["r"] and len(segments) == 3 and segments[2] in ("new", "hot", "top", "rising", "controversial"):
+            if segments[1] not in data.subreddit_names:
+                return "listing", 404, not_found
+            subreddit_index = data.subreddit_names.index(segments[1])
+            items = [
+                {"kind": "t3", "data": data.submission(subreddit_index, position)}
+                for position in range(data.submissions_per_subreddit)
+            ]
+            return "listing", 200, self._page(items, params)
+
+        if segments[:1] == ["r"] and segments[2:] == ["comments"]:
+            if segments[1] not in data.subreddit_names:
+                return "listing", 404, not_found
+            # The comments of the newest submissions, newest first, as the comment stream sees them
+            subreddit_index = data.subreddit_names.index(segments[1])
+            comments = []
+            for position in range(min(5, data.submissions_per_subreddit)):
+                comments.extend(data.tree(data.submission_id(subreddit_index, position))["comments"].values())
+            comments.sort(key=lambda comment: comment["created_utc"], reverse=True)
+            items = [{"kind": "t1", "data": dict(comment, subreddit=segments[1])} for comment in comments]
+            return "listing", 200, self._page(items, params)
+
+        if segments[:1] == ["r"] and segments[2:] == ["about", "moderators"]:
+            if segments[1] not in data.subreddit_names:
+                return "moderators", 404, not_found
+            rng = random.Random(f"{data.seed}:mods:{segments[1]}")
+            moderators = rng.sample(range(len(data.user_names)), min(5, len(data.user_names)))
+            children = [
+                {"name": data.user_names[index], "id": data.user_fullname(index), "mod_permissions": ["all"], "date": float(data.now)}
+                for index in moderators
+            ]
+            return "moderators", 200, {"kind": "UserList", "data": {"children": children}}
+
+        if segments[:1] == ["comments"] and len(segments) >= 2:
+            focus = segments[3] if len(segments) >= 4 else params.get("comment")
+            thread = data.thread(segments[1], focus)
+            return "comments", (200 if thread else 404), (thread or not_found)
+
+        if segments[:2] == ["api", "morechildren"]:
+            children = [child for child in params.get("children", "").split(",") if child]
+            result = data.more_children(params.get("link_id", ""), children)
+            return "morechildren", (200 if result else 404), (result or not_found)
+
+        if segments[:2] == ["api", "user_data_by_account_ids"]:
+            result = {}
+            for fullname in params.get("ids", "").split(","):
+                if not fullname.startswith("t2_"):
+                    continue
+                try:
+                    index = int(fullname[3:], 36) - 1
+                except ValueError:
+                    continue
+                if 0 <= index < len(data.user_names) and not data.is_suspended(index):
+                    about = data.user_about(index)
+                    result[fullname] = {
+                        "name": about["name"],
+                        "created_utc": about["created_utc"],
+                        "link_karma": about["link_karma"],
+                        "comment_karma": about["comment_karma"],
+                        "profile_img": "",
+                        "profile_over_18": False,
+                    }
+            return "user_batch", 200, result
+
+        if segments[:1] in (["user"], ["u"]) and len(segments) == 3:
+            index = data.user_index(segments[1])
+            if index is None:
+                return "user_about", 404, not_found
+            if segments[2] == "about":
+                return "user_about", 200, {"kind": "t2", "data": data.user_about(index)}
+            if segments[2] in ("comments", "submitted"):
+                kind = "t1" if segments[2] == "comments" else "t3"
+                return "user_history", 200, self._page(data.user_history(index, kind), params)
+
+        return "unknown", 404, not_found
+
+    def _page(self, items, params):
+        """
+        Slices a listing by the 'after' fullname and 'limit' parameters.
+        """
+        start = 0
+        if after := params.get("after"):
+            names = [item["data"]["name"] for item in items]
+            start = names.index(after) + 1 if after in names else len(items)
+        try:
+            limit = min(100, int(params.get("limit", 25)))
+        except ValueError:
+            limit = 25
+        page = items[start:start + limit]
+        next_after = page[-1]["data"]["name"] if page and start + limit < len(items) else None
+        return listing(page, next_after)
+
+    def _send(self, endpoint, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.stats.record(endpoint, status, len(body))
+
+
+def add_server_arguments(parser):
+    """
+    Command-line options shared by this module and tools.benchmark.
+    """
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--subreddits", type=int, default=3)
+    parser.add_argument("--submissions", type=int, default=50, help="submissions per subreddit")
+    parser.add_argument("--comments", type=int, default=40, help="average comments per submission")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="random extra latency per response")
+    parser.add_argument("--quota", type=int, default=0, help="requests per window before 429s (0 = unlimited)")
+    parser.add_argument("--window-seconds", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def build_server(args):
+    data = FakeRedditData(args.subreddits, args.submissions, args.comments, args.users, seed=args.seed)
+    return FakeRedditServer(
+        (args.host, args.port), data, args.latency_ms, args.jitter_ms, args.quota, args.window_seconds
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a synthetic Reddit API for offline benchmarks")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    server = build_server(args)
+    logger.info(f"Fake Reddit API listening on {server.url} (subreddits: {'+'.join(server.data.subreddit_names)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
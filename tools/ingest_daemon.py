@@ -0,0 +1,247 @@
+'''
+Continuous streaming ingest.
+
+`python main.py --daemon` keeps running instead of scraping one batch: for
+every configured subreddit it polls the newest submissions and the newest
+comments, the way PRAW's subreddit streams do, and ingests only items it has
+not seen yet. New items go through a bounded queue to the processing
+workers, which fetch every newly seen author once (through the redditor
+cache and the profile prefilter, like a batch run) and hand the records to
+the streaming database sink, which writes them in batches.
+
+Polling backs off while a subreddit is quiet, so a steady-state daemon costs
+a couple of requests per subreddit per poll interval. When the database or
+the profile fetches fall behind, the full queues hold back the pollers.
+SIGINT/SIGTERM stop the pollers, drain the queue and flush the sink.
+
+Authors already profiled are remembered in a bounded memo ('author_memo'
+most recent), so memory stays flat however long the daemon runs; an author
+that falls out of it is profiled again the next time they post. An item
+whose author fetch failed is queued again after a backoff, up to
+MAX_INGEST_ATTEMPTS times, and the failed author is not remembered, so the
+retry fetches it again.
+'''
+import asyncio
+import signal
+from tools.async_reddit import AsyncRedditClient
+from tools.async_scraper import comment_record, fetch_authors, fetch_moderators, submission_record
+from tools.config.config_loader import CONFIG
+from tools.config.logger_config import init_logger, logging
+from tools.metrics import METRICS, finish_metrics, start_metrics
+from tools.redditor_cache import load_redditor_cache
+from tools.scrape_output import load_writer, streams_to_database
+from tools.scraper import is_ignored_author, rate_limiter
+from tools.single_flight import AsyncSingleFlight
+from tools.bounded_set import BoundedSet
+
+logger = logging.getLogger(__name__)
+logger.info("Ingest daemon Basic logging set")
+init_logger()
+
+STREAM_LIMIT = 100  # newest items requested per poll (one listing page)
+MAX_INGEST_ATTEMPTS = 3  # tries per item before it is dropped
+
+
+def get_daemon_settings(CONFIG):
+    """
+    Returns (poll_interval, max_poll_interval, queue_size, seen_ids, author_memo, stream_comments)
+    from the 'daemon' block.
+    """
+    daemon_config = CONFIG.get("daemon", {})
+    try:
+        poll_interval = float(daemon_config.get("poll_interval_seconds", 15))
+        max_poll_interval = max(poll_interval, float(daemon_config.get("max_poll_interval_seconds", 300)))
+        queue_size = int(daemon_config.get("queue_size", 1000))
+        seen_ids = int(daemon_config.get("seen_ids", 2000))
+        author_memo = int(daemon_config.get("author_memo", 100000))
+    except (ValueError, TypeError):
+        logger.warning("Invalid daemon settings in CONFIG; defaulting to 15 s polls backing off to 300 s.")
+        poll_interval, max_poll_interval, queue_size, seen_ids, author_memo = 15.0, 300.0, 1000, 2000, 100000
+    return (
+        poll_interval, max_poll_interval, queue_size, seen_ids, author_memo, daemon_config.get("stream_comments", True)
+    )
+
+
+class IngestDaemon:
+    """
+    Polls submission and comment streams of every configured subreddit until stopped.
+    """
+
+    def __init__(self, CONFIG, client, writer, redditor_cache=None):
+        self.CONFIG = CONFIG
+        self.client = client
+        self.writer = writer
+        self.redditor_cache = redditor_cache
+        (self.poll_interval, self.max_poll_interval, queue_size,
+         self.seen_ids, author_memo, self.stream_comments) = get_daemon_settings(CONFIG)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.stopping = asyncio.Event()
+        self.redditor_flights = AsyncSingleFlight(max_remembered=author_memo)
+        self.ingested = {"submission": 0, "comment": 0}
+        self.dropped = {"submission": 0, "comment": 0}
+        self.moderators = frozenset()
+        self._retries = set()  # tasks waiting to queue a failed item again
+
+    def stop(self):
+        if not self.stopping.is_set():
+            logger.info("Stopping the ingest daemon; draining queued items...")
+            self.stopping.set()
+
+    async def _sleep(self, seconds):
+        """
+        Sleeps for `seconds`, returning early when the daemon is stopped.
+        """
+        try:
+            await asyncio.wait_for(self.stopping.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def poll_stream(self, subreddit_name, kind):
+        """
+        Queues the unseen items of one subreddit stream ("submission" or "comment"), oldest first.
+        """
+        seen = BoundedSet(max_size=self.seen_ids)
+        # Paging stops at the first item seen in an earlier poll
+        stop = lambda item: item["id"] in seen
+        delay = self.poll_interval
+        while not self.stopping.is_set():
+            try:
+                with METRICS.phase("listing"):
+                    if kind == "submission":
+                        items = await self.client.listing(f"/r/{subreddit_name}/new", STREAM_LIMIT, stop)
+                    else:
+                        items = await self.client.subreddit_comments(subreddit_name, STREAM_LIMIT, stop)
+            except Exception as e:
+                logger.error(f"Polling {kind}s of '{subreddit_name}' failed: {e}")
+                items = []
+
+            for item in reversed(items):
+                seen.add(item["id"])
+                await self.queue.put((kind, item, 1))
+            if items:
+                logger.debug(f"Queued {len(items)} new {kind}s from '{subreddit_name}'.")
+            # Poll quickly while the subreddit is busy, back off exponentially while it is quiet
+            delay = self.poll_interval if items else min(delay * 2, self.max_poll_interval)
+            await self._sleep(delay)
+
+    async def ingest(self, kind, item):
+        """
+        Fetches the item's author if it is new, then writes the item.
+        Raises when the author fetch failed, so the item can be retried.
+        """
+        if kind == "submission":
+            record = submission_record(item, [], None)
+            author_name, author_fullname = record['author'], item.get('author_fullname')
+        else:
+            record = comment_record(item)
+            author_name, author_fullname = record['comment_author'], record.get('author_fullname')
+        if is_ignored_author(author_name) or author_name == 'Deleted':
+            return
+
+        with METRICS.phase("redditors"):
+            failed = await fetch_authors(
+                self.client, self.CONFIG, {author_name: author_fullname},
+                self.writer, self.redditor_cache, self.redditor_flights, self.moderators,
+            )
+        if failed:
+            raise RuntimeError(f"fetching its author '{author_name}' failed")
+        if kind == "submission":
+            await self.writer.write_submission_async(record)
+        else:
+            await self.writer.write_comment_async(record)
+        self.ingested[kind] += 1
+
+    async def process_queue(self):
+        while (entry := await self.queue.get()) is not None:
+            kind, item, attempt = entry
+            try:
+                await self.ingest(kind, item)
+            except Exception as e:
+                if not self.writer.is_running():
+                    logger.error(f"The database sink stopped ({e}); stopping the ingest daemon.")
+                    self.dropped[kind] += 1
+                    self.stop()
+                    continue
+                self.retry(kind, item, attempt, e)
+
+    def retry(self, kind, item, attempt, error):
+        """
+        Queues a failed item again after an exponential backoff, or drops it after MAX_INGEST_ATTEMPTS tries.
+        """
+        if attempt >= MAX_INGEST_ATTEMPTS or self.stopping.is_set():
+            logger.error(f"Dropping {kind} {item.get('id')} after {attempt} attempts: {error}")
+            self.dropped[kind] += 1
+            return
+        delay = self.poll_interval * 2 ** (attempt - 1)
+        logger.warning(f"Failed to ingest {kind} {item.get('id')} ({error}); retrying in {delay:g}s.")
+
+        async def requeue():
+            await self._sleep(delay)
+            await self.queue.put((kind, item, attempt + 1))
+
+        task = asyncio.create_task(requeue())
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def run(self, workers):
+        subreddit_names = self.CONFIG["subreddit"].split('+')
+        kinds = ("submission", "comment") if self.stream_comments else ("submission",)
+        self.moderators = await fetch_moderators(self.client, subreddit_names)
+        pollers = [
+            asyncio.create_task(self.poll_stream(name, kind))
+            for name in subreddit_names for kind in kinds
+        ]
+        processors = [asyncio.create_task(self.process_queue()) for _ in range(workers)]
+        logger.info(
+            f"Ingest daemon streaming {' and '.join(kind + 's' for kind in kinds)} from "
+            f"{len(subreddit_names)} subreddits with {workers} workers."
+        )
+
+        await asyncio.gather(*pollers)
+        # Retries wake up early once stopping and queue their item ahead of the stop markers
+        await asyncio.gather(*self._retries)
+        for _ in processors:
+            await self.queue.put(None)  # One stop marker per worker once the pollers are done
+        await asyncio.gather(*processors)
+        logger.info(
+            f"Ingested {self.ingested['submission']} submissions and {self.ingested['comment']} comments"
+            + (f"; dropped {self.dropped['submission']} submissions and {self.dropped['comment']} comments."
+               if any(self.dropped.values()) else ".")
+        )
+
+
+async def run_daemon():
+    """
+    Runs the streaming ingest until SIGINT/SIGTERM. Requires "sink": "database" in the 'output' block.
+    """
+    if not streams_to_database(CONFIG):
+        logger.error('The ingest daemon writes to the database; set "sink": "database" in the "output" block.')
+        return
+
+    redditor_cache = None
+    writer = None
+    metrics_server = start_metrics(CONFIG)
+    try:
+        redditor_cache = load_redditor_cache(CONFIG)
+        writer = load_writer(CONFIG, append=True, max_redditors=get_daemon_settings(CONFIG)[4])
+        async with AsyncRedditClient(CONFIG, rate_limiter) as client:
+            daemon = IngestDaemon(CONFIG, client, writer, redditor_cache)
+            loop = asyncio.get_running_loop()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(signum, daemon.stop)
+                except (NotImplementedError, RuntimeError):
+                    pass  # Not supported on Windows; Ctrl+C then ends the run without draining
+            await daemon.run(CONFIG.get("max_concurrent_requests", 4))
+    except Exception as e:
+        logger.error(f"An unexpected error occurred in the ingest daemon: {e}")
+    finally:
+        if writer is not None:
+            writer.close()
+        if redditor_cache is not None:
+            redditor_cache.close()
+        finish_metrics(CONFIG, metrics_server)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_daemon())
@@ -1,267 +1,268 @@
 import asyncio
-import json
 import asyncpg
+from tools.bulk_loader import copy_upsert
 from tools.config.config_loader import CONFIG
+from tools.db_pool import closing_pool, get_pool
+from tools.db_sink import (
+    activity_rows,
+    comment_row,
+    redditor_row,
+    submission_row,
+)
+from tools.scrape_output import (
+    REDDITOR_OUTPUT,
+    SUBMISSION_OUTPUT,
+    find_output,
+    iter_records,
+    iter_redditors,
+)
 from tools.config.logger_config import init_logger, logging
 
 logger = logging.getLogger(__name__)
 logger.info("json to db Basic logging set")
 init_logger()
 
-def load_json_data(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+def find_scrape_outputs():
+    """
+    Locates the scraper's redditor and submission files (.jsonl, compressed .jsonl or legacy .json).
+    """
+    redditor_data_path = find_output(REDDITOR_OUTPUT)
+    submission_data_path = find_output(SUBMISSION_OUTPUT)
+    if redditor_data_path is None or submission_data_path is None:
+        raise FileNotFoundError("Scraper output not found in analysis_results/. Run the scraper first.")
+    return redditor_data_path, submission_data_path
+
+def get_load_settings(CONFIG):
+    """
+    Returns (batch_size, connections) from the 'database' block: rows buffered
+    per load ('load_batch_size') and batches loaded at once ('load_connections').
+    """
+    database_config = CONFIG["database"]
+    try:
+        batch_size = max(1, int(database_config.get("load_batch_size", 5000)))
+        connections = max(1, int(database_config.get("load_connections", 4)))
+    except (ValueError, TypeError):
+        logger.warning("Invalid load_batch_size/load_connections in CONFIG; defaulting to 5000 rows on 4 connections.")
+        batch_size, connections = 5000, 4
+    return batch_size, connections
+
+class BatchLoader:
+    """
+    Buffers rows per table and loads them with copy_upsert as soon as
+    `batch_size` rows are pending, so memory stays flat however large the
+    input is. Up to `connections` batches load at once, each on its own
+    pooled connection; further rows wait until one of them is done.
+    Within a batch, tables are loaded in the order given, e.g. users before
+    their activity. Tables in `skip_existing` keep rows already stored.
+    Use it as `async with`: leaving the block waits until every batch is
+    stored, or cancels the batches still loading when the block raised.
+
+    Per table, `staged` counts the rows handed to a load, `loaded` the rows
+    inserted or updated and `failed` the rows of batches that could not be loaded.
+    """
+
+    def __init__(self, pool, tables, batch_size, connections=1, skip_existing=()):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.skip_existing = set(skip_existing)
+        self.rows = {table: [] for table in tables}
+        self.staged = dict.fromkeys(tables, 0)
+        self.loaded = dict.fromkeys(tables, 0)
+        self.failed = dict.fromkeys(tables, 0)
+        self.pending = 0
+        self._slots = asyncio.Semaphore(connections)
+        self._tasks = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            await self.finish()
+        else:
+            await self.cancel()
+
+    async def add(self, table, rows):
+        self.rows[table].extend(rows)
+        self.pending += len(rows)
+        if self.pending >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """
+        Hands the pending rows to a pooled connection; waits only while every loading connection is busy.
+        """
+        batch = {table: rows for table, rows in self.rows.items() if rows}
+        self.rows = {table: [] for table in self.rows}
+        self.pending = 0
+        if not batch:
+            return
+        for table, rows in batch.items():
+            self.staged[table] += len(rows)
+        await self._slots.acquire()
+        self._tasks.append(asyncio.create_task(self._load(batch)))
+        await asyncio.sleep(0)  # Let the load start sending before reading on
+
+    async def _load(self, batch):
+        unloaded = dict(batch)  # tables of this batch not loaded (or given up on) yet
+        try:
+            async with self.pool.acquire() as conn:
+                for table, rows in batch.items():
+                    try:
+                        merged = await copy_upsert(conn, table, rows, table in self.skip_existing)
+                        self.loaded[table] += merged
+                    except asyncpg.exceptions.DataError as e:
+                        logger.error(f"Error inserting a batch of {len(rows)} rows into '{table}': {e}")
+                        self.failed[table] += len(rows)
+                    del unloaded[table]
+        finally:
+            # Anything else (lost connection, cancellation) ends the whole batch
+            for table, rows in unloaded.items():
+                self.failed[table] += len(rows)
+            self._slots.release()
 
-# Load data from redditor_data.json
-redditor_data_path = 'analysis_results/redditor_data.json'
-redditor_data = load_json_data(redditor_data_path)
+    async def finish(self):
+        """
+        Loads the remaining rows and waits for every batch, then raises the
+        first error a batch stopped on, if any. DataErrors only fail their batch.
+        """
+        await self.flush()
+        results = await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if any(self.failed.values()):
+            failed = ", ".join(f"{rows} rows into '{table}'" for table, rows in self.failed.items() if rows)
+            logger.error(f"Failed to load {failed}.")
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
 
-# Load data from submission_data.json
-submission_data_path = 'analysis_results/submission_data.json'
-submission_data = load_json_data(submission_data_path)
+    async def cancel(self):
+        """
+        Cancels the batches still loading and waits until they have let go of their connections.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
 
 # Asynchronous function to insert redditors into the database
-async def insert_redditors(conn, redditor_data):
+async def insert_redditors(pool, redditors, batch_size, connections=1):
     """
     Inserts or updates redditor data into the database.
 
-    This function iterates through the provided redditor data and inserts or updates
-    corresponding records in the 'users' table. It handles potential
-    UniqueViolationErrors during insertion.
-    
+    This function streams the provided redditor records and inserts or updates
+    corresponding records in the 'users' table, plus each redditor's activity
+    timeline in the 'user_activity' table, with a COPY-based bulk upsert
+    every `batch_size` rows, on up to `connections` pooled connections at
+    once. Only the redditor names are kept in memory. Returns once every
+    user is stored, so their content can be loaded next.
+
     Args:
-        conn: An asyncpg connection object.
-        redditor_data (dict): A dictionary containing redditor data.
+        pool: The shared asyncpg pool.
+        redditors: (redditor name, record) pairs, e.g. from iter_redditors().
+        batch_size (int): rows per bulk upsert.
+        connections (int): batches loaded concurrently.
 
     Returns:
-        set: A set containing the successfully inserted redditors.
+        tuple: (names of all redditors read, names of the successfully inserted redditors).
     """
+    redditor_names = set()
     inserted_redditors = set()
-    redditor_records = []
+    async with BatchLoader(pool, ("users", "user_activity"), batch_size, connections) as loader:
+        for redditor, details in redditors:
+            redditor_names.add(redditor)
+            redditor_id = details.get('redditor_id')
+            if not redditor_id:
+                logger.warning(f"Skipping redditor {redditor} due to missing redditor_id.")
+                continue
 
-    # 1. Collect all redditor records
-    for redditor, details in redditor_data.items():
-        redditor_id = details.get('redditor_id')
-        if not redditor_id:
-            logger.warning(f"Skipping redditor {redditor} due to missing redditor_id.")
-            continue
-        
-        # Build the tuple of 14 values
-        redditor_records.append((
-            redditor_id,
-            details.get('redditorname'),
-            details.get('created_utc'),
-            details.get('link_karma'),
-            details.get('comment_karma'),
-            details.get('total_karma'),
-            details.get('is_employee'),
-            details.get('is_mod'),
-            details.get('is_gold'),
-            details.get('dormant_days'),
-            details.get('has_verified_email'),
-            details.get('accept_followers'),
-            details.get('redditor_is_subscriber'),
-        ))
-        
-        # Track this redditor in our set
-        inserted_redditors.add(redditor)
+            await loader.add("users", [redditor_row(details)])
+            await loader.add("user_activity", activity_rows(details))
 
-    # 2. Perform one batch insertion if we have records
-    if redditor_records:
-        logger.info(f"Batch inserting {len(redditor_records)} redditors into 'users' table.")
-        try:
-            await conn.executemany(
-                """
-                INSERT INTO users (
-                    redditor_id, redditor, created_utc, link_karma, comment_karma, total_karma,
-                    is_employee, is_mod, is_gold, dormant_days, has_verified_email,
-                    accepts_followers, redditor_is_subscriber
-                )
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
-                ON CONFLICT (redditor_id) DO UPDATE SET
-                    redditor = EXCLUDED.redditor,
-                    created_utc = EXCLUDED.created_utc,
-                    link_karma = EXCLUDED.link_karma,
-                    comment_karma = EXCLUDED.comment_karma,
-                    total_karma = EXCLUDED.total_karma,
-                    is_employee = EXCLUDED.is_employee,
-                    is_mod = EXCLUDED.is_mod,
-                    is_gold = EXCLUDED.is_gold,
-                    dormant_days = EXCLUDED.dormant_days,
-                    has_verified_email = EXCLUDED.has_verified_email,
-                    accepts_followers = EXCLUDED.accepts_followers,
-                    redditor_is_subscriber = EXCLUDED.redditor_is_subscriber;
-                """,
-                redditor_records
-            )
-        except asyncpg.exceptions.UniqueViolationError as e:
-            logger.error(f"Error in batch insertion: {e}")
-    else:
-        logger.warning("No valid redditor records found. Skipping insertion.")
+            # Track this redditor in our set
+            inserted_redditors.add(redditor)
 
-    return inserted_redditors
+    if not inserted_redditors:
+        logger.warning("No valid redditor records found. Skipping insertion.")
+    logger.info(
+        f"Inserted {loader.loaded['users']} redditors into 'users' and "
+        f"{loader.loaded['user_activity']} activity items into 'user_activity'."
+    )
+    return redditor_names, inserted_redditors
 
-async def insert_submissions(conn, redditor_data, submission_data):
+async def insert_submissions(pool, submissions, redditor_names, inserted_redditors, batch_size, connections=1):
     """
-    Inserts submissions into the submissions table.
-    """
-    logger.info("Inserting submissions")
-    for submission_id, submission in submission_data.items():
-        if submission.get("author") not in redditor_data:
-            logger.warning(f"redditor {submission.get('author')} not found in redditor data, skipping submission: {submission_id}")
-            continue
-        try:
-            await conn.executemany(
-                """
-                INSERT INTO submissions (
-                    submission_id,
-                    author,
-                    title,
-                    submission_score,
-                    url,
-                    submission_created_utc,
-                    over_18
-                )
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
-                ON CONFLICT (submission_id) DO UPDATE SET
-                    author = EXCLUDED.author,
-                    title = EXCLUDED.title,
-                    submission_score = EXCLUDED.submission_score,
-                    url = EXCLUDED.url,
-                    submission_created_utc = EXCLUDED.submission_created_utc,
-                    over_18 = EXCLUDED.over_18;
-                """,
-                [
-                    (
-                        submission_id,
-                        submission.get("author"),
-                        submission.get("title"),
-                        submission.get("submission_score"),
-                        submission.get("url"),
-                        submission.get("submission_created_utc"),
-                        submission.get("over_18")
-                    )
-                    for submission_id, submission in submission_data.items()
-                ]
-            )
-        except asyncpg.exceptions.UniqueViolationError as e:
-            logger.error(f"Error inserting submission {submission_id}: {e}")
-            await conn.rollback()  # Rollback for this error and continue
-    logger.info("Finished inserting submissions")
+    Inserts submissions and their comments, streaming the submission records once.
 
-async def insert_comments(conn, submission_data, inserted_redditors):
+    Submissions are kept when their author is among `redditor_names`,
+    comments when their author is among `inserted_redditors`. Rows are
+    flushed with a COPY-based bulk load every `batch_size` rows, on up to
+    `connections` pooled connections at once; comments already in the table
+    are skipped by the merge itself (an anti-join against the staged rows),
+    not by a lookup per comment.
     """
-    Inserts comments into the comments table.
-    """
-    logger.info("Inserting comments")
-    for submission_id, submission in submission_data.items():
-        comments = submission.get('comments', [])
-        if not comments:
-            continue
-
-        for comment in comments:
-            comment_author = comment['comment_author']
-            comment_id = comment['comment_id']
-            if comment_author not in inserted_redditors:
-                logger.warning(f"Author {comment_author} not found in inserted redditors, skipping comment {comment_id}")
+    logger.info("Inserting submissions and comments")
+    async with BatchLoader(
+        pool, ("submissions", "comments"), batch_size, connections, skip_existing=("comments",)
+    ) as loader:
+        for submission in submissions:
+            submission_id = submission['submission_id']
+            if submission.get("author") not in redditor_names:
+                logger.warning(f"redditor {submission.get('author')} not found in redditor data, skipping submission: {submission_id}")
                 continue
-            try:
-                logger.debug(f"Checking for existing comment: {comment_id}")
-                existing_comment = await conn.fetchrow("SELECT comment_id FROM comments WHERE comment_id = $1", comment_id)
-                if existing_comment:
-                    logger.warning(f"Comment {comment_id} already exists, skipping insert")
+            await loader.add("submissions", [submission_row(submission_id, submission)])
+
+            comment_records = []
+            for comment in submission.get('comments', []):
+                comment_author = comment['comment_author']
+                comment_id = comment['comment_id']
+                if comment_author not in inserted_redditors:
+                    logger.warning(f"Author {comment_author} not found in inserted redditors, skipping comment {comment_id}")
                     continue
+                comment_records.append(comment_row(comment))
+            await loader.add("comments", comment_records)
 
-                logger.info("Inserting comment")
-                await conn.executemany(
-                    """
-                    INSERT INTO comments (
-                        comment_id,
-                        comment_author,
-                        comment_created_utc,
-                        body,
-                        comment_score,
-                        is_submitter,
-                        edited,
-                        link_id
-                    )
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                    ON CONFLICT (comment_id) DO UPDATE SET
-                        comment_author = EXCLUDED.comment_author,
-                        comment_created_utc = EXCLUDED.comment_created_utc,
-                        body = EXCLUDED.body,
-                        comment_score = EXCLUDED.comment_score,
-                        is_submitter = EXCLUDED.is_submitter,
-                        edited = EXCLUDED.edited,
-                        link_id = EXCLUDED.link_id;
-                    """,
-                    [
-                        (
-                            comment['comment_id'],
-                            comment['comment_author'],
-                            comment['comment_created_utc'],
-                            comment['body'],
-                            comment['comment_score'],
-                            comment['is_submitter'],
-                            bool(comment['edited']),  # Ensure edited is a boolean
-                            comment['link_id'],
-                        )
-                        for comment in comments
-                    ]
-                )
-            except asyncpg.exceptions.DataError as e:
-                logger.error(f"Error inserting comment {comment_id}: {e}")
-                await conn.rollback()  # Rollback for this error and continue
-    logger.info("Finished inserting comments")
+    logger.info(f"Finished inserting {loader.loaded['submissions']} submissions and {loader.loaded['comments']} comments")
+    skipped_comments = loader.staged["comments"] - loader.loaded["comments"] - loader.failed["comments"]
+    if skipped_comments > 0:
+        logger.info(f"Skipped {skipped_comments} comments that were already stored or duplicated")
 
-async def _process_and_insert_data(conn):
+async def _process_and_insert_data(pool):
     """
-    Processes the JSON files and inserts the data into the database.
+    Streams the scraper output files into the database, record by record.
+    Users are fully stored before their submissions and comments are loaded;
+    within each of the two phases, batches load concurrently.
     """
-    logger.info("Processing JSON files for data insertion")
-    with open('analysis_results/redditor_data.json', 'r', encoding='utf-8') as file:
-        redditor_data = json.load(file)
-        logger.debug("Extracted redditor data from redditor_data.json")
-
-    with open('analysis_results/submission_data.json', 'r', encoding='utf-8') as file:
-        submission_data = json.load(file)
-        logger.debug("Extracted submission data from submission_data.json")
+    logger.info("Processing scraper output for data insertion")
+    redditor_data_path, submission_data_path = find_scrape_outputs()
+    batch_size, connections = get_load_settings(CONFIG)
 
     logger.info("Calling insert_redditors() function...")
-    inserted_redditors = await insert_redditors(conn, redditor_data)
+    redditor_names, inserted_redditors = await insert_redditors(
+        pool, iter_redditors(redditor_data_path), batch_size, connections
+    )
+    logger.debug(f"Streamed redditor data from {redditor_data_path}")
     logger.info(f"Inserted redditors: {len(inserted_redditors)}")
 
-    await insert_submissions(conn, redditor_data, submission_data)
-    logger.info("Inserted submissions")
-
-    await insert_comments(conn, submission_data, inserted_redditors)
-    logger.info("Inserted comments")
-    logger.info(f"Total redditors found: {len(redditor_data)}")
-    logger.info(f"Total submissions found: {len(submission_data)}")
+    await insert_submissions(
+        pool, iter_records(submission_data_path), redditor_names, inserted_redditors, batch_size, connections
+    )
+    logger.debug(f"Streamed submission data from {submission_data_path}")
+    logger.info(f"Total redditors found: {len(redditor_names)}")
 
 async def main():
     """
     Executes the process of extracting data from JSON files and inserting it into a PostgreSQL database.
     """
-    config = CONFIG['database']
-    # Map 'dbname' from the config to 'database' for asyncpg
-    conn = await asyncpg.connect(
-        user =config['user'],  # Map 'user' to 'redditor'
-        password=config['password'],
-        database=config['dbname'],  # Map 'dbname' to 'database'
-        host=config['host'],
-        port=config.get('port', 5432)  # Default to 5432 if port is not provided
-    )
+    pool = await get_pool()
     try:
-        logger.info("Loaded config and connected to database")
-        await _process_and_insert_data(conn)
+        logger.info("Loaded config and connected to the database pool")
+        await _process_and_insert_data(pool)
     except Exception as e:
         logger.exception(f"An error occurred in json_to_db.main: {e}")
         raise
-    finally:
-        await conn.close()
-        logger.info("Committed data and closed connection")
+    logger.info("Committed data")
 
 if __name__ == '__main__':
-    asyncio.run(main())
-    logger.info("Data insertion complete")
\ No newline at end of file
+    asyncio.run(closing_pool(main()))
+    logger.info("Data insertion complete")
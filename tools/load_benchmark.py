@@ -0,0 +1,149 @@
+'''
+Database load benchmark: executemany upserts vs COPY + staging-table merge.
+
+Generates synthetic users, activity items, submissions and comments, then
+loads them into a scratch schema of the configured database twice per
+method: into empty tables (plain inserts) and again into the filled tables
+(every row conflicts and is updated, or skipped by "copy-skip", the
+anti-join merge json_to_db uses for comments). Reports rows/sec per table. The
+scratch schema is dropped afterwards, so the real tables are left alone.
+
+    python -m tools.load_benchmark --users 20000 --submissions 2000 --comments 50
+'''
+import argparse
+import asyncio
+import random
+import time
+import asyncpg
+from tools.bulk_loader import copy_upsert
+from tools.config.config_loader import CONFIG
+from tools.db_sink import UPSERT_ACTIVITY_SQL, UPSERT_COMMENTS_SQL, UPSERT_SUBMISSIONS_SQL, UPSERT_USERS_SQL
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("Load benchmark Basic logging set")
+init_logger()
+
+SCHEMA = "load_benchmark"
+UPSERT_SQL = {
+    "users": UPSERT_USERS_SQL,
+    "user_activity": UPSERT_ACTIVITY_SQL,
+    "submissions": UPSERT_SUBMISSIONS_SQL,
+    "comments": UPSERT_COMMENTS_SQL,
+}
+# Same tables as database_setup.sql.txt
+CREATE_TABLES_SQL = """
+    CREATE TABLE users (
+      redditor_id VARCHAR(255) PRIMARY KEY, redditor VARCHAR(255) UNIQUE, created_utc BIGINT,
+      link_karma INTEGER, comment_karma INTEGER, total_karma INTEGER, is_employee BOOLEAN,
+      is_mod BOOLEAN, is_gold BOOLEAN, dormant_days INTEGER, has_verified_email BOOLEAN,
+      accepts_followers BOOLEAN, redditor_is_subscriber BOOLEAN
+    );
+    CREATE TABLE user_activity (
+      kind VARCHAR(16), item_id VARCHAR(255), redditor_id VARCHAR(255), activity_utc BIGINT,
+      subreddit VARCHAR(255), score INTEGER, PRIMARY KEY (kind, item_id)
+    );
+    CREATE TABLE submissions (
+      submission_id VARCHAR(255) PRIMARY KEY, author VARCHAR(255), title TEXT, submission_score INTEGER,
+      url TEXT, submission_created_utc BIGINT, over_18 BOOLEAN
+    );
+    CREATE TABLE comments (
+      comment_id VARCHAR(255) PRIMARY KEY, comment_author VARCHAR(255), comment_created_utc BIGINT,
+      body TEXT, comment_score INTEGER, is_submitter BOOLEAN, edited BOOLEAN, link_id VARCHAR(255)
+    );
+"""
+
+
+def synthetic_rows(args):
+    """
+    Returns {table: [row, ...]} shaped like the tools.db_sink row builders.
+    """
+    rng = random.Random(args.seed)
+    now = int(time.time())
+    users = [
+        (f"t2_u{index}", f"user_{index}", now - rng.randrange(10**8), rng.randrange(10**5),
+         rng.randrange(10**5), rng.randrange(2 * 10**5), False, False, False, rng.randrange(400),
+         True, True, False)
+        for index in range(args.users)
+    ]
+    activity = [
+        ("comment", f"a{user_index}_{item}", f"t2_u{user_index}", now - rng.randrange(10**7), "benchmark", rng.randrange(-5, 500))
+        for user_index in range(args.users) for item in range(args.activity)
+    ]
+    submissions = [
+        (f"s{index}", f"user_{rng.randrange(args.users)}", f"Submission {index}", rng.randrange(5000),
+         f"https://example.com/{index}", now - rng.randrange(10**6), False)
+        for index in range(args.submissions)
+    ]
+    comments = [
+        (f"c{index}_{number}", f"user_{rng.randrange(args.users)}", now - rng.randrange(10**6),
+         "Synthetic comment body " * rng.randrange(1, 8), rng.randrange(-20, 800), False, False, f"t3_s{index}")
+        for index in range(args.submissions) for number in range(args.comments)
+    ]
+    return {"users": users, "user_activity": activity, "submissions": submissions, "comments": comments}
+
+
+async def load_executemany(conn, table, rows):
+    async with conn.transaction():
+        await conn.executemany(UPSERT_SQL[table], rows)
+
+
+async def load_copy(conn, table, rows):
+    await copy_upsert(conn, table, rows)
+
+
+async def load_copy_skip_existing(conn, table, rows):
+    await copy_upsert(conn, table, rows, skip_existing=True)
+
+
+async def run_benchmark(args):
+    db_config = CONFIG["database"]
+    conn = await asyncpg.connect(
+        user=db_config["user"],
+        password=db_config["password"],
+        database=db_config["dbname"],
+        host=db_config["host"],
+        port=db_config.get("port", 5432),
+        server_settings={"search_path": SCHEMA},
+    )
+    tables = synthetic_rows(args)
+    results = []
+    try:
+        for method, load in (
+            ("executemany", load_executemany), ("copy", load_copy), ("copy-skip", load_copy_skip_existing)
+        ):
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+            await conn.execute(CREATE_TABLES_SQL)
+            for mode in ("insert", "update"):
+                for table, rows in tables.items():
+                    started = time.monotonic()
+                    await load(conn, table, rows)
+                    results.append((method, mode, table, len(rows), time.monotonic() - started))
+                    logger.info(f"{method} {mode} {table}: {len(rows)} rows in {results[-1][-1]:.2f}s")
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+    return results
+
+
+def print_report(results):
+    print("\nDatabase load benchmark")
+    print(f"  {'method':<13}{'mode':<8}{'table':<15}{'rows':>10}{'s':>9}{'rows/s':>12}")
+    for method, mode, table, rows, seconds in results:
+        rate = rows / seconds if seconds else 0.0
+        print(f"  {method:<13}{mode:<8}{table:<15}{rows:>10d}{seconds:>9.2f}{rate:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark executemany upserts against COPY + merge loading")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--activity", type=int, default=10, help="activity items per user")
+    parser.add_argument("--submissions", type=int, default=1000)
+    parser.add_argument("--comments", type=int, default=50, help="comments per submission")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    print_report(asyncio.run(run_benchmark(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+'''
+Request metrics for the scraper.
+
+Every Reddit API request is recorded by endpoint (request count per HTTP
+status, latency histogram, bytes received, 429s and retries), together with
+the time workers spent sleeping in the rate limiter and the time spent in each
+scrape phase. The numbers are written in Prometheus text format at the end
+of a run (and optionally served on /metrics while it runs) and summarised in
+the log.
+'''
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("Metrics Basic logging set")
+init_logger()
+
+METRICS_PATH = 'analysis_results/scraper_metrics.prom'
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+# Path patterns -> endpoint labels, so per-user and per-thread URLs share one series
+ENDPOINT_PATTERNS = [
+    (re.compile(r"^/api/v1/access_token$"), "/api/v1/access_token"),
+    (re.compile(r"^/r/[^/]+/about/moderators$"), "/r/{subreddit}/about/moderators"),
+    (re.compile(r"^/r/[^/]+/(new|hot|top|rising|controversial)$"), r"/r/{subreddit}/\1"),
+    (re.compile(r"^/r/[^/]+/comments$"), "/r/{subreddit}/comments"),
+    (re.compile(r"^/comments/[^/]+(/.*)?$"), "/comments/{id}"),
+    (re.compile(r"^/api/morechildren$"), "/api/morechildren"),
+    (re.compile(r"^/api/user_data_by_account_ids$"), "/api/user_data_by_account_ids"),
+    (re.compile(r"^/(user|u)/[^/]+/(about|comments|submitted)$"), r"/user/{name}/\2"),
+]
+
+
+def endpoint_label(url):
+    """
+    Maps a request URL or path to its endpoint label, e.g. /user/{name}/about.
+    """
+    path = urlsplit(url).path.rstrip("/")
+    if path.endswith(".json"):
+        path = path[:-5]
+    for pattern, label in ENDPOINT_PATTERNS:
+        if pattern.match(path):
+            return pattern.sub(label, path)
+    return "other"
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class ScraperMetrics:
+    """
+    Thread-safe counters and histograms for one scraper process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}      # (endpoint, status) -> count
+            self.latency = {}       # endpoint -> [bucket counts, sum, count, max]
+            self.bytes = {}         # endpoint -> bytes received
+            self.rate_limited = {}  # endpoint -> 429 responses
+            self.retries = {}       # endpoint -> retried requests
+            self.sleep_seconds = {}  # reason -> seconds slept, summed over workers
+            self.phase_seconds = {}  # phase -> seconds spent, summed over workers
+            self.started = time.time()
+
+    def observe_request(self, endpoint, status, seconds, size):
+        with self._lock:
+            self.requests[(endpoint, status)] = self.requests.get((endpoint, status), 0) + 1
+            histogram = self.latency.setdefault(endpoint, [[0] * len(LATENCY_BUCKETS), 0.0, 0, 0.0])
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[0][index] += 1
+                    break
+            histogram[1] += seconds
+            histogram[2] += 1
+            histogram[3] = max(histogram[3], seconds)
+            self.bytes[endpoint] = self.bytes.get(endpoint, 0) + size
+            if status == 429:
+                self.rate_limited[endpoint] = self.rate_limited.get(endpoint, 0) + 1
+
+    def total_requests(self):
+        with self._lock:
+            return sum(self.requests.values())
+
+    def count_retry(self, endpoint):
+        with self._lock:
+            self.retries[endpoint] = self.retries.get(endpoint, 0) + 1
+
+    def add_sleep(self, reason, seconds):
+        if seconds <= 0:
+            return
+        with self._lock:
+            self.sleep_seconds[reason] = self.sleep_seconds.get(reason, 0.0) + seconds
+
+    def snapshot(self):
+        """
+        Returns the counters as plain data that can be sent to another process.
+        """
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "latency": {endpoint: [list(h[0]), h[1], h[2], h[3]] for endpoint, h in self.latency.items()},
+                "bytes": dict(self.bytes),
+                "rate_limited": dict(self.rate_limited),
+                "retries": dict(self.retries),
+                "sleep_seconds": dict(self.sleep_seconds),
+                "phase_seconds": dict(self.phase_seconds),
+            }
+
+    def merge(self, snapshot):
+        """
+        Adds a `snapshot()` taken in another process (e.g. a scraper shard) to these counters.
+        """
+        with self._lock:
+            for name in ("requests", "bytes", "rate_limited", "retries", "sleep_seconds", "phase_seconds"):
+                totals = getattr(self, name)
+                for key, value in snapshot.get(name, {}).items():
+                    totals[key] = totals.get(key, 0) + value
+            for endpoint, (buckets, total, count, slowest) in snapshot.get("latency", {}).items():
+                histogram = self.latency.setdefault(endpoint, [[0] * len(LATENCY_BUCKETS), 0.0, 0, 0.0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+                histogram[1] += total
+                histogram[2] += count
+                histogram[3] = max(histogram[3], slowest)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Adds the time spent in the `with` block to the phase total.
+        """
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + elapsed
+
+    def render(self):
+        """
+        Returns the metrics in Prometheus text exposition format.
+        """
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            family("reddit_scraper_requests_total", "counter", "Reddit API requests by endpoint and HTTP status.")
+            for (endpoint, status), count in sorted(self.requests.items()):
+                lines.append(f"reddit_scraper_requests_total{_labels(endpoint=endpoint, status=status)} {count}")
+
+            family("reddit_scraper_request_duration_seconds", "histogram", "Reddit API request latency.")
+            for endpoint, (buckets, total, count, _) in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"reddit_scraper_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=le)} {cumulative}")
+                lines.append(f"reddit_scraper_request_duration_seconds_sum{_labels(endpoint=endpoint)} {total:.6f}")
+                lines.append(f"reddit_scraper_request_duration_seconds_count{_labels(endpoint=endpoint)} {count}")
+
+            family("reddit_scraper_response_bytes_total", "counter", "Response body bytes received.")
+            for endpoint, size in sorted(self.bytes.items()):
+                lines.append(f"reddit_scraper_response_bytes_total{_labels(endpoint=endpoint)} {size}")
+
+            family("reddit_scraper_rate_limited_total", "counter", "429 Too Many Requests responses.")
+            for endpoint, count in sorted(self.rate_limited.items()):
+                lines.append(f"reddit_scraper_rate_limited_total{_labels(endpoint=endpoint)} {count}")
+
+            family("reddit_scraper_retries_total", "counter", "Requests that were retried.")
+            for endpoint, count in sorted(self.retries.items()):
+                lines.append(f"reddit_scraper_retries_total{_labels(endpoint=endpoint)} {count}")
+
+            family("reddit_scraper_sleep_seconds_total", "counter", "Seconds workers slept in the rate limiter, by reason.")
+            for reason, seconds in sorted(self.sleep_seconds.items()):
+                lines.append(f"reddit_scraper_sleep_seconds_total{_labels(reason=reason)} {seconds:.3f}")
+
+            family("reddit_scraper_phase_seconds_total", "counter", "Seconds spent per scrape phase, summed over workers.")
+            for phase, seconds in sorted(self.phase_seconds.items()):
+                lines.append(f"reddit_scraper_phase_seconds_total{_labels(phase=phase)} {seconds:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=METRICS_PATH):
+        metrics_dir = os.path.dirname(path)
+        if metrics_dir and not os.path.exists(metrics_dir):
+            os.makedirs(metrics_dir)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+        logger.info(f"Wrote scraper metrics to {path}")
+
+    def log_summary(self):
+        """
+        Logs one line per endpoint plus the sleep and phase totals.
+        """
+        with self._lock:
+            elapsed = time.time() - self.started
+            total = sum(self.requests.values())
+            logger.info(f"Scraper metrics: {total} requests in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} req/s)")
+            for endpoint, (_, seconds, count, slowest) in sorted(self.latency.items(), key=lambda item: -item[1][1]):
+                logger.info(
+                    f"  {endpoint}: {count} requests, mean {seconds / count * 1000:.0f} ms, "
+                    f"max {slowest * 1000:.0f} ms, {self.bytes.get(endpoint, 0) / 1e6:.2f} MB, "
+                    f"{self.rate_limited.get(endpoint, 0)} x 429, {self.retries.get(endpoint, 0)} retries"
+                )
+            if self.sleep_seconds:
+                logger.info("  sleeping: " + ", ".join(f"{reason} {seconds:.1f}s" for reason, seconds in sorted(self.sleep_seconds.items())))
+            if self.phase_seconds:
+                logger.info("  phases: " + ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in sorted(self.phase_seconds.items())))
+
+
+# Process-wide registry shared by both backends and the rate limiter
+METRICS = ScraperMetrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"metrics {format % args}")
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """
+    Serves METRICS on http://host:port/metrics from a daemon thread.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving scraper metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start_metrics(CONFIG):
+    """
+    Resets METRICS for a new run and starts the /metrics endpoint if the 'metrics' block sets a port.
+    Returns the server (or None).
+    """
+    METRICS.reset()
+    port = CONFIG.get("metrics", {}).get("port")
+    if not port:
+        return None
+    try:
+        return start_metrics_server(int(port))
+    except (OSError, ValueError, TypeError) as e:
+        logger.warning(f"Could not start the metrics endpoint on port {port}: {e}")
+        return None
+
+
+def finish_metrics(CONFIG, server=None):
+    """
+    Writes the metrics file named in the 'metrics' block, logs the summary and stops the endpoint.
+    """
+    metrics_config = CONFIG.get("metrics", {})
+    if metrics_config.get("enabled", True):
+        try:
+            METRICS.write(metrics_config.get("path", METRICS_PATH))
+        except OSError as e:
+            logger.warning(f"Could not write scraper metrics: {e}")
+    METRICS.log_summary()
+    if server is not None:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,181 @@
+'''
+Budgeted, prioritised redditor profile fetching.
+
+By default every author is profiled as soon as its submission is processed,
+so when a run has more authors than API budget, which accounts get covered
+depends on thread timing. With the 'profile_scheduler' block enabled, the
+scraper first fetches every listing and comment tree and only records the
+authors. Each author is scored by cheap signals from that data: the number
+of threads they appear in, comments whose body also appears elsewhere in the
+run, comments at or below a low score, and having written a scraped
+submission. Profiles are then fetched highest score first until the run's
+wall-clock or request budget is spent.
+
+Submissions are still written as soon as they are scraped; the scheduler
+keeps only author names, fullnames and their signals. The database sink drops
+submissions whose author has not been stored yet, so it holds back its
+submission rows until the profile phase is over (see
+DatabaseSink.hold_submissions).
+'''
+import hashlib
+import threading
+import time
+from collections import Counter
+from tools.config.logger_config import init_logger, logging
+from tools.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+logger.info("Profile scheduler Basic logging set")
+init_logger()
+
+DEFAULT_WEIGHTS = {"threads": 1.0, "duplicate_bodies": 2.0, "low_scores": 1.0, "submission_author": 3.0}
+MIN_DUPLICATE_BODY_LENGTH = 20  # shorter bodies ("lol", "this") repeat naturally
+IGNORED_BODIES = {"[deleted]", "[removed]"}
+
+
+def body_key(body):
+    """
+    Normalised digest of a comment body, used to spot the same text posted more than once.
+    """
+    text = " ".join((body or "").lower().split())
+    if len(text) < MIN_DUPLICATE_BODY_LENGTH or text in IGNORED_BODIES:
+        return None
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+class ProfileScheduler:
+    """
+    Collects author signals while comment trees are scraped and hands out
+    authors in priority order while the budget lasts. Thread-safe.
+    """
+
+    def __init__(self, weights=None, low_score=0, max_seconds=None, max_requests=None):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.low_score = low_score
+        self.max_seconds = max_seconds
+        self.max_requests = max_requests
+        self.started = time.monotonic()
+        self.scheduled = 0
+        self._order = []
+        self._chunk_size = 1
+        self._authors = {}  # name -> {"fullname", "threads", "low_scores", "submissions", "bodies"}
+        self._body_counts = Counter()
+        self._lock = threading.Lock()
+
+    def _author(self, name, fullname):
+        entry = self._authors.setdefault(
+            name, {"fullname": None, "threads": set(), "low_scores": 0, "submissions": 0, "bodies": []}
+        )
+        entry["fullname"] = entry["fullname"] or fullname
+        return entry
+
+    def add_submission(self, submission_record, author_fullname=None):
+        """
+        Records the author signals of a scraped submission; the record itself is not kept.
+        """
+        submission_id = submission_record['submission_id']
+        with self._lock:
+            author_name = submission_record.get('author')
+            if author_name and author_name != 'Deleted':
+                entry = self._author(author_name, author_fullname)
+                entry["threads"].add(submission_id)
+                entry["submissions"] += 1
+            for comment in submission_record.get('comments', []):
+                entry = self._author(comment['comment_author'], comment.get('author_fullname'))
+                entry["threads"].add(submission_id)
+                score = comment.get('comment_score')
+                if score is not None and score <= self.low_score:
+                    entry["low_scores"] += 1
+                if (key := body_key(comment.get('body'))) is not None:
+                    entry["bodies"].append(key)
+                    self._body_counts[key] += 1
+
+    def priority(self, name):
+        entry = self._authors[name]
+        duplicates = sum(1 for key in entry["bodies"] if self._body_counts[key] > 1)
+        return (
+            self.weights["threads"] * len(entry["threads"])
+            + self.weights["duplicate_bodies"] * duplicates
+            + self.weights["low_scores"] * entry["low_scores"]
+            + self.weights["submission_author"] * entry["submissions"]
+        )
+
+    def ordered_authors(self):
+        """
+        Returns [(name, fullname)] of every author, most suspicious first.
+        """
+        with self._lock:
+            ranked = sorted(self._authors, key=lambda name: (-self.priority(name), name))
+            return [(name, self._authors[name]["fullname"]) for name in ranked]
+
+    def start_fetching(self, chunk_size=1):
+        """
+        Freezes the priority order; `next_chunk` then hands it out `chunk_size` authors at a time.
+        """
+        self._order = self.ordered_authors()
+        self._chunk_size = max(1, chunk_size)
+        self.scheduled = 0
+
+    def next_chunk(self):
+        """
+        Returns the next {name: fullname} chunk in priority order, or None when
+        every author was handed out or the budget is spent.
+        """
+        with self._lock:
+            if self.scheduled >= len(self._order):
+                return None
+            if not self.budget_left():
+                logger.warning(
+                    f"Profile fetch budget spent; skipping {len(self._order) - self.scheduled} lower-priority authors."
+                )
+                self._order = self._order[:self.scheduled]
+                return None
+            chunk = dict(self._order[self.scheduled:self.scheduled + self._chunk_size])
+            self.scheduled += len(chunk)
+            return chunk
+
+    def budget_left(self):
+        """
+        False once the run's wall-clock or request budget is spent.
+        """
+        if self.max_seconds is not None and time.monotonic() - self.started >= self.max_seconds:
+            return False
+        if self.max_requests is not None and METRICS.total_requests() >= self.max_requests:
+            return False
+        return True
+
+    def log_summary(self):
+        elapsed = time.monotonic() - self.started
+        skipped = len(self._authors) - self.scheduled
+        logger.info(
+            f"Profile scheduler: {self.scheduled} of {len(self._authors)} authors scheduled in priority order "
+            f"after {elapsed:.1f}s and {METRICS.total_requests()} requests"
+            + (f"; {skipped} lowest-priority authors left out by the budget." if skipped else ".")
+        )
+
+
+def schedules_profiles(CONFIG):
+    """
+    True when redditor profiles are fetched after every submission was scraped.
+    """
+    return CONFIG.get("profile_scheduler", {}).get("enabled", False)
+
+
+def load_profile_scheduler(CONFIG):
+    """
+    Builds a ProfileScheduler from the 'profile_scheduler' block in CONFIG, or returns None when disabled.
+    """
+    if not schedules_profiles(CONFIG):
+        return None
+    scheduler_config = CONFIG["profile_scheduler"]
+    try:
+        max_seconds = scheduler_config.get("max_seconds")
+        max_seconds = float(max_seconds) if max_seconds is not None else None
+        max_requests = scheduler_config.get("max_requests")
+        max_requests = int(max_requests) if max_requests is not None else None
+        low_score = int(scheduler_config.get("low_score", 0))
+        weights = {key: float(value) for key, value in scheduler_config.get("weights", {}).items()}
+    except (ValueError, TypeError, AttributeError):
+        logger.warning("Invalid profile_scheduler settings in CONFIG; scheduling without a budget.")
+        max_seconds, max_requests, low_score, weights = None, None, 0, None
+    return ProfileScheduler(weights, low_score, max_seconds, max_requests)
@@ -0,0 +1,128 @@
+'''
+Shared token-bucket rate limiter for all Reddit API requests.
+
+Every scraper worker draws from the same bucket, so the combined request rate
+of all `max_concurrent_requests` workers stays within Reddit's budget. The
+refill rate is re-derived from the X-Ratelimit-Remaining / X-Ratelimit-Reset
+headers whenever they are observed, and a 429 pauses every worker at once
+instead of only the thread that hit it.
+'''
+import asyncio
+import threading
+import time
+from tools.config.logger_config import init_logger, logging
+from tools.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+logger.info("Rate limiter Basic logging set")
+init_logger()
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket usable from worker threads (acquire) and
+    coroutines (acquire_async).
+    """
+
+    def __init__(self, requests_per_minute=100, burst=10):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.pause_reason = "rate_limit"
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def _reserve(self, cost):
+        """
+        Takes `cost` tokens from the bucket and returns how long the caller has to wait for them.
+        The wait is recorded in METRICS, split into pause time and token-bucket time.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= cost
+            paused = max(self.paused_until - now, 0.0)
+            bucket_wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            pause_reason = self.pause_reason
+        METRICS.add_sleep(pause_reason, paused)
+        METRICS.add_sleep("token_bucket", bucket_wait)
+        return paused + bucket_wait
+
+    def acquire(self, cost=1):
+        """
+        Blocks the calling thread until `cost` requests may be sent.
+        """
+        if (wait := self._reserve(cost)) > 0:
+            logger.debug(f"Rate limiter sleeping {wait:.2f}s")
+            time.sleep(wait)
+
+    async def acquire_async(self, cost=1):
+        """
+        Suspends the calling coroutine until `cost` requests may be sent.
+        """
+        if (wait := self._reserve(cost)) > 0:
+            logger.debug(f"Rate limiter sleeping {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds, reason="rate_limit"):
+        """
+        Stops every worker from sending requests for `seconds`.
+        `reason` labels the resulting sleep time in the metrics.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now + seconds > self.paused_until:
+                self.paused_until = now + seconds
+                self.pause_reason = reason
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = now
+
+    def update(self, remaining, reset_seconds):
+        """
+        Re-paces the bucket so the remaining request budget is spread evenly
+        over the time left in Reddit's rate-limit window.
+        """
+        if remaining is None or reset_seconds is None or reset_seconds <= 0:
+            return
+        if remaining < 1:
+            logger.warning(f"Rate limit budget exhausted. Pausing all requests for {reset_seconds:.0f} seconds.")
+            self.pause(reset_seconds, reason="budget_exhausted")
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = remaining / reset_seconds
+            self.tokens = min(self.tokens, remaining)
+
+    def update_from_headers(self, headers):
+        """
+        Reads X-Ratelimit-Remaining and X-Ratelimit-Reset from a response's headers.
+        """
+        try:
+            remaining = headers.get('x-ratelimit-remaining')
+            reset = headers.get('x-ratelimit-reset')
+            if remaining is None or reset is None:
+                return
+            self.update(float(remaining), float(reset))
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Ignoring malformed rate limit headers: {e}")
+
+
+def load_rate_limiter(CONFIG):
+    """
+    Builds the shared RateLimiter from the 'rate_limit' block in CONFIG.
+    """
+    rate_config = CONFIG.get("rate_limit", {})
+    try:
+        requests_per_minute = float(rate_config.get("requests_per_minute", 100))
+        burst = int(rate_config.get("burst", 10))
+    except (ValueError, TypeError):
+        logger.warning("Invalid rate_limit settings in CONFIG; defaulting to 100 requests per minute, burst 10.")
+        requests_per_minute, burst = 100, 10
+    logger.info(f"Rate limiter set to {requests_per_minute} requests per minute (burst {burst}).")
+    return RateLimiter(requests_per_minute, burst)
@@ -0,0 +1,262 @@
+'''
+Persistent on-disk cache of redditor profiles fetched by the scraper.
+
+Profiles are stored in a local SQLite file keyed by the lower-cased redditor
+name. Entries older than the configured TTL are treated as missing, and the
+least recently used entries are evicted once the cache grows past its size
+limit.
+
+Accounts that could not be profiled because they are gone (404, suspended,
+missing profile attributes) are kept in a separate negative cache with its own
+TTL, so they are skipped without any request until it expires.
+
+Scraper shards (tools.sharding) open the same file from several processes.
+The file uses WAL with a busy timeout, and a cache operation that still fails
+(e.g. "database is locked") is logged and treated as a miss or a skipped
+write: the cache only saves requests, it must never fail a submission.
+'''
+import json
+import os
+import sqlite3
+import threading
+import time
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("Redditor cache Basic logging set")
+init_logger()
+
+DEFAULT_CACHE_PATH = 'analysis_results/redditor_cache.sqlite3'
+
+# Reasons stored in the negative cache
+NOT_FOUND = "not_found"
+SUSPENDED = "suspended"
+MISSING_ATTRIBUTES = "missing_attributes"
+
+
+class RedditorCache:
+    """
+    SQLite backed TTL + LRU cache for redditor info dicts.
+
+    The scraper calls into the cache from several worker threads, so a single
+    connection is shared behind a lock.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=24 * 60 * 60, max_entries=50000,
+                 negative_ttl_seconds=7 * 24 * 60 * 60):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        # Scraper shards (tools.sharding) share the file from several processes
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS redditor_cache (
+                redditor TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_redditor_cache_last_access ON redditor_cache (last_access)"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS redditor_negative_cache (
+                redditor TEXT PRIMARY KEY,
+                reason TEXT NOT NULL,
+                failed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_redditor_negative_cache_failed_at ON redditor_negative_cache (failed_at)"
+        )
+        self._conn.commit()
+        logger.info(
+            f"Opened redditor cache at {path} (ttl={ttl_seconds}s, max_entries={max_entries}, "
+            f"negative_ttl={negative_ttl_seconds}s)"
+        )
+
+    def _discard_transaction(self):
+        """
+        Rolls back whatever a failed cache operation left open on the shared connection.
+        """
+        with self._lock:
+            try:
+                self._conn.rollback()
+            except sqlite3.Error:
+                pass
+
+    def get(self, redditor_name):
+        """
+        Returns the cached info dict for a redditor, or None if it is missing or expired.
+        """
+        try:
+            return self._get(redditor_name)
+        except sqlite3.Error as e:
+            self._discard_transaction()
+            logger.warning(f"Redditor cache lookup of {redditor_name} failed, fetching it instead: {e}")
+            return None
+
+    def _get(self, redditor_name):
+        key = redditor_name.lower()
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, fetched_at FROM redditor_cache WHERE redditor = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            data, fetched_at = row
+            if now - fetched_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM redditor_cache WHERE redditor = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                logger.debug(f"Cached profile for {redditor_name} expired.")
+                return None
+            self._conn.execute(
+                "UPDATE redditor_cache SET last_access = ? WHERE redditor = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(data)
+
+    def put(self, redditor_name, redditor_info):
+        """
+        Stores a redditor info dict and evicts the least recently used entries if needed.
+        """
+        try:
+            self._put(redditor_name, redditor_info)
+        except sqlite3.Error as e:
+            self._discard_transaction()
+            logger.warning(f"Could not cache the profile of {redditor_name}: {e}")
+
+    def _put(self, redditor_name, redditor_info):
+        key = redditor_name.lower()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO redditor_cache (redditor, data, fetched_at, last_access)
+                VALUES (?, ?, ?, ?)
+                """,
+                (key, json.dumps(redditor_info, ensure_ascii=False), now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM redditor_cache").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    """
+                    DELETE FROM redditor_cache WHERE redditor IN (
+                        SELECT redditor FROM redditor_cache ORDER BY last_access ASC LIMIT ?
+                    )
+                    """,
+                    (count - self.max_entries,),
+                )
+                logger.debug(f"Evicted {count - self.max_entries} least recently used cache entries.")
+            self._conn.commit()
+
+    def get_unavailable(self, redditor_name):
+        """
+        Returns why a redditor could not be profiled (e.g. NOT_FOUND), or None
+        if it is not in the negative cache or the entry expired.
+        """
+        try:
+            return self._get_unavailable(redditor_name)
+        except sqlite3.Error as e:
+            self._discard_transaction()
+            logger.warning(f"Negative cache lookup of {redditor_name} failed: {e}")
+            return None
+
+    def _get_unavailable(self, redditor_name):
+        key = redditor_name.lower()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT reason, failed_at FROM redditor_negative_cache WHERE redditor = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            reason, failed_at = row
+            if time.time() - failed_at > self.negative_ttl_seconds:
+                self._conn.execute("DELETE FROM redditor_negative_cache WHERE redditor = ?", (key,))
+                self._conn.commit()
+                return None
+            self.negative_hits += 1
+        return reason
+
+    def put_unavailable(self, redditor_name, reason):
+        """
+        Records that a redditor is gone, and drops expired negative entries.
+        """
+        try:
+            self._put_unavailable(redditor_name, reason)
+        except sqlite3.Error as e:
+            self._discard_transaction()
+            logger.warning(f"Could not cache {redditor_name} as unavailable: {e}")
+
+    def _put_unavailable(self, redditor_name, reason):
+        key = redditor_name.lower()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO redditor_negative_cache (redditor, reason, failed_at) VALUES (?, ?, ?)",
+                (key, reason, now),
+            )
+            self._conn.execute(
+                "DELETE FROM redditor_negative_cache WHERE failed_at < ?", (now - self.negative_ttl_seconds,)
+            )
+            self._conn.commit()
+        logger.debug(f"Cached {redditor_name} as unavailable ({reason}).")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        logger.info(
+            f"Closed redditor cache ({self.hits} hits, {self.misses} misses, "
+            f"{self.negative_hits} unavailable accounts skipped)."
+        )
+
+
+def load_redditor_cache(CONFIG):
+    """
+    Builds a RedditorCache from the 'redditor_cache' block in CONFIG.
+    Returns None when the cache is disabled or cannot be opened.
+    """
+    cache_config = CONFIG.get("redditor_cache", {})
+    if not cache_config.get("enabled", True):
+        logger.info("Redditor cache disabled in CONFIG.")
+        return None
+    try:
+        ttl_hours = float(cache_config.get("ttl_hours", 24))
+        max_entries = int(cache_config.get("max_entries", 50000))
+        negative_ttl_hours = float(cache_config.get("negative_ttl_hours", 168))
+    except (ValueError, TypeError):
+        logger.warning(
+            "Invalid redditor_cache settings in CONFIG; using defaults of 24 hours, 50000 entries "
+            "and 168 hours for unavailable accounts."
+        )
+        ttl_hours, max_entries, negative_ttl_hours = 24, 50000, 168
+    try:
+        return RedditorCache(
+            path=cache_config.get("path", DEFAULT_CACHE_PATH),
+            ttl_seconds=ttl_hours * 60 * 60,
+            max_entries=max_entries,
+            negative_ttl_seconds=negative_ttl_hours * 60 * 60,
+        )
+    except sqlite3.Error as e:
+        logger.error(f"Could not open redditor cache, continuing without it: {e}")
+        return None
@@ -0,0 +1,310 @@
+'''
+Reading and writing the scraper's output files.
+
+The scraper appends one compact JSON line per submission and per redditor as
+soon as each record is ready (`submission_data.jsonl`, `redditor_data.jsonl`),
+optionally gzip or zstd compressed. The readers below accept those files as
+well as the older single-document `redditor_data.json` / `submission_data.json`.
+'''
+import gzip
+import io
+import json
+import os
+import threading
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("Scrape output Basic logging set")
+init_logger()
+
+OUTPUT_DIR = 'analysis_results'
+REDDITOR_OUTPUT = 'redditor_data'
+SUBMISSION_OUTPUT = 'submission_data'
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+OUTPUT_SUFFIXES = [".jsonl", ".jsonl.gz", ".jsonl.zst", ".json"]
+
+
+def open_text(path, mode):
+    """
+    Opens a (possibly compressed) text file, choosing the codec from the file extension.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd output requires the 'zstandard' package (pip install zstandard)") from e
+        if mode == "r":
+            # A resumed run appends a new frame; zstandard.open would stop after the first one
+            reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True)
+            return io.TextIOWrapper(reader, encoding="utf-8")
+        return zstandard.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def stream_end_errors(path):
+    """
+    Errors a reader of `path` raises where a compressed stream was cut short by a crash.
+    """
+    if path.endswith(".zst"):
+        import zstandard
+        return (EOFError, zstandard.ZstdError)
+    return (EOFError,)
+
+
+def truncate_partial_line(path):
+    """
+    Cuts an uncompressed file back to the end of its last complete line.
+    """
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = keep = end
+        while position > 0:
+            step = min(64 * 1024, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline != -1:
+                keep = position - step + newline + 1
+                break
+            position -= step
+        else:
+            keep = 0
+        if keep < end:
+            f.truncate(keep)
+            logger.warning(f"Dropped {end - keep} bytes of a record cut short at the end of {path}.")
+
+
+def repair_output(path):
+    """
+    Cuts an output file about to be appended to back to its last complete record.
+
+    A run that crashed mid-write leaves half a line at the end; appending behind
+    it would merge that line with the next record, and the reader would skip both.
+    Compressed files cannot be cut in place, so their complete lines are rewritten
+    into a fresh stream instead.
+    """
+    if not os.path.exists(path):
+        return
+    if not path.endswith((".gz", ".zst")):
+        truncate_partial_line(path)
+        return
+    root, suffix = os.path.splitext(path)
+    repaired_path = f"{root}.repair{suffix}"  # same suffix, so open_text picks the same codec
+    dropped = False
+    with open_text(repaired_path, "w") as out:
+        try:
+            with open_text(path, "r") as f:
+                for line in f:
+                    if line.endswith("\n"):
+                        out.write(line)
+                    else:
+                        dropped = True
+        except stream_end_errors(path):
+            dropped = True
+    os.replace(repaired_path, path)
+    if dropped:
+        logger.warning(f"Dropped a record cut short at the end of {path}.")
+
+
+def output_path(name, compression="none", output_dir=OUTPUT_DIR):
+    """
+    Path the scraper writes `name` to for the given compression ("none", "gzip" or "zstd").
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unsupported output compression: {compression}")
+    return os.path.join(output_dir, f"{name}.jsonl{COMPRESSION_SUFFIXES[compression]}")
+
+
+def find_output(name, output_dir=OUTPUT_DIR):
+    """
+    Returns the path of the most recently written output file for `name`, or None.
+    """
+    candidates = [os.path.join(output_dir, f"{name}{suffix}") for suffix in OUTPUT_SUFFIXES]
+    existing = [path for path in candidates if os.path.exists(path)]
+    return max(existing, key=os.path.getmtime) if existing else None
+
+
+def iter_records(path):
+    """
+    Yields the records of an output file one at a time.
+
+    JSONL files are streamed line by line; a legacy .json file is loaded whole
+    and its values are yielded. A line cut short by a crash ends the stream
+    with a warning instead of an error.
+    """
+    if path.endswith(".json"):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f).values()
+        return
+
+    with open_text(path, "r") as f:
+        try:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping truncated record at {path}:{line_number}")
+        except stream_end_errors(path):
+            logger.warning(f"{path} ends early (interrupted run?); using the records read so far.")
+
+
+def iter_redditors(path):
+    """
+    Yields (redditor name, record) pairs of a redditor output file one at a time.
+    Legacy .json files are keyed by name; JSONL records carry it as 'redditorname'.
+    """
+    if path.endswith(".json"):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f).items()
+        return
+    for record in iter_records(path):
+        yield record['redditorname'], record
+
+
+def load_redditor_data(path):
+    """
+    Loads redditor records keyed by redditor name.
+    """
+    return dict(iter_redditors(path))
+
+
+def load_submission_data(path):
+    """
+    Loads submission records keyed by submission ID.
+    """
+    return {record['submission_id']: record for record in iter_records(path)}
+
+
+def has_records(path):
+    """
+    True if the output file holds at least one record, without reading the whole file.
+    """
+    return next(iter_records(path), None) is not None
+
+
+class ScrapeWriter:
+    """
+    Appends scraper records to the JSONL output files as they are produced.
+
+    Only the names of written redditors are kept in memory, so the scraper can
+    skip authors it has already fetched without holding their records.
+    Writes come from several worker threads and are serialised by a lock.
+    When a CheckpointJournal is given, every written record is also journaled
+    and records finished by an earlier (resumed) run count as already written.
+    """
+
+    def __init__(self, compression="none", output_dir=OUTPUT_DIR, append=False, checkpoint=None):
+        if not os.path.exists(output_dir):
+            logger.debug("Data analysis directory does not exist, creating...")
+            os.makedirs(output_dir)
+        mode = "a" if append else "w"
+        self.redditor_path = output_path(REDDITOR_OUTPUT, compression, output_dir)
+        self.submission_path = output_path(SUBMISSION_OUTPUT, compression, output_dir)
+        if append:
+            repair_output(self.redditor_path)
+            repair_output(self.submission_path)
+        self._redditor_file = open_text(self.redditor_path, mode)
+        self._submission_file = open_text(self.submission_path, mode)
+        self._lock = threading.Lock()
+        self.checkpoint = checkpoint
+        self.redditor_names = set(checkpoint.redditors) if checkpoint else set()
+        self.submission_count = 0
+        logger.info(f"Streaming scraper output to {self.redditor_path} and {self.submission_path}")
+
+    def has_redditor(self, redditor_name):
+        return redditor_name in self.redditor_names
+
+    def has_submission(self, submission_id):
+        return self.checkpoint is not None and self.checkpoint.submission_done(submission_id)
+
+    def write_redditor(self, redditor_name, redditor_info):
+        with self._lock:
+            if redditor_name in self.redditor_names:
+                return
+            self.redditor_names.add(redditor_name)
+            record = dict(redditor_info, redditorname=redditor_name)
+            self._redditor_file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._redditor_file.flush()
+            if self.checkpoint:
+                self.checkpoint.mark_redditor(redditor_name)
+
+    def write_submission(self, submission_record):
+        with self._lock:
+            self._submission_file.write(json.dumps(submission_record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._submission_file.flush()
+            self.submission_count += 1
+            if self.checkpoint:
+                self.checkpoint.mark_submission(submission_record['submission_id'])
+
+    async def write_redditor_async(self, redditor_name, redditor_info):
+        """
+        Writes are short appends to local files; kept for parity with DatabaseSink.
+        """
+        self.write_redditor(redditor_name, redditor_info)
+
+    async def write_submission_async(self, submission_record):
+        self.write_submission(submission_record)
+
+    def reserve_redditor(self, redditor_name):
+        """
+        Always True: only scraper shards (tools.sharding) share redditor fetches with other processes.
+        """
+        return True
+
+    async def reserve_redditor_async(self, redditor_name):
+        return True
+
+    def release_redditor(self, redditor_name):
+        pass
+
+    def hold_submissions(self):
+        """
+        Submissions are written as they come; kept for parity with DatabaseSink.
+        """
+
+    def release_submissions(self):
+        pass
+
+    def flush(self):
+        """
+        Records are flushed as they are written; kept for parity with DatabaseSink.
+        """
+
+    def close(self):
+        with self._lock:
+            self._redditor_file.close()
+            self._submission_file.close()
+        logger.info(f"Wrote {len(self.redditor_names)} redditors and {self.submission_count} submissions.")
+
+
+def streams_to_database(CONFIG):
+    """
+    True when the scraper writes straight to the database instead of the output files.
+    """
+    return CONFIG.get("output", {}).get("sink", "files") == "database"
+
+
+def load_writer(CONFIG, append=False, checkpoint=None, max_redditors=None):
+    """
+    Builds the scraper's record sink from the 'output' block in CONFIG:
+    a ScrapeWriter for "sink": "files" (default) or a DatabaseSink for "sink": "database".
+    `max_redditors` bounds the DatabaseSink's memo of written redditors (see DatabaseSink).
+    """
+    output_config = CONFIG.get("output", {})
+    if streams_to_database(CONFIG):
+        from tools.db_sink import DatabaseSink
+        try:
+            batch_size = int(output_config.get("batch_size", 500))
+            queue_size = int(output_config.get("queue_size", 1000))
+            flush_interval = float(output_config.get("flush_interval_seconds", 5))
+        except (ValueError, TypeError):
+            logger.warning("Invalid database sink settings in CONFIG; using batch_size=500, queue_size=1000, flush_interval_seconds=5.")
+            batch_size, queue_size, flush_interval = 500, 1000, 5.0
+        return DatabaseSink(
+            CONFIG["database"], batch_size, queue_size, flush_interval, checkpoint=checkpoint, max_redditors=max_redditors
+        )
+    compression = output_config.get("compression", "none")
+    return ScrapeWriter(compression=compression, append=append, checkpoint=checkpoint)
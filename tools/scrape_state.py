@@ -0,0 +1,137 @@
+'''
+Per-subreddit high-water marks for incremental scraping.
+
+For every subreddit the state file keeps the newest processed submission
+(`created_utc` and ID) plus the comment count each recently seen submission
+had when it was last processed. A listing item is only processed again when
+it is new or its comment count changed, so steady-state runs cost roughly as
+much as the new activity since the previous run.
+'''
+import json
+import os
+import threading
+import time
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("Scrape state Basic logging set")
+init_logger()
+
+STATE_PATH = 'analysis_results/scrape_state.json'
+
+
+class HighWaterMarks:
+    """
+    Tracks what each subreddit listing looked like at the last successful run.
+
+    Observations made while listing are only committed by `save()` for
+    submissions that were actually written, so anything that failed is
+    picked up again by the next run.
+    """
+
+    def __init__(self, path=STATE_PATH, retain_days=30):
+        self.path = path
+        self.retain_seconds = retain_days * 24 * 60 * 60
+        self.state = {}
+        self._seen = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.state = json.load(f)
+                logger.info(f"Loaded high-water marks for {len(self.state)} subreddits from {path}")
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Could not read scrape state {path}, scraping everything: {e}")
+
+    def newest(self, subreddit_name):
+        """
+        Returns the newest processed created_utc for a subreddit (0 if none).
+        """
+        return self.state.get(subreddit_name.lower(), {}).get("newest_created_utc", 0)
+
+    def should_process(self, subreddit_name, submission_id, created_utc, num_comments):
+        """
+        Records a listing item and returns True if it is new or its comment count changed.
+        """
+        key = subreddit_name.lower()
+        known = self.state.get(key, {}).get("submissions", {}).get(submission_id)
+        if known is None:
+            # Too old to still be tracked and older than anything processed: seen in an earlier run
+            changed = not (created_utc < time.time() - self.retain_seconds and created_utc <= self.newest(key))
+        else:
+            changed = known[1] != num_comments
+        with self._lock:
+            self._seen.setdefault(key, {})[submission_id] = (created_utc, num_comments, changed)
+        return changed
+
+    def observations(self):
+        """
+        Returns the uncommitted listing observations, e.g. to hand them to another process.
+        """
+        with self._lock:
+            return {key: dict(seen) for key, seen in self._seen.items()}
+
+    def merge_observations(self, observations):
+        """
+        Adds observations made by another HighWaterMarks (such as a scraper shard) to this one.
+        """
+        with self._lock:
+            for key, seen in observations.items():
+                self._seen.setdefault(key, {}).update(seen)
+
+    def save(self, done_submissions):
+        """
+        Commits this run's observations for every submission in `done_submissions`
+        (plus unchanged ones) and writes the state file.
+        """
+        cutoff = time.time() - self.retain_seconds
+        with self._lock:
+            for key, seen in self._seen.items():
+                sub_state = self.state.setdefault(
+                    key, {"newest_created_utc": 0, "newest_id": None, "submissions": {}}
+                )
+                tracked = sub_state["submissions"]
+                for submission_id, (created_utc, num_comments, changed) in seen.items():
+                    if changed and submission_id not in done_submissions:
+                        continue
+                    tracked[submission_id] = [created_utc, num_comments]
+                    if created_utc > sub_state["newest_created_utc"]:
+                        sub_state["newest_created_utc"] = created_utc
+                        sub_state["newest_id"] = submission_id
+                sub_state["submissions"] = {
+                    submission_id: entry for submission_id, entry in tracked.items() if entry[0] >= cutoff
+                }
+            self._seen = {}
+
+            state_dir = os.path.dirname(self.path)
+            if state_dir and not os.path.exists(state_dir):
+                os.makedirs(state_dir)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+        logger.info(f"Saved high-water marks for {len(self.state)} subreddits to {self.path}")
+
+
+def load_high_water_marks(CONFIG):
+    """
+    Builds HighWaterMarks from the 'incremental' block in CONFIG, or returns None when disabled.
+    """
+    incremental_config = CONFIG.get("incremental", {})
+    if not incremental_config.get("enabled", False):
+        return None
+    try:
+        retain_days = float(incremental_config.get("retain_days", 30))
+    except (ValueError, TypeError):
+        logger.warning("Invalid incremental.retain_days in CONFIG; defaulting to 30.")
+        retain_days = 30
+    return HighWaterMarks(incremental_config.get("path", STATE_PATH), retain_days)
+
+
+def stop_at_mark(CONFIG, sort_method):
+    """
+    True when a "new" listing may stop paging at the high-water mark, i.e. when
+    older submissions are not re-checked for changed comment counts.
+    """
+    incremental_config = CONFIG.get("incremental", {})
+    return sort_method == "new" and not incremental_config.get("recheck_comment_counts", True)
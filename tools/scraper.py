@@ -1,17 +1,23 @@
 from tqdm import tqdm
 import asyncio
-import json
-import os
 import time
+from heapq import heappop, heappush
 import prawcore
+from praw.models import MoreComments
 from prawcore.exceptions import TooManyRequests
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from tqdm import tqdm
 from tools.config.logger_config import init_logger, logging
 from tools.config.reddit_login import load_config, login
 from tools.config.config_loader import CONFIG
+from tools.redditor_cache import MISSING_ATTRIBUTES, NOT_FOUND, SUSPENDED, load_redditor_cache
+from tools.rate_limiter import load_rate_limiter
+from tools.scrape_output import load_writer
+from tools.checkpoint import CheckpointJournal
+from tools.scrape_state import load_high_water_marks, stop_at_mark
+from tools.single_flight import SingleFlight
+from tools.metrics import METRICS, finish_metrics, start_metrics
+from tools.profile_scheduler import load_profile_scheduler, schedules_profiles
+from tools.sharding import FETCHED_ELSEWHERE, load_credentials, scrape_sharded
 
 def trigger_link_karma_fetch(redditor_obj):
     _ = redditor_obj.link_karma  # triggers a fetch
@@ -20,49 +26,61 @@ logger = logging.getLogger(__name__)
 logger.info("Scraper Basic logging set")
 init_logger()
 
+# One limiter shared by every worker thread so they pace their requests together
+rate_limiter = load_rate_limiter(CONFIG)
+
 def handle_rate_limit(retry_after):
+    """
+    Pauses all workers (not only the calling thread) after a 429 response.
+    """
+    try:
+        retry_after = float(retry_after) if retry_after is not None else None
+    except (TypeError, ValueError):
+        retry_after = None
     if retry_after is None:
-        logger.warning("Rate limit exceeded but retry_after time is not set. Using a default sleep of 3 second.")
-        time.sleep(3)
+        logger.warning("Rate limit exceeded but retry_after time is not set. Pausing all requests for 3 seconds.")
+        rate_limiter.pause(3)
     else:
-        logger.warning(f"Rate limit exceeded. Sleeping for {retry_after} seconds.")
-        time.sleep(retry_after + 2)  # Adding an extra second for safety
-
-# Create a custom session
-session = requests.Session()
+        logger.warning(f"Rate limit exceeded. Pausing all requests for {retry_after} seconds.")
+        rate_limiter.pause(retry_after + 2)  # Adding an extra second for safety
 
-# Define a retry strategy
-retry_strategy = Retry(
-    total=3,
-    status_forcelist=[429, 500, 502, 503, 504],
-    allowed_methods=["HEAD", "GET", "OPTIONS"],
-    backoff_factor=1,
-    raise_on_status=True,
-    raise_on_redirect=True
-)
-
-# Create an adapter with the desired connection pool size
-adapter = HTTPAdapter(pool_connections=20, pool_maxsize=50, max_retries=retry_strategy)  # type: ignore
+def handle_request_error(CONFIG):
+    """
+    Backs every worker off briefly after a failed request instead of blocking one thread for a minute.
+    """
+    backoff = CONFIG.get("rate_limit", {}).get("error_backoff_seconds", 10)
+    rate_limiter.pause(backoff, reason="error_backoff")
 
-# Mount the adapter to the session
-session.mount("https://", adapter)
-session.mount("http://", adapter)
+def throttle(reddit, cost=1):
+    """
+    Waits for `cost` requests' worth of budget from the shared rate limiter.
+    The limiter is first re-paced from the X-Ratelimit headers PRAW last saw.
+    """
+    limits = reddit.auth.limits
+    remaining = limits.get("remaining")
+    reset_timestamp = limits.get("reset_timestamp")
+    if remaining is not None and reset_timestamp is not None:
+        rate_limiter.update(remaining, reset_timestamp - time.time())
+    rate_limiter.acquire(cost)
+
+def listing_cost(limit):
+    """
+    Number of API requests PRAW needs to page through a listing of `limit` items.
+    """
+    return max(1, -(-int(limit or 100) // 100))
 
-def setup_reddit():
+def setup_reddit(config=None):
     """
     Sets up the Reddit instance for scraping data, logging in, and loading the target subreddit.
+    `config` overrides the config file (e.g. a shard's credential).
     """
     logger.debug("Setting up Reddit instance...")
-    CONFIG = load_config()
+    CONFIG = config if config is not None else load_config()
     reddit = login(CONFIG)
     logger.info("Logged into Reddit.")
-    # Use the Reddit instance to make requests
-    subreddit = reddit.subreddit('python')
-    for submission in subreddit.hot(limit=10):
-        print(submission.title)
     return reddit, CONFIG
 
-async def fetch_submissions_async(reddit, CONFIG):
+async def fetch_submissions_async(reddit, CONFIG, high_water_marks=None):
     """
     Asynchronous wrapper for fetching submissions.
     This function runs the synchronous fetch_submissions in a thread.
@@ -70,77 +88,119 @@ async def fetch_submissions_async(reddit, CONFIG):
     from functools import partial
     loop = asyncio.get_running_loop()
     # Wrap the synchronous function in a partial to pass the arguments.
-    return await loop.run_in_executor(None, partial(fetch_submissions, reddit, CONFIG))
+    return await loop.run_in_executor(None, partial(fetch_submissions, reddit, CONFIG, high_water_marks))
 
-def fetch_submissions(reddit, CONFIG):
+def get_submission_sort(CONFIG):
     """
-    Synchronous version fetches submissions from each subreddit based on the sorting method and limit specified in the CONFIGuration.
+    Returns (sort_method, limit) for subreddit listings.
     """
-    logger.info("Fetching submissions...")
-    subreddit_names = CONFIG["subreddit"].split('+')
-    # Get the submission sort settings
     submission_sort = CONFIG.get("submission_sort", {"method": "new", "limit": 250})
     sort_method = submission_sort["method"]
     try:
-        submissions_limit = submission_sort["limit"]
+        submissions_limit = int(submission_sort["limit"])
         logger.debug(f"Submission sort settings: {CONFIG.get('submission_sort')}")
     except (ValueError, TypeError):
         logger.warning("Invalid submission limit value in CONFIG. Falling back to default of 10.")
         submissions_limit = 10
+    return sort_method, submissions_limit
 
-    all_submissions = []
+def fetch_subreddit_submissions(reddit, CONFIG, subreddit_name, high_water_marks=None, on_submission=None):
+    """
+    Fetches the configured listing of one subreddit.
+    Each kept submission is passed to `on_submission` as soon as its listing page
+    arrives (when given) and the kept submissions are returned.
+    With high-water marks, only submissions that are new or whose comment count changed are kept.
+    """
+    sort_method, submissions_limit = get_submission_sort(CONFIG)
+    stop_early = high_water_marks is not None and stop_at_mark(CONFIG, sort_method)
+    kept = []
+    try:
+        subreddit = reddit.subreddit(subreddit_name)
+        throttle(reddit, listing_cost(submissions_limit))
+        logger.debug(f"Fetching {sort_method} submissions from {subreddit_name} with limit {submissions_limit}.")
+        if sort_method == "top":
+            submissions = subreddit.top(limit=submissions_limit)
+        elif sort_method == "hot":
+            submissions = subreddit.hot(limit=submissions_limit)
+        elif sort_method == "new":
+            submissions = subreddit.new(limit=submissions_limit)
+        elif sort_method == "rising":
+            submissions = subreddit.rising(limit=submissions_limit)
+        elif sort_method == "controversial":
+            submissions = subreddit.controversial(limit=submissions_limit)
+        else:
+            raise ValueError(f"Unsupported sort method: {sort_method}")
+
+        newest = high_water_marks.newest(subreddit_name) if high_water_marks is not None else 0
+        skipped = 0
+        for submission in submissions:
+            if high_water_marks is not None:
+                if stop_early and submission.created_utc <= newest:
+                    break
+                if not high_water_marks.should_process(
+                    subreddit_name, submission.id, submission.created_utc, submission.num_comments
+                ):
+                    skipped += 1
+                    continue
+            kept.append(submission)
+            if on_submission is not None:
+                on_submission(submission)
+        if skipped:
+            logger.info(f"Skipped {skipped} unchanged submissions in '{subreddit_name}'.")
+        logger.info(f"Fetched {len(kept)} submissions from '{subreddit_name}'.")
+    except TooManyRequests as e:
+        handle_rate_limit(e.response.headers.get('retry-after'))
+    except prawcore.exceptions.Redirect:
+        logger.error(f"Failed to fetch submissions from '{subreddit_name}'. Check the subreddit name.")
+    except prawcore.exceptions.RequestException as e:
+        logger.error(f"Rate limit exceeded while fetching submissions from '{subreddit_name}': {e}")
+        handle_request_error(CONFIG)
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while fetching submissions from '{subreddit_name}': {e}")
+    return kept
 
+def fetch_submissions(reddit, CONFIG, high_water_marks=None):
+    """
+    Synchronous version fetches submissions from each subreddit based on the sorting method and limit specified in the CONFIGuration.
+    With high-water marks, only submissions that are new or whose comment count changed are returned.
+    """
+    logger.info("Fetching submissions...")
+    subreddit_names = CONFIG["subreddit"].split('+')
+    all_submissions = []
     for subreddit_name in tqdm(subreddit_names, desc="Fetching subreddits"):
-        logger.info(f"Fetched {len(subreddit_names)} subreddits.")
-        try:
-            subreddit = reddit.subreddit(subreddit_name)
-            logger.debug(f"Fetching {sort_method} submissions from {subreddit_name} with limit {submissions_limit}.")
-            if sort_method == "top":
-                submissions = subreddit.top(limit=submissions_limit)
-            elif sort_method == "hot":
-                submissions = subreddit.hot(limit=submissions_limit)
-            elif sort_method == "new":
-                submissions = subreddit.new(limit=submissions_limit)
-            elif sort_method == "rising":
-                submissions = subreddit.rising(limit=submissions_limit)
-            elif sort_method == "controversial":
-                submissions = subreddit.controversial(limit=submissions_limit)
-            else:
-                raise ValueError(f"Unsupported sort method: {sort_method}")
-            all_submissions.extend(submissions)
-            time.sleep(2)  # Delay to help avoid rate limits
-        except TooManyRequests as e:
-            handle_rate_limit(e.response.headers.get('retry-after'))
-            continue
-        except prawcore.exceptions.Redirect:
-            logger.error(f"Failed to fetch submissions from '{subreddit_name}'. Check the subreddit name.")
-            continue
-        except prawcore.exceptions.RequestException as e:
-            logger.error(f"Rate limit exceeded while fetching submissions from '{subreddit_name}': {e}")
-            time.sleep(60)
-            continue
-        except Exception as e:
-            logger.error(f"An unexpected error occurred while fetching submissions from '{subreddit_name}': {e}")
-            continue
-
+        all_submissions.extend(fetch_subreddit_submissions(reddit, CONFIG, subreddit_name, high_water_marks))
     return all_submissions
 
 # Removed duplicate async def fetch_redditor_info_async to resolve the naming conflict.
 
+IGNORED_AUTHORS = {"automoderator", "reddit"}
 
-def fetch_comments_from_submissions(CONFIG, redditor):
-    if not hasattr(redditor, 'created_utc'):
-        logger.error(f"redditor '{redditor}' has no creation date.")
-        return None
+def is_ignored_author(author_name):
+    """
+    True for deleted accounts and Reddit's own bots, whose comments are not scraped.
+    """
+    return not author_name or author_name == "[deleted]" or author_name.lower() in IGNORED_AUTHORS
 
-    # ─────────────── NEW MODERATION CHECK ───────────────
-    # If they're a moderator of at least one real subreddit, skip them:
-    if redditor.is_mod and getattr(redditor.subreddit, "user_is_moderator"):
-        logger.debug(f"Skipping moderator: {redditor.name}")
-        return None
+def compute_dormant_days(creation_time, oldest_comment_utc, oldest_submission_utc):
+    """
+    Days between account creation and the oldest activity seen in the fetched history.
+    """
+    activity_times = [t for t in (oldest_comment_utc, oldest_submission_utc) if t is not None]
+    first_activity_time = min(activity_times) if activity_times else time.time()
+    dormant_time = first_activity_time - creation_time
+    return dormant_time // (24 * 60 * 60)
 
-    creation_time = redditor.created_utc
+def activity_entry(kind, item_id, created_utc, subreddit, score):
+    """
+    One compact activity-timeline item: [kind, id, created_utc, subreddit, score],
+    where kind is "comment" or "submission".
+    """
+    return [kind, item_id, created_utc, subreddit, score]
 
+def get_history_limits(CONFIG):
+    """
+    Returns (comments_limit, submissions_limit) for per-user history fetches.
+    """
     try:
         comments_limit = int(CONFIG.get("comments_limit", 250))
         logger.debug(f"Comments limit: {CONFIG.get('comments_limit')}, Submissions limit for comments: {CONFIG.get('submissions_limit')}")
@@ -156,24 +216,32 @@ def fetch_comments_from_submissions(CONFIG, redditor):
 
     logger.debug(f"Comments limit: {comments_limit}")
     logger.debug(f"Submissions limit: {submissions_limit}")
+    return comments_limit, submissions_limit
 
-    comments = list(redditor.comments.new(limit=comments_limit))
-    submissions = list(redditor.submissions.new(limit=submissions_limit))
+def fetch_comments_from_submissions(CONFIG, reddit, redditor):
+    if not hasattr(redditor, 'created_utc'):
+        logger.error(f"redditor '{redditor}' has no creation date.")
+        return None
 
-    first_comment = comments[-1] if comments else None
-    first_submission = submissions[-1] if submissions else None
+    creation_time = redditor.created_utc
+    comments_limit, submissions_limit = get_history_limits(CONFIG)
 
-    if first_comment and first_submission:
-        first_activity_time = min(first_comment.created_utc, first_submission.created_utc)
-    elif first_comment:
-        first_activity_time = first_comment.created_utc
-    elif first_submission:
-        first_activity_time = first_submission.created_utc
-    else:
-        first_activity_time = time.time()
+    throttle(reddit, listing_cost(comments_limit))
+    comments = list(redditor.comments.new(limit=comments_limit))
+    throttle(reddit, listing_cost(submissions_limit))
+    submissions = list(redditor.submissions.new(limit=submissions_limit))
 
-    dormant_time = first_activity_time - creation_time
-    dormant_days = dormant_time // (24 * 60 * 60)
+    dormant_days = compute_dormant_days(
+        creation_time,
+        comments[-1].created_utc if comments else None,
+        submissions[-1].created_utc if submissions else None,
+    )
+    # The listings are kept as the user's activity timeline for burst/inactivity analysis
+    activity = [
+        activity_entry("comment", c.id, c.created_utc, c.subreddit.display_name, c.score) for c in comments
+    ] + [
+        activity_entry("submission", s.id, s.created_utc, s.subreddit.display_name, s.score) for s in submissions
+    ]
 
     redditor_data = {
         'redditor_id': redditor.id,
@@ -189,16 +257,98 @@ def fetch_comments_from_submissions(CONFIG, redditor):
         'has_verified_email': getattr(redditor, 'has_verified_email', False),
         'accept_followers': getattr(redditor, 'accept_followers', False),
         'redditor_is_subscriber': getattr(redditor, 'is_subscriber', False),
+        'activity': activity,
     }
     logger.debug(f"Fetched redditor Info for {redditor}.")
     return redditor_data
 
-def fetch_and_process_comments(reddit, submission):
+def get_expansion_limits(CONFIG):
+    """
+    Returns (max_more_calls, min_child_count, time_budget_seconds) for comment-tree expansion.
+    None means unlimited.
+    """
+    expansion = CONFIG.get("comment_expansion", {})
+    try:
+        max_more_calls = expansion.get("max_more_calls")
+        max_more_calls = int(max_more_calls) if max_more_calls is not None else None
+        min_child_count = int(expansion.get("min_child_count", 0))
+        time_budget = expansion.get("time_budget_seconds")
+        time_budget = float(time_budget) if time_budget is not None else None
+    except (ValueError, TypeError):
+        logger.warning("Invalid comment_expansion settings in CONFIG; expanding full comment trees.")
+        return None, 0, None
+    return max_more_calls, min_child_count, time_budget
+
+def expansion_stats(more_calls, skipped_counts, started):
+    """
+    Summary of how much of a comment tree was expanded, stored with each submission.
+    `skipped_counts` holds the child count of every stub that was left unexpanded.
+    """
+    return {
+        'more_calls': more_calls,
+        'skipped_stubs': len(skipped_counts),
+        'skipped_comments': sum(skipped_counts),
+        'elapsed_seconds': round(time.monotonic() - started, 2),
+        'complete': not skipped_counts,
+    }
+
+def expand_comment_tree(reddit, CONFIG, submission):
+    """
+    Replaces MoreComments stubs, largest first, until the tree is complete or the
+    configured call count / time budget runs out; stubs below `min_child_count`
+    are never expanded. Whatever is left is dropped from the tree.
+    Returns the expansion stats.
+
+    This is PRAW's CommentForest.replace_more loop with a budget check before
+    every call: one heap of pending stubs is kept for the whole expansion, so
+    stubs found in expanded children are expanded in turn. Chunked
+    replace_more(limit=...) calls cannot be used, because PRAW drops every stub
+    still pending once `limit` is reached. Without limits the result is the
+    same as replace_more(limit=None).
+    """
+    max_more_calls, min_child_count, time_budget = get_expansion_limits(CONFIG)
+    started = time.monotonic()
+    more_calls = 0
+    forest = submission.comments
+    pending = forest._gather_more_comments(forest._comments)  # heap, largest stub first
+    skipped = []
+    while pending:
+        stub = heappop(pending)
+        out_of_budget = (
+            (max_more_calls is not None and more_calls >= max_more_calls)
+            or (time_budget is not None and time.monotonic() - started >= time_budget)
+        )
+        if out_of_budget or stub.count < min_child_count:
+            skipped.append(stub)
+            stub._remove_from.remove(stub)
+            continue
+
+        throttle(reddit)
+        new_comments = stub.comments(update=False)
+        more_calls += 1
+        for more in forest._gather_more_comments(new_comments, parent_tree=forest._comments):
+            more.submission = submission
+            heappush(pending, more)
+        for comment in new_comments:
+            forest._insert_comment(comment)
+        stub._remove_from.remove(stub)
+
+    stats = expansion_stats(more_calls, [m.count for m in skipped], started)
+    if skipped:
+        logger.info(
+            f"Comment tree of {submission.id} truncated: {stats['skipped_stubs']} stubs "
+            f"(~{stats['skipped_comments']} comments) skipped after {more_calls} MoreComments calls."
+        )
+    return stats
+
+def fetch_and_process_comments(reddit, CONFIG, submission):
     """
     Fetches and processes comments for a given submission on Reddit.
+    Returns (comment records, comment-expansion stats).
     """
     try:
-        submission.comments.replace_more(limit=None)
+        throttle(reddit)
+        stats = expand_comment_tree(reddit, CONFIG, submission)
         logger.debug(f"Processing comments for submission {submission.id}")
         return [
             {
@@ -209,23 +359,31 @@ def fetch_and_process_comments(reddit, submission):
                 'comment_score': comment.score,
                 'is_submitter': comment.is_submitter,
                 'edited': comment.edited,
-                'link_id': comment.link_id[3:] if comment.link_id.startswith("t3_") else comment.link_id
+                'link_id': comment.link_id[3:] if comment.link_id.startswith("t3_") else comment.link_id,
+                'author_fullname': getattr(comment, 'author_fullname', None),
             }
             for comment in tqdm(submission.comments.list(), desc=f"Fetching comments for {submission.id}")
-            if comment.author 
-                and comment.author.name.lower() != "automoderator"
-                and comment.author.name.lower() != "reddit"
-        ]
+            if comment.author and not is_ignored_author(comment.author.name)
+        ], stats
     except TooManyRequests as e:
         handle_rate_limit(e.response.headers.get('retry-after'))
-        return []
+        return [], None
     except Exception as e:
         logger.error(f"Error fetching comments for submission {submission.id}: {e}")
-        return []
+        return [], None
     
-def _fetch_redditor_info_sync(reddit, CONFIG, redditor_name):
+def remember_unavailable(redditor_cache, redditor_name, reason):
+    """
+    Puts an account that cannot be profiled into the negative cache, if there is one.
+    """
+    if redditor_cache is not None:
+        redditor_cache.put_unavailable(redditor_name, reason)
+
+def _fetch_redditor_info_sync(reddit, CONFIG, redditor_name, redditor_cache=None):
     """
     Synchronous helper that does the real PRAW logic.
+    Accounts that are gone (404, suspended, missing attributes) go into the negative cache
+    and return None; transient request errors are raised, so the caller can try again later.
     """
     logger.debug(f"Fetching redditor info for: {redditor_name}")
 
@@ -237,27 +395,241 @@ def _fetch_redditor_info_sync(reddit, CONFIG, redditor_name):
     try:
         # 1) Build the PRAW object
         redditor_obj = reddit.redditor(redditor_name)
+        throttle(reddit)
         try:
             _ = redditor_obj.link_karma  # Force fetch of link_karma
         except AttributeError:
-            # If link_karma is missing, log and skip the user.
+            # If link_karma is missing (suspended account), log and skip the user.
             logger.error(f"Redditor '{redditor_name}' is missing 'link_karma' attribute; skipping.")
+            remember_unavailable(redditor_cache, redditor_name, SUSPENDED)
             return None
 
-        redditor_data = fetch_comments_from_submissions(CONFIG, redditor_obj)
+        redditor_data = fetch_comments_from_submissions(CONFIG, reddit, redditor_obj)
         if redditor_data:
             redditor_data["redditor_id"] = redditor_obj.id
         return redditor_data
-    except prawcore.exceptions.RequestException as e:
-        logger.error(f"Rate limit or request error for '{redditor_name}': {e}")
-        time.sleep(60)
+    except (prawcore.exceptions.NotFound, prawcore.exceptions.Forbidden) as e:
+        logger.error(f"Redditor '{redditor_name}' not found: {e}")
+        remember_unavailable(redditor_cache, redditor_name, NOT_FOUND)
         return None
+    except TooManyRequests as e:
+        handle_rate_limit(e.response.headers.get('retry-after'))
+        raise
+    except prawcore.exceptions.RequestException as e:
+        logger.error(f"Request error for '{redditor_name}': {e}")
+        handle_request_error(CONFIG)
+        raise
     except AttributeError as e:
         logger.error(f"Redditor '{redditor_name}' has an attribute error: {e}")
+        remember_unavailable(redditor_cache, redditor_name, MISSING_ATTRIBUTES)
         return None
-    except Exception as e:
-        logger.error(f"Redditor '{redditor_name}' not found or error occurred: {e}")
-        return None
+
+def get_redditor_info(reddit, CONFIG, redditor_name, redditor_cache=None):
+    """
+    Returns redditor info from the persistent cache when it is fresh,
+    otherwise fetches it from Reddit and stores the result in the cache.
+    Accounts in the negative cache are skipped without any request.
+    """
+    if redditor_cache is not None:
+        if (cached_info := redditor_cache.get(redditor_name)) is not None:
+            logger.debug(f"Using cached redditor info for {redditor_name}")
+            return cached_info
+        if (reason := redditor_cache.get_unavailable(redditor_name)) is not None:
+            logger.debug(f"Skipping {redditor_name}, cached as unavailable ({reason})")
+            return None
+
+    redditor_info = _fetch_redditor_info_sync(reddit, CONFIG, redditor_name, redditor_cache)
+    if redditor_info and redditor_cache is not None:
+        redditor_cache.put(redditor_name, redditor_info)
+    return redditor_info
+
+PARTIAL_REDDITOR_BATCH = 100  # /api/user_data_by_account_ids accepts up to 100 fullnames
+
+def prefilter_enabled(CONFIG):
+    return CONFIG.get("profile_prefilter", {}).get("enabled", False)
+
+def needs_deep_fetch(CONFIG, redditor_info):
+    """
+    Cheap prefilter on batch-resolved karma and age: only accounts that could
+    plausibly be flagged (low karma or young) get the full profile and history fetch.
+    """
+    prefilter = CONFIG.get("profile_prefilter", {})
+    max_total_karma = prefilter.get("max_total_karma", 5000)
+    max_account_age_years = prefilter.get("max_account_age_years", 2)
+    total_karma = redditor_info.get("total_karma") or 0
+    account_age_years = (time.time() - redditor_info["created_utc"]) / (365.25 * 24 * 60 * 60)
+    return total_karma <= max_total_karma or account_age_years <= max_account_age_years
+
+def partial_redditor_record(redditor_name, fullname, data):
+    """
+    Builds a redditor record from /api/user_data_by_account_ids data.
+    Fields only available from the full profile are left empty.
+    """
+    link_karma = data.get('link_karma') or 0
+    comment_karma = data.get('comment_karma') or 0
+    return {
+        'redditor_id': fullname[3:] if fullname.startswith("t2_") else fullname,
+        'redditorname': data.get('name', redditor_name),
+        'created_utc': data.get('created_utc'),
+        'link_karma': link_karma,
+        'comment_karma': comment_karma,
+        'total_karma': link_karma + comment_karma,
+        'is_employee': None,
+        'is_mod': None,
+        'is_gold': None,
+        'dormant_days': None,
+        'has_verified_email': None,
+        'accept_followers': None,
+        'redditor_is_subscriber': None,
+        'activity': None,
+    }
+
+def fetch_partial_redditors(reddit, fullnames):
+    """
+    Resolves karma and created_utc for many accounts at once, PARTIAL_REDDITOR_BATCH per request.
+    Returns ({fullname: data}, fullnames of the batches whose request failed); suspended and
+    deleted accounts are absent from the data of the batches that succeeded.
+    """
+    results = {}
+    failed = set()
+    for start in range(0, len(fullnames), PARTIAL_REDDITOR_BATCH):
+        batch = fullnames[start:start + PARTIAL_REDDITOR_BATCH]
+        throttle(reddit)
+        try:
+            for partial in reddit.redditors.partial_redditors(batch):
+                results[partial.fullname] = {
+                    'name': partial.name,
+                    'created_utc': getattr(partial, 'created_utc', None),
+                    'link_karma': getattr(partial, 'link_karma', 0),
+                    'comment_karma': getattr(partial, 'comment_karma', 0),
+                }
+        except TooManyRequests as e:
+            handle_rate_limit(e.response.headers.get('retry-after'))
+            failed.update(batch)
+        except Exception as e:
+            logger.error(f"Batch lookup of {len(batch)} redditors failed: {e}")
+            failed.update(batch)
+    return results, failed
+
+def split_prefiltered_authors(CONFIG, authors, partial_data, redditor_cache=None, failed_fullnames=frozenset()):
+    """
+    Builds light records for batch-resolved authors that fail the prefilter.
+    Authors whose batch lookup failed (`failed_fullnames`) get the deep fetch instead;
+    only those missing from a lookup that succeeded go into the negative cache.
+    Returns (names that still need the deep per-user fetch, {name: light record} to write).
+    """
+    deep_fetch = []
+    light_records = {}
+    unresolved = 0
+    for redditor_name, fullname in authors.items():
+        if not fullname or fullname in failed_fullnames:
+            unresolved += bool(fullname)
+            deep_fetch.append(redditor_name)
+            continue
+        data = partial_data.get(fullname)
+        if data is None or data.get('created_utc') is None:
+            logger.debug(f"Redditor '{redditor_name}' missing from batch lookup (suspended or deleted); skipping.")
+            remember_unavailable(redditor_cache, redditor_name, SUSPENDED)
+            continue
+        redditor_info = partial_redditor_record(redditor_name, fullname, data)
+        if needs_deep_fetch(CONFIG, redditor_info):
+            deep_fetch.append(redditor_name)
+            continue
+        if redditor_cache is not None:
+            redditor_cache.put(redditor_name, redditor_info)
+        light_records[redditor_name] = redditor_info
+    if unresolved:
+        logger.warning(f"Batch lookup failed for {unresolved} authors; fetching their full profiles instead.")
+    logger.debug(f"Prefilter kept {len(deep_fetch)} of {len(authors)} authors for deep fetch.")
+    return deep_fetch, light_records
+
+def take_cached_authors(authors, redditor_cache=None):
+    """
+    Looks every author up in the persistent cache and drops the ones cached as unavailable.
+    Returns (the remaining authors, {name: cached record} to write).
+    """
+    if redditor_cache is None:
+        return authors, {}
+    remaining = {}
+    cached = {}
+    for redditor_name, fullname in authors.items():
+        if (cached_info := redditor_cache.get(redditor_name)) is not None:
+            cached[redditor_name] = cached_info
+        elif redditor_cache.get_unavailable(redditor_name) is None:
+            remaining[redditor_name] = fullname
+    return remaining, cached
+
+def fetch_moderators(reddit, subreddit_names):
+    """
+    Fetches the moderator list of every target subreddit once.
+    Returns the lowercased names of all their moderators.
+    """
+    moderators = set()
+    for subreddit_name in subreddit_names:
+        throttle(reddit)
+        try:
+            moderators.update(moderator.name.lower() for moderator in reddit.subreddit(subreddit_name).moderator())
+        except TooManyRequests as e:
+            handle_rate_limit(e.response.headers.get('retry-after'))
+        except Exception as e:
+            logger.warning(f"Could not fetch the moderators of '{subreddit_name}': {e}")
+    logger.info(f"Loaded {len(moderators)} moderators of {len(subreddit_names)} subreddits.")
+    return frozenset(moderators)
+
+def fetch_authors(reddit, CONFIG, authors, writer, redditor_cache=None, redditor_flights=None, moderators=frozenset()):
+    """
+    Fetches and writes every author in `authors` ({name: fullname}) that has not been written yet.
+    Moderators of the target subreddits (see `fetch_moderators`) are skipped before any request.
+    With the profile prefilter on, karma and age are first resolved in batches and
+    only accounts that pass the prefilter get the deep per-user fetch, as do the
+    accounts of a batch whose lookup failed.
+    `redditor_flights` makes sure each redditor is fetched at most once per run,
+    even when several threads need the same author at the same time.
+    Returns the names whose fetch failed; they are not remembered, so a later call retries them.
+    """
+    pending = {
+        name: fullname for name, fullname in authors.items()
+        if name != 'Deleted' and not writer.has_redditor(name) and name.lower() not in moderators
+    }
+    if prefilter_enabled(CONFIG):
+        pending, cached = take_cached_authors(pending, redditor_cache)
+        for redditor_name, redditor_info in cached.items():
+            writer.write_redditor(redditor_name, redditor_info)
+        fullnames = [fullname for fullname in pending.values() if fullname]
+        partial_data, failed_fullnames = fetch_partial_redditors(reddit, fullnames) if fullnames else ({}, set())
+        pending, light_records = split_prefiltered_authors(
+            CONFIG, pending, partial_data, redditor_cache, failed_fullnames
+        )
+        for redditor_name, redditor_info in light_records.items():
+            writer.write_redditor(redditor_name, redditor_info)
+
+    def fetch_author(redditor_name):
+        if not writer.reserve_redditor(redditor_name):
+            return FETCHED_ELSEWHERE  # another scraper shard wrote it meanwhile
+        written = False
+        try:
+            redditor_info = get_redditor_info(reddit, CONFIG, redditor_name, redditor_cache)
+            logger.debug(f"redditor info for {redditor_name}: {redditor_info}")
+            if redditor_info:
+                writer.write_redditor(redditor_name, redditor_info)
+                written = True
+                logger.debug(f"Added redditor info for {redditor_name}")
+        finally:
+            if not written:
+                writer.release_redditor(redditor_name)
+        return redditor_info
+
+    failed = []
+    for redditor_name in pending:
+        try:
+            if redditor_flights is None:
+                fetch_author(redditor_name)
+            elif not writer.has_redditor(redditor_name):  # another worker may have written it meanwhile
+                redditor_flights.do(redditor_name, fetch_author, redditor_name)
+        except Exception as e:
+            logger.error(f"Fetching redditor '{redditor_name}' failed: {e}")
+            failed.append(redditor_name)
+    return failed
 
 async def fetch_redditor_info_async(reddit, CONFIG, redditor_name, sem):
     """
@@ -272,118 +644,190 @@ async def fetch_redditor_info_async(reddit, CONFIG, redditor_name, sem):
             redditor_name
         )
         
-def process_submission(CONFIG, reddit, submission, redditor_data, submission_data):
+def fetch_scheduled_authors(reddit, CONFIG, scheduler, writer, redditor_cache=None, redditor_flights=None, moderators=frozenset()):
+    """
+    Worker loop of the profile phase: fetches the scheduler's authors, chunk by chunk
+    in priority order, until they are all done or the budget is spent.
+    """
+    while (chunk := scheduler.next_chunk()) is not None:
+        with METRICS.phase("redditors"):
+            fetch_authors(reddit, CONFIG, chunk, writer, redditor_cache, redditor_flights, moderators)
+
+def process_submission(CONFIG, reddit, submission, writer, redditor_cache=None, redditor_flights=None,
+                       moderators=frozenset(), scheduler=None):
     """
     Processes a single submission, extracting data and comments.
+    Each redditor and the finished submission are written out through `writer` immediately.
+    With a profile `scheduler`, the authors are only recorded in it and fetched later,
+    in priority order.
     """
     try:
-        redditor_info = None  # Initialize redditor_info to ensure it is available later
         author_name = submission.author.name if submission.author else 'Deleted'
-        
-        if author_name != 'Deleted':
-            redditor_info = _fetch_redditor_info_sync(reddit, CONFIG, author_name)  # Corrected order: reddit, CONFIG, author_name
-            logger.debug(f"redditor info for {author_name}: {redditor_info}")
-            if redditor_info:
-                redditor_data[author_name] = redditor_info
 
-        comments_data = fetch_and_process_comments(reddit, submission)
+        with METRICS.phase("comments"):
+            comments_data, expansion = fetch_and_process_comments(reddit, CONFIG, submission)
         logger.debug(f"Comments for {submission.id}: {comments_data}")
-        for comment in comments_data:
-            comment_author = comment['comment_author']
-            logger.debug(f"Comment author: {comment_author}")
-            if comment_author != 'Deleted' and comment_author not in redditor_data:
-                comment_redditor_info = _fetch_redditor_info_sync(reddit, CONFIG, comment_author)  # Corrected order: reddit, CONFIG, comment_author
-                logger.debug(f"Comment redditor info: {comment_redditor_info}")
-                if comment_redditor_info:
-                    redditor_data[comment_author] = comment_redditor_info
-                    logger.debug(f"Added comment redditor info for {comment_author}")
-
-        submission_data[submission.id] = {
+
+        submission_record = {
             'submission_id': submission.id,
-            'author': submission.author.name if submission.author else 'Deleted',
+            'author': author_name,
             'title': submission.title,
             'submission_score': submission.score,
             'url': submission.url,
             'submission_created_utc': submission.created_utc,
             'over_18': submission.over_18,
             "comments": comments_data,
+            "comment_expansion": expansion,
         }
+        if scheduler is not None:
+            scheduler.add_submission(submission_record, getattr(submission, 'author_fullname', None))
+        else:
+            authors = {}
+            if author_name != 'Deleted':
+                authors[author_name] = getattr(submission, 'author_fullname', None)
+            for comment in comments_data:
+                authors.setdefault(comment['comment_author'], comment.get('author_fullname'))
+            with METRICS.phase("redditors"):
+                fetch_authors(reddit, CONFIG, authors, writer, redditor_cache, redditor_flights, moderators)
+
+        writer.write_submission(submission_record)
         logger.debug(f"Processed submission {submission.id}")
     except TooManyRequests as e:
         handle_rate_limit(e.response.headers.get('retry-after'))
     except Exception as e:
         logger.error(f"An unexpected error occurred while processing submission '{submission.id}': {e}")
 
-async def run_scraper_async():
+async def scrape_with_praw(writer, redditor_cache=None, high_water_marks=None, config=None):
     """
-    Asynchronous entry point for the scraper.
+    Scrapes with PRAW, running the synchronous calls in worker threads.
+    Every subreddit listing is fetched concurrently and its submissions are queued
+    for the processing workers as they arrive, so comment fetching starts right away.
     """
-    try:
-        reddit, CONFIG = setup_reddit()
-
-        # Fetch submissions asynchronously (in a background thread)
-        submissions = await fetch_submissions_async(reddit, CONFIG)
-        logger.debug(f"Found {len(submissions)} submissions.")
-        redditor_data = {}
-        submission_data = {}
-
-        # Create a semaphore to limit the number of concurrent tasks (e.g., 10)
-        max_tasks = CONFIG.get("max_concurrent_requests", 4)
-        semaphore = asyncio.Semaphore(max_tasks)
-
-        # Define an async helper that wraps the synchronous process_submission call.
-        async def process_submission_with_semaphore(submission):
-            async with semaphore:
-                return await asyncio.to_thread(
-                    process_submission,
-                    CONFIG,
-                    reddit,
-                    submission,
-                    redditor_data,
-                    submission_data,
+    reddit, CONFIG = setup_reddit(config)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    subreddit_names = CONFIG["subreddit"].split('+')
+    redditor_flights = SingleFlight()
+
+    # Limit the number of concurrent listing fetches and processing workers (e.g., 10)
+    max_tasks = CONFIG.get("max_concurrent_requests", 4)
+    listing_semaphore = asyncio.Semaphore(max_tasks)
+    moderators = await asyncio.to_thread(fetch_moderators, reddit, subreddit_names)
+    scheduler = load_profile_scheduler(CONFIG)
+
+    def enqueue(submission):
+        # Called from listing threads; hand the submission to the event loop
+        if not writer.has_submission(submission.id):
+            loop.call_soon_threadsafe(queue.put_nowait, submission)
+
+    async def fetch_listing(subreddit_name):
+        async with listing_semaphore:
+            with METRICS.phase("listing"):
+                await asyncio.to_thread(
+                    fetch_subreddit_submissions, reddit, CONFIG, subreddit_name, high_water_marks, enqueue
                 )
 
-        # Build a list of tasks—one for each submission.
-        tasks = [
-            process_submission_with_semaphore(submission)
-            for submission in submissions
-        ]
-
-        # Wait for all submission processing tasks to complete.
-        await asyncio.gather(*tasks)
-
-        # Once all tasks are complete, save the output as JSON.
-        data_analysis_dir = os.path.join('analysis_results')
-        logger.debug(f"Data analysis directory: {data_analysis_dir}")
-        if not os.path.exists(data_analysis_dir):
-            logger.debug("Data analysis directory does not exist, creating...")
-            os.makedirs(data_analysis_dir)
-            logger.debug(f"Created directory {data_analysis_dir}")
-
-        redditor_data_file_path = os.path.join(data_analysis_dir, 'redditor_data.json')
-        logger.debug(f"Redditor data file path: {redditor_data_file_path}")
-        with open(redditor_data_file_path, 'w', encoding='utf-8') as redditor_file:
-            logger.debug(f"Writing redditor data to {redditor_data_file_path}")
-            json.dump(redditor_data, redditor_file, ensure_ascii=False, indent=4)
-            logger.debug(f"Saved redditor data to {redditor_data_file_path}")
-
-        submission_data_file_path = os.path.join(data_analysis_dir, 'submission_data.json')
-        logger.debug(f"Submission data file path: {submission_data_file_path}")
-        with open(submission_data_file_path, 'w', encoding='utf-8') as submission_file:
-            logger.debug(f"Writing submission data to {submission_data_file_path}")
-            json.dump(submission_data, submission_file, ensure_ascii=False, indent=4)
+    # Each worker wraps the synchronous process_submission call in a thread.
+    async def process_submissions_from_queue():
+        while (submission := await queue.get()) is not None:
+            await asyncio.to_thread(
+                process_submission,
+                CONFIG,
+                reddit,
+                submission,
+                writer,
+                redditor_cache,
+                redditor_flights,
+                moderators,
+                scheduler,
+            )
+
+    logger.info(f"Fetching submissions from {len(subreddit_names)} subreddits...")
+    workers = [asyncio.create_task(process_submissions_from_queue()) for _ in range(max_tasks)]
+    await asyncio.gather(*(fetch_listing(name) for name in subreddit_names))
+    for _ in workers:
+        queue.put_nowait(None)  # One stop marker per worker once every listing is queued
+    await asyncio.gather(*workers)
+
+    if scheduler is not None:
+        # Every comment tree is in: fetch the authors most suspicious first, within the budget
+        scheduler.start_fetching(PARTIAL_REDDITOR_BATCH if prefilter_enabled(CONFIG) else 1)
+        await asyncio.gather(*(
+            asyncio.to_thread(
+                fetch_scheduled_authors, reddit, CONFIG, scheduler, writer, redditor_cache, redditor_flights, moderators
+            )
+            for _ in range(max_tasks)
+        ))
+        scheduler.log_summary()
+    logger.info(f"Skipped {redditor_flights.deduplicated} duplicate redditor fetches.")
+
+async def scrape(CONFIG, writer, redditor_cache=None, high_water_marks=None):
+    """
+    Runs the backend chosen with 'scraper_backend' in CONFIG: "praw" (default) or "async".
+    """
+    backend = CONFIG.get("scraper_backend", "praw")
+    logger.info(f"Using the '{backend}' scraper backend.")
+    if backend == "async":
+        from tools.async_scraper import scrape_with_async_client
+        await scrape_with_async_client(CONFIG, writer, redditor_cache, high_water_marks)
+    elif backend == "praw":
+        await scrape_with_praw(writer, redditor_cache, high_water_marks, dict(CONFIG))
+    else:
+        raise ValueError(f"Unsupported scraper backend: {backend}")
+
+async def run_scraper_async(resume=False):
+    """
+    Asynchronous entry point for the scraper.
+    The backend is chosen with 'scraper_backend' in CONFIG: "praw" (default) or "async".
+    With more than one entry in 'credentials', the work is sharded across one
+    worker process per credential (see tools.sharding).
+    With `resume`, submissions and redditors recorded in the checkpoint journal
+    of the previous run are skipped and new records are appended to its output.
+    """
+    redditor_cache = None
+    checkpoint = None
+    writer = None
+    metrics_server = start_metrics(CONFIG)
+    try:
+        redditor_cache = load_redditor_cache(CONFIG)
+        checkpoint = CheckpointJournal(resume=resume)
+        writer = load_writer(CONFIG, append=resume, checkpoint=checkpoint)
+        if schedules_profiles(CONFIG):
+            # Authors are profiled after every submission was written
+            writer.hold_submissions()
+        high_water_marks = load_high_water_marks(CONFIG)
+
+        credentials = load_credentials(CONFIG)
+        if len(credentials) > 1:
+            await scrape_sharded(CONFIG, credentials, writer, high_water_marks)
+        else:
+            await scrape(CONFIG, writer, redditor_cache, high_water_marks)
+        writer.release_submissions()
+
+        if high_water_marks is not None:
+            # A database sink journals submissions only once their batch is committed
+            writer.flush()
+            high_water_marks.save(checkpoint.submissions)
 
     except Exception as e:
         logger.error(f"An unexpected error occurred during scraping: {e}")
+    finally:
+        if writer is not None:
+            writer.close()
+        if checkpoint is not None:
+            checkpoint.close()
+        if redditor_cache is not None:
+            redditor_cache.close()
+        finish_metrics(CONFIG, metrics_server)
 
 #    logger.debug(f"Scraping complete. Processed {len(submissions)} submissions.")
 
 
-def run_scraper():
+def run_scraper(resume=False):
     """
     Synchronous wrapper to run the async scraper.
     """
-    asyncio.run(run_scraper_async())
+    asyncio.run(run_scraper_async(resume))
 
 if __name__ == "__main__":
     run_scraper()
@@ -0,0 +1,288 @@
+'''
+Multi-credential sharded scraping.
+
+Reddit's rate limit applies per OAuth client, so with several entries in
+'credentials' the scraper starts one worker process per credential, each
+with its own login and rate limiter. Submissions are split between workers
+by a stable hash of their ID, so every worker lists the configured
+subreddits (a few cheap requests) but fetches comments and authors only for
+its own share, however many or few subreddits there are.
+
+Authors cannot be split the same way: the same account comments in
+submissions of every shard. Before its deep fetch, a worker reserves the
+author's name in a table shared by all workers; a worker that finds the name
+reserved by another one waits until the parent has written that redditor
+instead of fetching it too. When the fetch ends without a record (account
+gone, request error), the reservation is dropped and the next worker that
+needs the author tries again, skipping accounts that the shared SQLite
+redditor cache already lists as unavailable. Each author's profile is
+therefore requested once per run, however the submissions are split.
+
+What every worker still repeats is the per-subreddit setup: the listing
+pages and the moderator lists, a few requests per subreddit and worker. With
+the profile prefilter on, the batched karma lookups (100 accounts per
+request) are not shared either.
+
+Workers send their records through a bounded queue to the parent process,
+which writes them into the usual sink (JSONL files or the database). A
+redditor the parent has written is published to every worker, and only then
+released to the workers waiting for it, so no worker's submission can reach
+the sink ahead of its authors.
+'''
+import asyncio
+import multiprocessing
+import queue
+import time
+import zlib
+from tools.config.logger_config import init_logger, logging
+from tools.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+logger.info("Sharding Basic logging set")
+init_logger()
+
+RECORD_QUEUE_SIZE = 1000  # records in flight between the workers and the parent
+RESERVATION_POLL_SECONDS = 0.05  # how often a worker checks on an author another worker is fetching
+# Result of a redditor fetch left to another worker: truthy, so single flights do not
+# remember it as done the way they remember accounts that are gone
+FETCHED_ELSEWHERE = object()
+
+
+def load_credentials(CONFIG):
+    """
+    Returns the list of {client_id, client_secret, user_agent} to scrape with:
+    the 'credentials' list when present, otherwise the top-level credential.
+    """
+    credentials = []
+    for entry in CONFIG.get("credentials") or []:
+        if not entry.get("client_id") or not entry.get("client_secret"):
+            logger.warning("Skipping a credentials entry without client_id/client_secret.")
+            continue
+        credentials.append({
+            "client_id": entry["client_id"],
+            "client_secret": entry["client_secret"],
+            "user_agent": entry.get("user_agent", CONFIG.get("user_agent")),
+        })
+    if not credentials:
+        credentials.append({key: CONFIG.get(key) for key in ("client_id", "client_secret", "user_agent")})
+    return credentials
+
+
+def shard_of(submission_id, shard_count):
+    """
+    Stable shard number of a submission (the same in every process and run).
+    """
+    return zlib.crc32(submission_id.encode("utf-8")) % shard_count
+
+
+class ShardWriter:
+    """
+    Writer used inside a worker process: forwards records to the parent.
+
+    `has_submission` is also true for submissions that belong to another
+    shard, which is how each worker keeps only its share of the listings.
+    `has_redditor` sees every redditor the parent has written for any worker,
+    and `reserve_redditor` makes sure only one worker fetches each author.
+    """
+
+    def __init__(self, shard_index, shard_count, record_queue, written_redditors, reserved_redditors,
+                 done_submissions):
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.record_queue = record_queue
+        self.written_redditors = written_redditors
+        self.reserved_redditors = reserved_redditors
+        self.done_submissions = done_submissions
+        self.sent_redditors = set()
+        self.submission_count = 0
+
+    def has_redditor(self, redditor_name):
+        return redditor_name in self.sent_redditors or redditor_name in self.written_redditors
+
+    def has_submission(self, submission_id):
+        return (
+            shard_of(submission_id, self.shard_count) != self.shard_index
+            or submission_id in self.done_submissions
+        )
+
+    def _try_reserve(self, redditor_name):
+        """
+        True when this worker may fetch the redditor, False once the parent has
+        written it, None while another worker is fetching it.
+        """
+        if redditor_name in self.written_redditors:
+            return False
+        if self.reserved_redditors.setdefault(redditor_name, self.shard_index) != self.shard_index:
+            return None
+        if redditor_name in self.written_redditors:  # written between the two checks
+            self.reserved_redditors.pop(redditor_name, None)
+            return False
+        return True
+
+    def reserve_redditor(self, redditor_name):
+        """
+        Reserves the redditor's fetch for this worker. Returns False, after waiting
+        if need be, when another worker fetched and the parent wrote it instead.
+        """
+        while (reserved := self._try_reserve(redditor_name)) is None:
+            time.sleep(RESERVATION_POLL_SECONDS)
+        return reserved
+
+    async def reserve_redditor_async(self, redditor_name):
+        while (reserved := self._try_reserve(redditor_name)) is None:
+            await asyncio.sleep(RESERVATION_POLL_SECONDS)
+        return reserved
+
+    def release_redditor(self, redditor_name):
+        """
+        Drops a reservation whose fetch wrote no record, so another worker may try.
+        """
+        self.reserved_redditors.pop(redditor_name, None)
+
+    def write_redditor(self, redditor_name, redditor_info):
+        if redditor_name in self.sent_redditors:
+            return
+        self.sent_redditors.add(redditor_name)
+        self.record_queue.put(("redditor", redditor_name, redditor_info))
+
+    def write_submission(self, submission_record):
+        self.submission_count += 1
+        self.record_queue.put(("submission", submission_record, None))
+
+    async def write_redditor_async(self, redditor_name, redditor_info):
+        """
+        write_redditor for coroutines: waits for room in the record queue in a thread,
+        so the worker's event loop keeps running while the parent catches up.
+        """
+        if redditor_name in self.sent_redditors:
+            return
+        self.sent_redditors.add(redditor_name)
+        await asyncio.to_thread(self.record_queue.put, ("redditor", redditor_name, redditor_info))
+
+    async def write_submission_async(self, submission_record):
+        self.submission_count += 1
+        await asyncio.to_thread(self.record_queue.put, ("submission", submission_record, None))
+
+    def hold_submissions(self):
+        pass  # The parent's writer holds them
+
+    def release_submissions(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def run_shard(shard_index, shard_count, shard_config, record_queue, written_redditors, reserved_redditors,
+              done_submissions):
+    """
+    Worker process entry point: scrapes one shard with one credential.
+    Always ends by sending a "done" message with its high-water-mark
+    observations and metrics, even when the scrape failed.
+    """
+    # Imported here: tools.scraper imports this module
+    from tools.redditor_cache import load_redditor_cache
+    from tools.scrape_state import load_high_water_marks
+    from tools.scraper import scrape
+
+    writer = ShardWriter(
+        shard_index, shard_count, record_queue, written_redditors, reserved_redditors, done_submissions
+    )
+    redditor_cache = None
+    high_water_marks = None
+    METRICS.reset()
+    try:
+        redditor_cache = load_redditor_cache(shard_config)
+        high_water_marks = load_high_water_marks(shard_config)
+        logger.info(f"Shard {shard_index + 1}/{shard_count} starting with client {shard_config['client_id'][:6]}...")
+        asyncio.run(scrape(shard_config, writer, redditor_cache, high_water_marks))
+    except Exception as e:
+        logger.error(f"Shard {shard_index + 1}/{shard_count} failed: {e}")
+    finally:
+        if redditor_cache is not None:
+            redditor_cache.close()
+        observations = high_water_marks.observations() if high_water_marks is not None else None
+        record_queue.put(("done", shard_index, (observations, METRICS.snapshot())))
+
+
+def _drop_reservations(reserved_redditors, shard_index):
+    """
+    Frees the authors a finished (or crashed) worker still had reserved, so the others stop waiting for them.
+    """
+    for redditor_name, holder in list(reserved_redditors.items()):
+        if holder == shard_index:
+            reserved_redditors.pop(redditor_name, None)
+
+
+def _drain_records(processes, record_queue, writer, written_redditors, reserved_redditors, high_water_marks):
+    """
+    Writes worker records into `writer` until every worker has finished.
+    """
+    running = set(range(len(processes)))
+    while running:
+        try:
+            kind, payload, extra = record_queue.get(timeout=1)
+        except queue.Empty:
+            for shard_index in list(running):
+                if not processes[shard_index].is_alive():
+                    logger.error(f"Shard {shard_index + 1} exited with code {processes[shard_index].exitcode} without finishing.")
+                    running.discard(shard_index)
+                    _drop_reservations(reserved_redditors, shard_index)
+            continue
+        if kind == "redditor":
+            writer.write_redditor(payload, extra)
+            # Published only after the parent wrote it, so a worker that skips or waits
+            # for this redditor can never get its submission into the sink ahead of it
+            written_redditors[payload] = True
+            reserved_redditors.pop(payload, None)
+        elif kind == "submission":
+            writer.write_submission(payload)
+        elif kind == "done":
+            observations, metrics_snapshot = extra
+            if observations and high_water_marks is not None:
+                high_water_marks.merge_observations(observations)
+            METRICS.merge(metrics_snapshot)
+            running.discard(payload)
+            _drop_reservations(reserved_redditors, payload)
+            logger.info(f"Shard {payload + 1}/{len(processes)} finished.")
+
+
+async def scrape_sharded(CONFIG, credentials, writer, high_water_marks=None):
+    """
+    Scrapes with one worker process per credential and merges their records into `writer`.
+    """
+    shard_count = len(credentials)
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    try:
+        written_redditors = manager.dict({name: True for name in writer.redditor_names})
+        reserved_redditors = manager.dict()  # author name -> index of the worker fetching it
+        done_submissions = set(writer.checkpoint.submissions) if writer.checkpoint else set()
+        record_queue = context.Queue(RECORD_QUEUE_SIZE)
+
+        processes = []
+        for shard_index, credential in enumerate(credentials):
+            shard_config = dict(CONFIG, **credential)
+            shard_config.pop("credentials", None)
+            process = context.Process(
+                target=run_shard,
+                args=(
+                    shard_index, shard_count, shard_config, record_queue,
+                    written_redditors, reserved_redditors, done_submissions,
+                ),
+                name=f"scraper-shard-{shard_index + 1}",
+            )
+            process.start()
+            processes.append(process)
+        logger.info(f"Started {shard_count} scraper shards, one per credential.")
+
+        await asyncio.to_thread(
+            _drain_records, processes, record_queue, writer, written_redditors, reserved_redditors, high_water_marks
+        )
+        for process in processes:
+            process.join()
+    finally:
+        manager.shutdown()
@@ -0,0 +1,103 @@
+'''
+Single-flight call deduplication.
+
+When several scraper workers need the same redditor at the same time, only
+the first one calls the API; the others wait for that call and share its
+result. Keys whose call returned nothing (e.g. a suspended redditor) are not
+fetched again for the rest of the run. Keys that returned a result are not
+remembered: the caller checks its writer first, and a redditor the database
+sink failed to store is then fetched and written again. Keys whose call
+raised are not remembered either, so the next caller retries them. Only the
+remembered keys are kept, not their results, and `max_remembered` bounds
+them for long-running processes such as the ingest daemon.
+'''
+import asyncio
+import threading
+from concurrent.futures import Future
+from tools.bounded_set import BoundedSet
+from tools.config.logger_config import init_logger, logging
+
+logger = logging.getLogger(__name__)
+logger.info("Single flight Basic logging set")
+init_logger()
+
+
+class SingleFlight:
+    """
+    Thread version, for the PRAW backend's worker threads.
+    """
+
+    def __init__(self, max_remembered=None):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._done = BoundedSet(max_size=max_remembered)
+        self.deduplicated = 0
+
+    def do(self, key, fn, *args):
+        """
+        Runs fn(*args) once for all callers arriving while it runs: they
+        block until it finishes and get the same result (or exception).
+        Callers arriving after it finished without a result get None without
+        calling fn; after an exception, the next caller calls fn again.
+        """
+        with self._lock:
+            if key in self._done:
+                self.deduplicated += 1
+                return None
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            logger.debug(f"Waiting for in-flight fetch of {key}")
+            return future.result()
+
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            if not result:
+                self._done.add(key)
+        future.set_result(result)
+        return result
+
+
+class AsyncSingleFlight:
+    """
+    Coroutine version, for the asyncio backend.
+    """
+
+    def __init__(self, max_remembered=None):
+        self._in_flight = {}
+        self._done = BoundedSet(max_size=max_remembered)
+        self.deduplicated = 0
+
+    async def do(self, key, coro_fn, *args):
+        """
+        Awaits coro_fn(*args) once for concurrent callers; see SingleFlight.do.
+        """
+        if key in self._done:
+            self.deduplicated += 1
+            return None
+        if (task := self._in_flight.get(key)) is not None:
+            self.deduplicated += 1
+            logger.debug(f"Waiting for in-flight fetch of {key}")
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(coro_fn(*args))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._finish(key, task))
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        del self._in_flight[key]
+        if not task.cancelled() and task.exception() is None and not task.result():
+            self._done.add(key)